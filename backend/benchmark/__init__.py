@@ -0,0 +1,2 @@
+# Banc d'essai : données synthétiques (donnees), scénarios de charge (scenarios), rapports (rapport).
+# Usage : python -m benchmark --help (depuis backend/)
@@ -0,0 +1,68 @@
+# python -m benchmark <commande> — à lancer depuis backend/ (DATABASE_URL : base locale de test)
+import argparse
+import asyncio
+import logging
+import os
+
+import models  # noqa: F401  (enregistre les tables sur Base)
+from benchmark import donnees, rapport, scenarios
+from utils.migrations import appliquer_migrations
+
+
+def peupler(args):
+    appliquer_migrations()
+    totaux = donnees.peupler(args.utilisateurs, args.transactions, jours=args.jours, graine=args.graine)
+    print(f"[OK] {totaux['utilisateurs']} utilisateurs, {totaux['transactions']} transactions (graine {args.graine}).")
+
+
+def lancer(args):
+    mesures, duree = asyncio.run(scenarios.executer(
+        args.url, args.scenario, args.concurrence, args.duree, graine=args.graine, pause=args.pause,
+    ))
+    resultat = rapport.construire(mesures, duree, {
+        "scenario": args.scenario, "concurrence": args.concurrence, "duree": args.duree,
+        "graine": args.graine, "url": args.url,
+    })
+    print(rapport.afficher(resultat))
+    if args.sortie:
+        rapport.ecrire(resultat, args.sortie)
+        print(f"[OK] Rapport écrit dans {args.sortie}")
+
+
+def comparer(args):
+    print(rapport.comparer(rapport.lire(args.reference), rapport.lire(args.candidat)))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="Banc d'essai de l'API transactions.")
+    commandes = parser.add_subparsers(dest="commande", required=True)
+
+    p = commandes.add_parser("peupler", help="Génère utilisateurs, taux et transactions (COPY) dans DATABASE_URL.")
+    p.add_argument("--utilisateurs", type=int, default=10_000)
+    p.add_argument("--transactions", type=int, default=1_000_000)
+    p.add_argument("--jours", type=int, default=90, help="Période couverte par les dates de transaction.")
+    p.add_argument("--graine", type=int, default=1)
+    p.set_defaults(func=peupler)
+
+    p = commandes.add_parser("lancer", help="Exécute un scénario contre une API démarrée.")
+    p.add_argument("scenario", choices=sorted(scenarios.SCENARIOS))
+    p.add_argument("--url", default=os.getenv("BENCHMARK_URL", "http://localhost:8000"))
+    p.add_argument("--concurrence", type=int, default=20, help="Utilisateurs virtuels simultanés.")
+    p.add_argument("--duree", type=float, default=30, help="Durée en secondes.")
+    p.add_argument("--graine", type=int, default=1, help="Graine utilisée par `peupler` (comptes).")
+    p.add_argument("--pause", type=float, default=1.0, help="Pause entre deux rafraîchissements (supervision).")
+    p.add_argument("--sortie", help="Fichier JSON du rapport (à comparer avec `comparer`).")
+    p.set_defaults(func=lancer)
+
+    p = commandes.add_parser("comparer", help="Compare deux rapports JSON (candidat vs référence).")
+    p.add_argument("reference")
+    p.add_argument("candidat")
+    p.set_defaults(func=comparer)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
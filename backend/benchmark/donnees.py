@@ -0,0 +1,137 @@
+# Générateur de données synthétiques, chargées par COPY directement dans PostgreSQL.
+# Même graine → mêmes données : deux runs comparés portent sur la même base.
+import io
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Tuple
+
+from passlib.hash import bcrypt
+
+from database import engine, SessionLocal
+from controllers import supervisionController
+from utils.partitions import maintenir_partitions
+
+MOT_DE_PASSE = "benchmark"
+DOMAINE = "bench.example.com"
+TAILLE_COPY = 100_000
+
+# Distributions observées en production (ordre de grandeur)
+SERVICES = {"Western Union": 35, "RIA": 25, "MoneyGram": 15, "Orange Money": 15, "Wave": 10}
+DEVISES = {"XOF": 45, "EUR": 30, "USD": 20, "GBP": 5}
+STATUTS = {"validée": 75, "en attente": 15, "annulée": 10}
+ROLES = {"client": 90, "agent": 7, "service": 2, "admin": 1}
+TAUX = {("EUR", "XOF"): 655.957, ("USD", "XOF"): 605.0, ("GBP", "XOF"): 765.0,
+        ("EUR", "USD"): 1.08, ("USD", "EUR"): 0.925, ("XOF", "EUR"): 0.001524}
+# Activité par heure de la journée (UTC) : creux la nuit, pics midi et fin d'après-midi
+PROFIL_HORAIRE = [1, 1, 1, 1, 1, 2, 4, 6, 8, 9, 10, 11, 12, 11, 10, 10, 11, 12, 10, 8, 6, 4, 2, 1]
+
+
+def email_bench(graine: int, role: str, i: int) -> str:
+    return f"bench{graine}-{role}-{i}@{DOMAINE}"
+
+
+def _tirages(rng: random.Random, poids: Dict) -> Iterator:
+    valeurs, cumul = list(poids), list(poids.values())
+    while True:
+        yield from rng.choices(valeurs, weights=cumul, k=1024)
+
+
+def _copier(curseur, table: str, colonnes: List[str], lignes: Iterator[Tuple]) -> int:
+    """COPY par paquets de TAILLE_COPY lignes (mémoire bornée)."""
+    total = 0
+    while True:
+        tampon = io.StringIO()
+        n = 0
+        for ligne in lignes:
+            tampon.write("\t".join("\\N" if v is None else str(v) for v in ligne))
+            tampon.write("\n")
+            n += 1
+            if n == TAILLE_COPY:
+                break
+        if not n:
+            return total
+        tampon.seek(0)
+        curseur.copy_expert(f"COPY {table} ({', '.join(colonnes)}) FROM STDIN", tampon)
+        total += n
+        logging.info(f"{table} : {total} lignes")
+
+
+def peupler(nb_utilisateurs: int, nb_transactions: int, jours: int = 90, graine: int = 1) -> Dict[str, int]:
+    rng = random.Random(graine)
+    mot_de_passe_hache = bcrypt.hash(MOT_DE_PASSE)  # un seul hachage pour tous les comptes
+    # Partitions de toute la période d'abord (DDL hors de la transaction du COPY)
+    with engine.begin() as connexion_ddl:
+        maintenir_partitions(connexion_ddl, depuis=datetime.utcnow() - timedelta(days=jours))
+
+    connexion = engine.raw_connection()
+    try:
+        curseur = connexion.cursor()
+
+        roles = _tirages(rng, ROLES)
+        comptes = [(role, i) for i, role in zip(range(nb_utilisateurs), roles)]
+        # Au moins un compte de chaque rôle utilisé par les scénarios
+        comptes += [(role, nb_utilisateurs + k) for k, role in enumerate(("agent", "service", "admin"))]
+        _copier(curseur, "utilisateurs", ["nom", "email", "mot_de_passe", "role"], (
+            (f"bench{graine}-{role}-{i}", email_bench(graine, role, i), mot_de_passe_hache, role)
+            for role, i in comptes
+        ))
+
+        for (source, cible), taux in TAUX.items():
+            curseur.execute(
+                "INSERT INTO taux_changes (devise_source, devise_cible, taux, date_enregistrement) "
+                "VALUES (%s, %s, %s, now()) ON CONFLICT (devise_source, devise_cible) DO NOTHING",
+                (source, cible, taux),
+            )
+        curseur.execute("SELECT id, devise_source FROM taux_changes")
+        taux_par_devise: Dict[str, List[int]] = {}
+        for taux_id, devise in curseur.fetchall():
+            taux_par_devise.setdefault(devise, []).append(taux_id)
+
+        curseur.execute("SELECT id FROM utilisateurs WHERE email LIKE %s AND role = 'client'",
+                        (f"bench{graine}-client-%@{DOMAINE}",))
+        clients = [ligne[0] for ligne in curseur.fetchall()]
+        if not clients:
+            raise ValueError("Aucun client généré : augmenter nb_utilisateurs.")
+
+        fin = datetime.utcnow()
+        debut = fin - timedelta(days=jours)
+        heures = list(range(24))
+
+        def transactions() -> Iterator[Tuple]:
+            services, devises, statuts = _tirages(rng, SERVICES), _tirages(rng, DEVISES), _tirages(rng, STATUTS)
+            for i in range(nb_transactions):
+                devise = next(devises)
+                jour = debut + timedelta(days=rng.randrange(jours))
+                date = jour.replace(hour=rng.choices(heures, weights=PROFIL_HORAIRE)[0],
+                                    minute=rng.randrange(60), second=rng.randrange(60))
+                taux_ids = taux_par_devise.get(devise)
+                yield (
+                    rng.choice(clients),
+                    round(min(rng.lognormvariate(5, 1.2), 1e6), 2),  # médiane ~150, longue traîne
+                    devise,
+                    next(services),
+                    f"B{graine}-{i:09d}",
+                    next(statuts),
+                    date.isoformat(sep=" "),
+                    rng.choice(taux_ids) if taux_ids and rng.random() < 0.5 else None,
+                )
+
+        nb = _copier(curseur, "transactions",
+                     ["utilisateur_id", "montant", "devise", "service", "numero_transaction",
+                      "statut", "date_transaction", "taux_change_id"],
+                     transactions())
+        connexion.commit()
+    finally:
+        connexion.close()
+
+    # Agrégats et séries recalculés, statistiques du planificateur à jour
+    db = SessionLocal()
+    try:
+        supervisionController.reconstruire_agregats(db)
+    finally:
+        db.close()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connexion_analyse:
+        connexion_analyse.exec_driver_sql("ANALYZE")
+
+    return {"utilisateurs": len(comptes), "transactions": nb}
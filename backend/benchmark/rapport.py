@@ -0,0 +1,82 @@
+# Rapports JSON (un fichier par run) et comparaison entre deux runs.
+import json
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from benchmark.scenarios import Mesures
+
+
+def centile(durees_triees: List[float], p: float) -> float:
+    """Centile par rang le plus proche (durées déjà triées)."""
+    if not durees_triees:
+        return 0.0
+    rang = max(int(round(p / 100 * len(durees_triees) + 0.5)) - 1, 0)
+    return durees_triees[min(rang, len(durees_triees) - 1)]
+
+
+def _commit_git() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def construire(mesures: Mesures, duree: float, parametres: Dict) -> Dict:
+    endpoints = {}
+    for libelle, appels in sorted(mesures.par_endpoint.items()):
+        durees = sorted(d for d, _ in appels)
+        endpoints[libelle] = {
+            "requetes": len(appels),
+            "erreurs": sum(1 for _, succes in appels if not succes),
+            "debit_rps": round(len(appels) / duree, 2) if duree else 0.0,
+            "p50_ms": round(centile(durees, 50) * 1000, 2),
+            "p95_ms": round(centile(durees, 95) * 1000, 2),
+            "p99_ms": round(centile(durees, 99) * 1000, 2),
+            "max_ms": round(durees[-1] * 1000, 2),
+        }
+    return {
+        "date": datetime.utcnow().isoformat(timespec="seconds"),
+        "commit": _commit_git(),
+        "parametres": parametres,
+        "duree_s": round(duree, 2),
+        "endpoints": endpoints,
+    }
+
+
+def afficher(rapport: Dict) -> str:
+    lignes = [f"{'endpoint':<34}{'req':>8}{'err':>6}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}"]
+    for libelle, e in rapport["endpoints"].items():
+        lignes.append(f"{libelle:<34}{e['requetes']:>8}{e['erreurs']:>6}{e['debit_rps']:>9}"
+                      f"{e['p50_ms']:>9}{e['p95_ms']:>9}{e['p99_ms']:>9}")
+    return "\n".join(lignes)
+
+
+def _ecart(avant: float, apres: float) -> str:
+    if not avant:
+        return "   n/a"
+    return f"{(apres - avant) / avant * 100:+6.1f}%"
+
+
+def comparer(reference: Dict, candidat: Dict) -> str:
+    """Écarts relatifs (candidat vs référence) par endpoint commun ; négatif = plus rapide."""
+    lignes = [f"référence {reference.get('commit')} ({reference['date']}) → candidat "
+              f"{candidat.get('commit')} ({candidat['date']})",
+              f"{'endpoint':<34}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}"]
+    for libelle in sorted(set(reference["endpoints"]) & set(candidat["endpoints"])):
+        a, b = reference["endpoints"][libelle], candidat["endpoints"][libelle]
+        lignes.append(f"{libelle:<34}{_ecart(a['debit_rps'], b['debit_rps']):>9}"
+                      f"{_ecart(a['p50_ms'], b['p50_ms']):>9}{_ecart(a['p95_ms'], b['p95_ms']):>9}"
+                      f"{_ecart(a['p99_ms'], b['p99_ms']):>9}")
+    return "\n".join(lignes)
+
+
+def ecrire(rapport: Dict, chemin: str) -> None:
+    with open(chemin, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, ensure_ascii=False, indent=2)
+
+
+def lire(chemin: str) -> Dict:
+    with open(chemin, encoding="utf-8") as f:
+        return json.load(f)
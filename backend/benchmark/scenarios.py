@@ -0,0 +1,135 @@
+# Scénarios de charge contre une API démarrée (uvicorn/gunicorn), en utilisateurs virtuels asyncio.
+import asyncio
+import itertools
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+from sqlalchemy import select
+
+from database import SessionLocal
+from models import Utilisateur
+from benchmark.donnees import DOMAINE, MOT_DE_PASSE, SERVICES, DEVISES
+
+
+@dataclass
+class Mesures:
+    # libellé ("GET /transactions/") → [(durée en secondes, succès)]
+    par_endpoint: Dict[str, List[Tuple[float, bool]]] = field(default_factory=dict)
+
+    def ajouter(self, libelle: str, duree: float, succes: bool) -> None:
+        self.par_endpoint.setdefault(libelle, []).append((duree, succes))
+
+
+async def _appel(client: httpx.AsyncClient, mesures: Mesures, methode: str, gabarit: str,
+                 url: str = None, **kwargs) -> httpx.Response:
+    """Un appel chronométré ; le libellé utilise le gabarit de la route, pas l'URL effective."""
+    debut = time.perf_counter()
+    try:
+        reponse = await client.request(methode, url or gabarit, **kwargs)
+        succes = reponse.status_code < 400
+    except httpx.HTTPError:
+        reponse, succes = None, False
+    mesures.ajouter(f"{methode} {gabarit}", time.perf_counter() - debut, succes)
+    return reponse
+
+
+def comptes(graine: int, role: str, limite: int) -> List[str]:
+    """Emails des comptes générés par `peupler` pour ce rôle."""
+    db = SessionLocal()
+    try:
+        return list(db.execute(
+            select(Utilisateur.email)
+            .where(Utilisateur.email.like(f"bench{graine}-{role}-%@{DOMAINE}"))
+            .order_by(Utilisateur.id)
+            .limit(limite)
+        ).scalars())
+    finally:
+        db.close()
+
+
+async def _jeton(client: httpx.AsyncClient, email: str) -> Dict[str, str]:
+    reponse = await client.post("/authentification/connexion", json={"email": email, "mot_de_passe": MOT_DE_PASSE})
+    reponse.raise_for_status()
+    return {"Authorization": f"Bearer {reponse.json()['token_acces']}"}
+
+
+# -------------------- Scénarios : une itération par appel --------------------
+
+async def tempete_connexions(client, mesures, contexte):
+    email = next(contexte["emails"])
+    await _appel(client, mesures, "POST", "/authentification/connexion",
+                 json={"email": email, "mot_de_passe": MOT_DE_PASSE})
+
+
+async def creation_transactions(client, mesures, contexte):
+    rng = contexte["rng"]
+    await _appel(client, mesures, "POST", "/transactions/", headers=contexte["entetes"], json={
+        "montant": max(min(round(rng.lognormvariate(5, 1.2), 2), 1e6), 0.01),
+        "devise": rng.choice(list(DEVISES)),
+        "service": rng.choice(list(SERVICES)),
+        "numero_transaction": f"BV-{uuid.uuid4().hex}",
+    })
+
+
+async def tableau_de_bord_superviseur(client, mesures, contexte):
+    await _appel(client, mesures, "GET", "/supervision/resume", headers=contexte["entetes"])
+    await _appel(client, mesures, "GET", "/supervision/serie", headers=contexte["entetes"],
+                 params={"granularite": "heure"})
+    await _appel(client, mesures, "GET", "/supervision/serie", headers=contexte["entetes"],
+                 params={"granularite": "jour"})
+    await asyncio.sleep(contexte["pause"])  # rafraîchissement périodique d'un écran
+
+
+async def file_attente_agent(client, mesures, contexte):
+    # Première page puis deux pages suivantes (pagination par curseur)
+    params = {"limit": 50}
+    for _ in range(3):
+        reponse = await _appel(client, mesures, "GET", "/transactions/", headers=contexte["entetes"], params=params)
+        if reponse is None or reponse.status_code >= 400 or not reponse.json().get("next_cursor"):
+            break
+        params = {"limit": 50, "cursor": reponse.json()["next_cursor"]}
+
+
+# nom → (scénario, rôle des comptes utilisés, connexion préalable)
+SCENARIOS: Dict[str, Tuple[Callable, str, bool]] = {
+    "connexions": (tempete_connexions, "client", False),
+    "creation": (creation_transactions, "client", True),
+    "supervision": (tableau_de_bord_superviseur, "service", True),
+    "agent": (file_attente_agent, "agent", True),
+}
+
+
+async def _utilisateur_virtuel(scenario, client, mesures, contexte, fin: float) -> None:
+    while time.monotonic() < fin:
+        await scenario(client, mesures, contexte)
+
+
+async def executer(url: str, nom: str, concurrence: int, duree: float, graine: int = 1,
+                   pause: float = 1.0) -> Tuple[Mesures, float]:
+    """Lance `concurrence` utilisateurs virtuels pendant `duree` secondes ; retourne les mesures et la durée réelle."""
+    scenario, role, connexion_prealable = SCENARIOS[nom]
+    emails = comptes(graine, role, max(concurrence, 1) * (20 if nom == "connexions" else 1))
+    if not emails:
+        raise ValueError(f"Aucun compte '{role}' pour la graine {graine} : lancer `peupler` d'abord.")
+
+    mesures = Mesures()
+    limites = httpx.Limits(max_connections=concurrence, max_keepalive_connections=concurrence)
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=60) as client:
+        contextes = []
+        cycle = itertools.cycle(emails)
+        for i in range(concurrence):
+            contexte = {"rng": random.Random(graine * 1000 + i), "pause": pause, "emails": cycle}
+            if connexion_prealable:
+                contexte["entetes"] = await _jeton(client, emails[i % len(emails)])
+            contextes.append(contexte)
+
+        debut = time.monotonic()
+        fin = debut + duree
+        await asyncio.gather(*(
+            _utilisateur_virtuel(scenario, client, mesures, contexte, fin) for contexte in contextes
+        ))
+        return mesures, time.monotonic() - debut
@@ -1,32 +1,243 @@
-from sqlalchemy.orm import Session
-from models import Transaction
+import os
+import threading
+from collections import defaultdict, deque
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from sqlalchemy import func
-
-
-def detecter_alertes(db: Session, seuil_montant: float = 10000.0, delai_minutes: int = 5):
-    alertes = []
-
-    # 1. Transactions au-dessus du seuil
-    transactions_suspectes = db.query(Transaction).filter(Transaction.montant >= seuil_montant).all()
-    if transactions_suspectes:
-        alertes.append({
-            "type": "Montant élevé",
-            "transactions": [t.__dict__ for t in transactions_suspectes]
-        })
-
-    # 2. Transactions multiples en peu de temps par utilisateur
-    limite_temps = datetime.utcnow() - timedelta(minutes=delai_minutes)
-    transactions_recent = db.query(Transaction.utilisateur_id, func.count(Transaction.id))\
-        .filter(Transaction.date_transaction >= limite_temps)\
-        .group_by(Transaction.utilisateur_id)\
-        .having(func.count(Transaction.id) > 3)\
-        .all()
-
-    if transactions_recent:
-        alertes.append({
-            "type": "Transactions multiples dans un court délai",
-            "details": [{"utilisateur_id": utilisateur_id, "nb_transactions": nb} for utilisateur_id, nb in transactions_recent]
-        })
-
-    return alertes
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, event, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from models import Alerte, Transaction
+
+# Règles (surchargées par variables d'environnement)
+SEUIL_MONTANT = float(os.getenv("ALERTE_SEUIL_MONTANT", "10000"))
+FENETRE_MINUTES = int(os.getenv("ALERTE_FENETRE_MINUTES", "5"))
+MAX_TRANSACTIONS_FENETRE = int(os.getenv("ALERTE_MAX_TRANSACTIONS", "3"))
+SEUIL_VOLUME_FENETRE = float(os.getenv("ALERTE_SEUIL_VOLUME", "20000"))
+MAX_ANNULATIONS_FENETRE = int(os.getenv("ALERTE_MAX_ANNULATIONS", "3"))
+
+# Motifs : (transaction_id, motif) est unique en base → une alerte par constat
+MOTIF_MONTANT = "Montant élevé"
+MOTIF_FREQUENCE = "Transactions multiples dans un court délai"
+MOTIF_VOLUME = "Volume élevé dans un court délai"
+MOTIF_ANNULATIONS = "Annulations multiples dans un court délai"
+
+CREATION = "creation"
+ANNULATION = "annulation"
+
+
+@dataclass(frozen=True)
+class Evenement:
+    transaction_id: int
+    utilisateur_id: int
+    horodatage: datetime
+    montant: float
+    nature: str  # CREATION ou ANNULATION
+
+
+class _Fenetre:
+    """Événements d'une clé (utilisateur_id, nature) par ordre d'arrivée, avec nombre et volume tenus à jour."""
+
+    __slots__ = ("evenements", "nombre", "volume")
+
+    def __init__(self):
+        self.evenements: Deque[Evenement] = deque()
+        self.nombre = 0
+        self.volume = 0.0
+
+    def ajouter(self, evenement: Evenement) -> None:
+        self.evenements.append(evenement)
+        self.nombre += 1
+        self.volume += evenement.montant
+
+    def expirer(self, limite: datetime) -> None:
+        while self.evenements and self.evenements[0].horodatage < limite:
+            self.volume -= self.evenements.popleft().montant
+            self.nombre -= 1
+        if not self.evenements:
+            self.volume = 0.0  # pas de dérive d'arrondi sur une fenêtre vide
+
+
+class MoteurDetection:
+    """
+    Fenêtres glissantes par utilisateur (créations et annulations des FENETRE_MINUTES
+    dernières minutes), évaluées à chaque écriture en O(1) amorti : nombre et volume sont
+    tenus à jour, chaque événement n'entre et ne sort de sa fenêtre qu'une fois.
+
+    Les événements d'une session forment un delta en attente (session.info), ajouté aux
+    fenêtres au commit et abandonné au rollback (voir les écouteurs en bas du module).
+
+    Les fenêtres sont propres au processus : avec plusieurs workers, chacun ne voit que ses
+    propres écritures depuis la dernière reconstruction depuis la base (au démarrage, puis
+    toutes les ALERTE_SYNCHRONISATION_INTERVALLE secondes, voir main.py). Les seuils sont
+    des « au-delà de » et l'alerte est unique par (transaction_id, motif) : un constat manqué
+    par un worker est posé par la transaction suivante une fois les fenêtres resynchronisées.
+    """
+
+    CLE_SESSION = "alertes_evenements"
+
+    def __init__(self, fenetre: timedelta = timedelta(minutes=FENETRE_MINUTES)):
+        self.fenetre = fenetre
+        self._fenetres: Dict[Tuple[int, str], _Fenetre] = {}
+        self._verrou = threading.Lock()
+        # Événements validés pendant une reconstruction (None hors reconstruction)
+        self._valides_pendant: Optional[List[Evenement]] = None
+
+    def _valides(self, cle: Tuple[int, str], limite: datetime) -> Tuple[int, float]:
+        with self._verrou:
+            fenetre = self._fenetres.get(cle)
+            if fenetre is None:
+                return 0, 0.0
+            fenetre.expirer(limite)
+            if not fenetre.nombre:
+                del self._fenetres[cle]
+            return fenetre.nombre, fenetre.volume
+
+    def evaluer(self, info: dict, transaction_id: int, evenement: Evenement) -> List[Tuple[int, str]]:
+        """Retourne les constats [(transaction_id, motif)] et note l'événement dans la session."""
+        constats = []
+        cle = (evenement.utilisateur_id, evenement.nature)
+        limite = evenement.horodatage - self.fenetre
+        nombre_valide, volume_valide = self._valides(cle, limite)
+        en_attente = info.setdefault(self.CLE_SESSION, {}).get(cle)
+        if en_attente is None:
+            en_attente = info[self.CLE_SESSION][cle] = _Fenetre()
+        en_attente.expirer(limite)
+        nombre = nombre_valide + en_attente.nombre + 1
+
+        if evenement.nature == CREATION:
+            if evenement.montant >= SEUIL_MONTANT:
+                constats.append((transaction_id, MOTIF_MONTANT))
+            # Toute transaction au-delà du seuil est signalée (doublons écartés par uix_alertes_transaction_motif)
+            if nombre > MAX_TRANSACTIONS_FENETRE:
+                constats.append((transaction_id, MOTIF_FREQUENCE))
+            if volume_valide + en_attente.volume + evenement.montant >= SEUIL_VOLUME_FENETRE:
+                constats.append((transaction_id, MOTIF_VOLUME))
+        elif nombre > MAX_ANNULATIONS_FENETRE:
+            constats.append((transaction_id, MOTIF_ANNULATIONS))
+
+        en_attente.ajouter(evenement)
+        return constats
+
+    def valider(self, en_attente: Dict[Tuple[int, str], _Fenetre]) -> None:
+        with self._verrou:
+            for cle, delta in en_attente.items():
+                if not delta.nombre:
+                    continue
+                fenetre = self._fenetres.get(cle)
+                if fenetre is None:
+                    fenetre = self._fenetres[cle] = _Fenetre()
+                for evenement in delta.evenements:
+                    fenetre.ajouter(evenement)
+                if self._valides_pendant is not None:
+                    self._valides_pendant.extend(delta.evenements)
+
+    def reconstruire(self, db: Session) -> int:
+        """
+        Recharge les fenêtres depuis la base : écritures de tous les workers, clés des
+        utilisateurs inactifs libérées. Les événements validés par ce worker pendant la
+        lecture sont réappliqués (sans doublon) pour ne pas être perdus au remplacement.
+        """
+        with self._verrou:
+            self._valides_pendant = []
+        try:
+            depuis = datetime.utcnow() - self.fenetre
+            # Créations à date_transaction, annulations à date_statut : les horodatages du temps réel
+            lignes = db.execute(
+                select(Transaction.id, Transaction.utilisateur_id, Transaction.date_transaction,
+                       Transaction.montant, Transaction.statut, Transaction.date_statut)
+                .where(or_(
+                    Transaction.date_transaction >= depuis,
+                    and_(Transaction.statut == "annulée", Transaction.date_statut >= depuis),
+                ))
+            ).all()
+        except Exception:
+            with self._verrou:
+                self._valides_pendant = None
+            raise
+
+        evenements = []
+        for transaction_id, utilisateur_id, date_transaction, montant, statut, date_statut in lignes:
+            if date_transaction >= depuis:
+                evenements.append(Evenement(transaction_id, utilisateur_id, date_transaction, float(montant), CREATION))
+            if statut == "annulée" and date_statut is not None and date_statut >= depuis:
+                evenements.append(Evenement(transaction_id, utilisateur_id, date_statut, float(montant), ANNULATION))
+        connus = {(e.transaction_id, e.nature) for e in evenements}
+        with self._verrou:
+            evenements += [e for e in self._valides_pendant if (e.transaction_id, e.nature) not in connus]
+            self._valides_pendant = None
+            fenetres: Dict[Tuple[int, str], _Fenetre] = defaultdict(_Fenetre)
+            for evenement in sorted(evenements, key=lambda e: e.horodatage):
+                fenetres[(evenement.utilisateur_id, evenement.nature)].ajouter(evenement)
+            self._fenetres = dict(fenetres)
+        return len(lignes)
+
+
+moteur = MoteurDetection()
+
+
+@event.listens_for(Session, "after_commit")
+def _valider_evenements(session):
+    en_attente = session.info.pop(MoteurDetection.CLE_SESSION, None)
+    if en_attente:
+        moteur.valider(en_attente)
+
+
+@event.listens_for(Session, "after_rollback")
+def _oublier_evenements(session):
+    session.info.pop(MoteurDetection.CLE_SESSION, None)
+
+
+# 🔎 Points d'entrée appelés par les controllers, avant le commit de l'écriture
+def constats_creation(info: dict, transaction_id: int, utilisateur_id: int, montant: float,
+                      horodatage: Optional[datetime] = None) -> List[Tuple[int, str]]:
+    evenement = Evenement(transaction_id, utilisateur_id, horodatage or datetime.utcnow(), float(montant), CREATION)
+    return moteur.evaluer(info, transaction_id, evenement)
+
+
+def constats_mise_a_jour(info: dict, transaction_id: int, utilisateur_id: int, montant: float,
+                         statut: str, horodatage: Optional[datetime] = None) -> List[Tuple[int, str]]:
+    constats = []
+    # Un montant élevé reste signalé (idempotent) même s'il précède le moteur
+    if float(montant) >= SEUIL_MONTANT:
+        constats.append((transaction_id, MOTIF_MONTANT))
+    if statut == "annulée":
+        # horodatage : date_statut écrite sur la ligne, relue telle quelle par reconstruire()
+        evenement = Evenement(transaction_id, utilisateur_id, horodatage or datetime.utcnow(), float(montant), ANNULATION)
+        constats += moteur.evaluer(info, transaction_id, evenement)
+    return constats
+
+
+def requete_alertes(constats: List[Tuple[int, str]]):
+    """INSERT ... ON CONFLICT DO NOTHING des constats (None si aucun)."""
+    if not constats:
+        return None
+    maintenant = datetime.utcnow()
+    return (
+        pg_insert(Alerte)
+        .values([{"transaction_id": t, "motif": motif, "date_alerte": maintenant} for t, motif in constats])
+        .on_conflict_do_nothing(index_elements=[Alerte.transaction_id, Alerte.motif])
+    )
+
+
+def enregistrer_alertes(db: Session, constats: List[Tuple[int, str]]) -> None:
+    stmt = requete_alertes(constats)
+    if stmt is not None:
+        db.execute(stmt)
+
+
+# 📋 Alertes enregistrées (plus récentes d'abord), avec la transaction concernée
+def lister_alertes(db: Session, limit: int = 100, avant_id: Optional[int] = None) -> List[Dict]:
+    stmt = (
+        select(Alerte.id, Alerte.transaction_id, Alerte.motif, Alerte.date_alerte,
+               Transaction.numero_transaction, Transaction.montant, Transaction.devise,
+               Transaction.service, Transaction.statut, Transaction.utilisateur_id)
+        .join(Transaction, Alerte.transaction_id == Transaction.id)
+        .order_by(Alerte.id.desc())
+        .limit(limit)
+    )
+    if avant_id is not None:
+        stmt = stmt.where(Alerte.id < avant_id)
+    return [dict(ligne._mapping) for ligne in db.execute(stmt)]
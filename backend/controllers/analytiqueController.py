@@ -0,0 +1,110 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from utils.instantane_analytique import Instantane, micro_secondes, stockage_analytique
+
+# Dimensions de regroupement : les trois colonnes codées + deux découpages de la date
+DIMENSIONS_ANALYTIQUE = ("service", "devise", "statut", "jour", "heure")
+MICRO_SECONDES_PAR_PERIODE = {"jour": 86_400_000_000, "heure": 3_600_000_000}
+# Au-delà de ce nombre de combinaisons possibles, np.unique remplace le tableau dense de np.bincount
+GROUPES_DENSES_MAX = 2_000_000
+
+
+def lire_dimensions(par: Optional[str]) -> List[str]:
+    dimensions = [d.strip() for d in (par or "").split(",") if d.strip()]
+    inconnues = [d for d in dimensions if d not in DIMENSIONS_ANALYTIQUE]
+    if inconnues:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Dimension(s) inconnue(s) : {', '.join(inconnues)}. Choix : {', '.join(DIMENSIONS_ANALYTIQUE)}.",
+        )
+    if len(set(dimensions)) != len(dimensions):
+        raise HTTPException(status_code=400, detail="Dimension répétée dans 'par'.")
+    return dimensions
+
+
+def _masque(instantane: Instantane, filtres: Dict[str, Optional[Sequence[str]]],
+            debut: Optional[datetime], fin: Optional[datetime]) -> np.ndarray:
+    colonnes = instantane.colonnes
+    masque = colonnes["statut"] >= 0  # lignes supprimées depuis l'instantané
+    for dimension, valeurs in filtres.items():
+        if valeurs:
+            dictionnaire = instantane.dictionnaires[dimension]
+            codes = [dictionnaire.index(v) for v in valeurs if v in dictionnaire]
+            masque &= np.isin(colonnes[dimension], codes)
+    if debut is not None:
+        masque &= colonnes["date"] >= micro_secondes(debut)
+    if fin is not None:
+        masque &= colonnes["date"] < micro_secondes(fin)
+    return masque
+
+
+def _codes_dimension(instantane: Instantane, dimension: str, masque: np.ndarray):
+    """(codes 0..taille-1 des lignes retenues, taille, décodage code → libellé)."""
+    if dimension in instantane.dictionnaires:
+        dictionnaire = instantane.dictionnaires[dimension]
+        return instantane.colonnes[dimension][masque].astype(np.int64), max(len(dictionnaire), 1), dictionnaire.__getitem__
+
+    unite = MICRO_SECONDES_PAR_PERIODE[dimension]
+    periodes = instantane.colonnes["date"][masque] // unite
+    origine = int(periodes.min()) if periodes.size else 0
+    codes = periodes - origine
+    taille = int(codes.max()) + 1 if codes.size else 1
+    return codes, taille, lambda code: datetime.utcfromtimestamp((origine + code) * unite / 1_000_000)
+
+
+def analyser(instantane: Instantane, dimensions: List[str], filtres: Dict[str, Optional[Sequence[str]]],
+             debut: Optional[datetime] = None, fin: Optional[datetime] = None) -> Dict:
+    """Filtre puis regroupe les colonnes de l'instantané (nombre et montant total par groupe)."""
+    masque = _masque(instantane, filtres, debut, fin)
+    montants = instantane.colonnes["montant"][masque]
+    resultat = {
+        "par": dimensions,
+        "total": {"nombre": int(montants.size), "montant_total": round(float(montants.sum()), 2)},
+        "groupes": [],
+    }
+    if not dimensions or not montants.size:
+        return resultat
+
+    codes, tailles, decodeurs = zip(*(_codes_dimension(instantane, d, masque) for d in dimensions))
+    # Une clé entière par combinaison de dimensions (ordre lexicographique des codes)
+    cles = np.ravel_multi_index(codes, tailles)
+    if int(np.prod(tailles, dtype=np.float64)) <= GROUPES_DENSES_MAX:
+        nombres = np.bincount(cles, minlength=1)
+        sommes = np.bincount(cles, weights=montants, minlength=1)
+        groupes = np.flatnonzero(nombres)
+        nombres, sommes = nombres[groupes], sommes[groupes]
+    else:
+        groupes, inverse = np.unique(cles, return_inverse=True)
+        nombres = np.bincount(inverse)
+        sommes = np.bincount(inverse, weights=montants)
+
+    for dimension_codes, nombre, somme in zip(zip(*np.unravel_index(groupes, tailles)),
+                                              nombres.tolist(), sommes.tolist()):
+        groupe = {d: decoder(int(code)) for d, decoder, code in zip(dimensions, decodeurs, dimension_codes)}
+        groupe["nombre"] = nombre
+        groupe["montant_total"] = round(somme, 2)
+        resultat["groupes"].append(groupe)
+    return resultat
+
+
+def analyse_supervision(dimensions: List[str], filtres: Dict[str, Optional[Sequence[str]]],
+                        debut: Optional[datetime] = None, fin: Optional[datetime] = None) -> Dict:
+    instantane = stockage_analytique.instantane()
+    if instantane is None:
+        raise HTTPException(status_code=503, detail="Instantané analytique pas encore disponible.")
+    resultat = analyser(instantane, dimensions, filtres, debut, fin)
+    resultat["instantane"] = {
+        "lignes": instantane.lignes,
+        "dernier_id": instantane.meta["dernier_id"],
+        "genere_a": datetime.utcfromtimestamp(instantane.meta["genere_a"]),
+    }
+    return resultat
+
+
+def rafraichir_instantane(db: Session, complet: bool = False) -> Optional[Dict]:
+    return stockage_analytique.rafraichir(db, complet=complet)
@@ -0,0 +1,79 @@
+import gzip
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from controllers import supervisionController
+from models import Transaction
+from utils.partitions import (
+    CLE_VERROU_PARTITIONS, debut_mois, mois_precedent, mois_suivant, nom_partition, partitions_mensuelles,
+)
+from utils.versions_donnees import TRANSACTIONS, signaler
+
+# Dossier des archives (un fichier CSV gzip par mois et par table)
+ARCHIVES_DOSSIER = os.getenv("ARCHIVES_DOSSIER", os.path.join(os.getcwd(), "archives"))
+# Mois conservés en ligne (mois courant non compris)
+ARCHIVES_MOIS_CONSERVES = int(os.getenv("ARCHIVES_MOIS_CONSERVES", "12"))
+
+
+def mois_a_archiver(db: Session, mois_conserves: int = ARCHIVES_MOIS_CONSERVES) -> List[datetime]:
+    limite = debut_mois(datetime.utcnow())
+    for _ in range(mois_conserves):
+        limite = mois_precedent(limite)
+    return [mois for mois in partitions_mensuelles(db.connection()) if mois < limite]
+
+
+def _exporter(db: Session, requete: str, chemin: str) -> None:
+    """COPY ... TO STDOUT vers un CSV gzip, écrit à côté puis renommé (jamais de fichier tronqué)."""
+    temporaire = chemin + ".tmp"
+    curseur = db.connection().connection.cursor()
+    with open(temporaire, "wb") as brut:
+        with gzip.GzipFile(fileobj=brut, mode="wb") as fichier:
+            curseur.copy_expert(f"COPY ({requete}) TO STDOUT WITH (FORMAT csv, HEADER)", fichier)
+        brut.flush()
+        os.fsync(brut.fileno())
+    os.replace(temporaire, chemin)
+
+
+def archiver_mois(db: Session, mois: datetime, dossier: str = ARCHIVES_DOSSIER) -> Dict:
+    """
+    Exporte la partition du mois (et ses alertes) puis la détache et la supprime.
+    Les agrégats de supervision sont décrémentés ; le registre des numéros est conservé,
+    un numéro archivé reste donc refusé.
+    """
+    nom = nom_partition(mois)
+    db.execute(text("SELECT pg_advisory_xact_lock(:cle)"), {"cle": CLE_VERROU_PARTITIONS})
+    # Plus d'écriture sur le mois pendant l'export (les lectures restent possibles)
+    db.execute(text(f"LOCK TABLE {nom} IN SHARE MODE"))
+
+    os.makedirs(dossier, exist_ok=True)
+    chemins = {
+        "transactions": os.path.join(dossier, f"transactions_{mois:%Y_%m}.csv.gz"),
+        "alertes": os.path.join(dossier, f"alertes_{mois:%Y_%m}.csv.gz"),
+    }
+    _exporter(db, f"SELECT * FROM {nom} ORDER BY id", chemins["transactions"])
+    _exporter(db, f"SELECT a.* FROM alertes a JOIN {nom} t ON t.id = a.transaction_id ORDER BY a.id",
+              chemins["alertes"])
+
+    supervisionController.retirer_transactions(
+        db, Transaction.date_transaction >= mois, Transaction.date_transaction < mois_suivant(mois)
+    )
+    nb_transactions = db.execute(text(f"SELECT count(*) FROM {nom}")).scalar()
+    nb_alertes = db.execute(text(
+        f"DELETE FROM alertes WHERE transaction_id IN (SELECT id FROM {nom})"
+    )).rowcount
+    db.execute(text(f"ALTER TABLE transactions DETACH PARTITION {nom}"))
+    db.execute(text(f"DROP TABLE {nom}"))
+    signaler(db, TRANSACTIONS)
+    db.commit()
+    logging.info("Partition %s archivée (%s transactions, %s alertes)", nom, nb_transactions, nb_alertes)
+    return {"mois": f"{mois:%Y-%m}", "transactions": nb_transactions, "alertes": nb_alertes, "fichiers": chemins}
+
+
+def archiver(db: Session, mois_conserves: int = ARCHIVES_MOIS_CONSERVES,
+             dossier: str = ARCHIVES_DOSSIER) -> List[Dict]:
+    return [archiver_mois(db, mois, dossier) for mois in mois_a_archiver(db, mois_conserves)]
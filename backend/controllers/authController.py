@@ -1,8 +1,9 @@
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from models import Utilisateur
-from passlib.hash import bcrypt
 from fastapi_jwt_auth import AuthJWT
+from utils import pool_hachage
 from schemas import UtilisateurInscription, UtilisateurConnexion
 from database import SessionLocal
 
@@ -17,28 +18,19 @@ def get_db():
 # ✅ Inscription d’un nouvel utilisateur
 VALID_ROLES = ['client', 'agent', 'service']  # Rôles valides
 
-def inscrire_utilisateur(utilisateur: UtilisateurInscription, db: Session):
-    print(f"[INSCRIPTION] Tentative avec l'email : {utilisateur.email}")
-
+def _verifier_disponibilite(utilisateur: UtilisateurInscription, db: Session):
     # Vérification si l'email est déjà utilisé
-    if db.query(Utilisateur).filter(Utilisateur.email == utilisateur.email).first():
+    if db.query(Utilisateur.id).filter(Utilisateur.email == utilisateur.email).first():
         print("[ERREUR] Email déjà utilisé.")
         raise HTTPException(status_code=400, detail="L'adresse email est déjà utilisée.")
     
     # Vérification si le nom est déjà utilisé
-    if db.query(Utilisateur).filter(Utilisateur.nom == utilisateur.nom).first():
+    if db.query(Utilisateur.id).filter(Utilisateur.nom == utilisateur.nom).first():
         print("[ERREUR] Nom déjà utilisé.")
         raise HTTPException(status_code=400, detail="Le nom est déjà utilisé.")
-    
-    # Validation du rôle (assure-toi que le rôle est parmi ceux définis)
-    if utilisateur.role not in VALID_ROLES:
-        print("[ERREUR] Rôle invalide.")
-        raise HTTPException(status_code=400, detail="Rôle invalide. Les rôles valides sont : client, agent, service.")
-    
-    # Hachage du mot de passe
-    mot_de_passe_hache = bcrypt.hash(utilisateur.mot_de_passe)
-    print("[INFO] Mot de passe haché.")
 
+
+def _enregistrer_utilisateur(utilisateur: UtilisateurInscription, mot_de_passe_hache: str, db: Session):
     # Création du nouvel utilisateur avec le rôle validé
     nouvel_utilisateur = Utilisateur(
         nom=utilisateur.nom,
@@ -51,21 +43,49 @@ def inscrire_utilisateur(utilisateur: UtilisateurInscription, db: Session):
     db.add(nouvel_utilisateur)
     db.commit()
     db.refresh(nouvel_utilisateur)
+    return nouvel_utilisateur
+
+
+# Les accès base passent par le threadpool, le hachage bcrypt par le pool de processus dédié :
+# la boucle asyncio n'est jamais bloquée.
+async def inscrire_utilisateur(utilisateur: UtilisateurInscription, db: Session):
+    print(f"[INSCRIPTION] Tentative avec l'email : {utilisateur.email}")
+
+    await run_in_threadpool(_verifier_disponibilite, utilisateur, db)
+    
+    # Validation du rôle (assure-toi que le rôle est parmi ceux définis)
+    if utilisateur.role not in VALID_ROLES:
+        print("[ERREUR] Rôle invalide.")
+        raise HTTPException(status_code=400, detail="Rôle invalide. Les rôles valides sont : client, agent, service.")
+    
+    # Hachage du mot de passe
+    mot_de_passe_hache = await pool_hachage.hacher_mot_de_passe(utilisateur.mot_de_passe)
+    print("[INFO] Mot de passe haché.")
+
+    nouvel_utilisateur = await run_in_threadpool(_enregistrer_utilisateur, utilisateur, mot_de_passe_hache, db)
 
     print("[SUCCÈS] Nouvel utilisateur inscrit avec succès.")
     return nouvel_utilisateur
 
 # ✅ Connexion d’un utilisateur
-def connexion_utilisateur(utilisateur: UtilisateurConnexion, Authorize: AuthJWT, db: Session):
+def _charger_identifiants(email: str, db: Session):
+    return (
+        db.query(Utilisateur.nom, Utilisateur.email, Utilisateur.role, Utilisateur.mot_de_passe)
+        .filter(Utilisateur.email == email)
+        .first()
+    )
+
+
+async def connexion_utilisateur(utilisateur: UtilisateurConnexion, Authorize: AuthJWT, db: Session):
     print(f"[CONNEXION] Tentative pour l'email : {utilisateur.email}")
 
-    db_utilisateur = db.query(Utilisateur).filter(Utilisateur.email == utilisateur.email).first()
+    db_utilisateur = await run_in_threadpool(_charger_identifiants, utilisateur.email, db)
 
     if not db_utilisateur:
         print("[ERREUR] Utilisateur non trouvé.")
         raise HTTPException(status_code=401, detail="Email ou mot de passe invalide.")
     
-    if not bcrypt.verify(utilisateur.mot_de_passe, db_utilisateur.mot_de_passe):
+    if not await pool_hachage.verifier_mot_de_passe(utilisateur.mot_de_passe, db_utilisateur.mot_de_passe):
         print("[ERREUR] Mot de passe incorrect.")
         raise HTTPException(status_code=401, detail="Email ou mot de passe invalide.")
     
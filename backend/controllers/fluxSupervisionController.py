@@ -0,0 +1,195 @@
+# Flux temps réel de supervision (Server-Sent Events) : GET /supervision/flux.
+import asyncio
+import json
+import logging
+import os
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+
+from controllers import supervisionController
+from database import SessionLocal
+from utils.versions_donnees import TAUX, TRANSACTIONS, versions_donnees
+
+# Battement (commentaire SSE) envoyé après FLUX_BATTEMENT secondes sans événement
+FLUX_BATTEMENT = float(os.getenv("FLUX_BATTEMENT", "15"))
+# Événements en attente par client ; au-delà, le client est resynchronisé par un instantané
+FLUX_FILE_MAX = int(os.getenv("FLUX_FILE_MAX", "32"))
+# Regroupement des écritures rapprochées : au plus un calcul de delta par intervalle
+FLUX_INTERVALLE = float(os.getenv("FLUX_INTERVALLE", "0.5"))
+# Délai de reconnexion suggéré au navigateur (millisecondes)
+FLUX_RECONNEXION_MS = int(os.getenv("FLUX_RECONNEXION_MS", "3000"))
+
+# Marqueur déposé dans la file d'un client débordé : renvoyer un instantané complet
+_RESYNCHRONISER = None
+
+
+def lire_etat() -> Tuple[Dict, List[Dict]]:
+    db = SessionLocal()
+    try:
+        return supervisionController.lire_agregats(db), supervisionController.transactions_avec_taux(db)
+    finally:
+        db.close()
+
+
+def _agregats_par_cle(agregats: Dict) -> Dict[str, Dict[str, Tuple[int, float]]]:
+    return {dimension: {cle: (nombre, montant) for cle, nombre, montant in lignes}
+            for dimension, lignes in agregats.items()}
+
+
+def calculer_delta(avant: Tuple[Dict, List[Dict]], apres: Tuple[Dict, List[Dict]]) -> Optional[Dict]:
+    """
+    Même forme que /supervision/resume, réduite à ce qui a changé : groupes modifiés (un groupe
+    disparu revient à 0), transactions nouvelles ou modifiées, et ids sortis de la liste.
+    None si rien n'a changé.
+    """
+    agregats_avant, agregats_apres = _agregats_par_cle(avant[0]), _agregats_par_cle(apres[0])
+    modifies = {}
+    for dimension in supervisionController.DIMENSIONS:
+        anciens, nouveaux = agregats_avant.get(dimension, {}), agregats_apres.get(dimension, {})
+        modifies[dimension] = [
+            (cle, *nouveaux.get(cle, (0, 0.0)))
+            for cle in sorted(anciens.keys() | nouveaux.keys())
+            if anciens.get(cle) != nouveaux.get(cle)
+        ]
+    transactions_avant = {t["id"]: t for t in avant[1]}
+    transactions = [t for t in apres[1] if transactions_avant.get(t["id"]) != t]
+    retirees = sorted(transactions_avant.keys() - {t["id"] for t in apres[1]})
+    if not transactions and not retirees and not any(modifies.values()):
+        return None
+    delta = supervisionController.formater_resume(modifies, transactions)
+    delta["transactions_retirees"] = retirees
+    return delta
+
+
+def evenement_sse(nom: str, identifiant: int, donnees: Dict) -> str:
+    corps = json.dumps(jsonable_encoder(donnees), ensure_ascii=False, separators=(",", ":"))
+    return f"event: {nom}\nid: {identifiant}\ndata: {corps}\n\n"
+
+
+class DiffuseurSupervision:
+    """
+    Un calcul par worker et par changement, quel que soit le nombre de tableaux ouverts :
+    à chaque nouvelle version (écriture locale ou NOTIFY d'un autre worker), l'état est relu
+    (O(groupes) + LIMITE_TRANSACTIONS_AVEC_TAUX lignes), comparé au précédent, et le delta
+    encodé une fois puis déposé dans la file bornée de chaque client.
+
+    Un client trop lent pour vider sa file n'accumule pas de retard en mémoire : sa file est
+    vidée et il reçoit l'instantané courant à la place des deltas manqués.
+    """
+
+    def __init__(self):
+        self._abonnes: Set[asyncio.Queue] = set()
+        self._etat: Optional[Tuple[Dict, List[Dict]]] = None
+        self._instantane: Optional[str] = None
+        self.sequence = 0
+        self._changement: Optional[asyncio.Event] = None
+        self._boucle: Optional[asyncio.AbstractEventLoop] = None
+        self._tache: Optional[asyncio.Task] = None
+        self._verrou: Optional[asyncio.Lock] = None
+        self.evenements = 0
+        self.resynchronisations = 0
+        for famille in (TRANSACTIONS, TAUX):
+            versions_donnees.abonner(famille, self._signaler)
+
+    def _signaler(self) -> None:
+        # Appelé depuis n'importe quel thread (commit local, écoute NOTIFY)
+        if self._boucle is not None and self._changement is not None:
+            self._boucle.call_soon_threadsafe(self._changement.set)
+
+    def _demarrer(self) -> None:
+        if self._tache is None or self._tache.done():
+            self._boucle = asyncio.get_running_loop()
+            self._changement = asyncio.Event()
+            self._verrou = asyncio.Lock()
+            self._etat = self._instantane = None
+            self._tache = asyncio.create_task(self._boucle_diffusion())
+
+    def arreter(self) -> None:
+        if self._tache is not None:
+            self._tache.cancel()
+        self._tache = self._boucle = self._changement = None
+
+    async def _charger(self) -> None:
+        self._etat = await run_in_threadpool(lire_etat)
+        self._instantane = None
+        self.sequence += 1
+
+    def instantane(self) -> str:
+        if self._instantane is None:
+            self._instantane = evenement_sse(
+                "instantane", self.sequence, supervisionController.formater_resume(*self._etat)
+            )
+        return self._instantane
+
+    async def _boucle_diffusion(self) -> None:
+        while True:
+            await self._changement.wait()
+            await asyncio.sleep(FLUX_INTERVALLE)
+            self._changement.clear()
+            if not self._abonnes:
+                self._etat = self._instantane = None  # relu à la prochaine connexion
+                continue
+            try:
+                async with self._verrou:
+                    avant = self._etat
+                    await self._charger()
+                    delta = calculer_delta(avant, self._etat) if avant is not None else None
+                    if delta is not None:
+                        self._publier(evenement_sse("delta", self.sequence, delta))
+            except Exception:
+                logging.exception("Flux de supervision : calcul du delta échoué")
+
+    def _publier(self, message: str) -> None:
+        self.evenements += 1
+        for file in self._abonnes:
+            try:
+                file.put_nowait(message)
+            except asyncio.QueueFull:
+                # Client lent : deltas abandonnés, instantané complet au prochain envoi
+                while not file.empty():
+                    file.get_nowait()
+                file.put_nowait(_RESYNCHRONISER)
+                self.resynchronisations += 1
+
+    async def abonner(self) -> Tuple[asyncio.Queue, str]:
+        """File du client et instantané de départ (cohérent avec les deltas qui suivront)."""
+        self._demarrer()
+        async with self._verrou:
+            if self._etat is None:
+                await self._charger()
+            file: asyncio.Queue = asyncio.Queue(maxsize=FLUX_FILE_MAX)
+            self._abonnes.add(file)
+            return file, self.instantane()
+
+    def desabonner(self, file: asyncio.Queue) -> None:
+        self._abonnes.discard(file)
+
+    async def flux(self, request: Request) -> AsyncIterator[str]:
+        file, instantane = await self.abonner()
+        try:
+            yield f"retry: {FLUX_RECONNEXION_MS}\n" + instantane
+            while True:
+                try:
+                    message = await asyncio.wait_for(file.get(), FLUX_BATTEMENT)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": battement\n\n"
+                    continue
+                yield self.instantane() if message is _RESYNCHRONISER else message
+        finally:
+            self.desabonner(file)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "abonnes": len(self._abonnes),
+            "en_attente": sum(file.qsize() for file in self._abonnes),
+            "evenements": self.evenements,
+            "resynchronisations": self.resynchronisations,
+        }
+
+
+diffuseur = DiffuseurSupervision()
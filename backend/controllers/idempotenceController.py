@@ -0,0 +1,166 @@
+# Clés d'idempotence (en-tête Idempotency-Key) de POST /transactions/.
+#
+# La clé est réservée par un INSERT ... ON CONFLICT DO NOTHING dans la transaction qui crée
+# la transaction métier, et la réponse y est enregistrée avant le commit :
+#   - réservation obtenue → la requête s'exécute normalement ;
+#   - clé déjà validée → la réponse d'origine est rejouée, sans toucher à transactions ;
+#   - même clé en cours dans une autre requête → l'INSERT attend la fin de celle-ci
+#     (verrou de l'index unique), puis rejoue sa réponse ou, si elle a échoué, prend la main.
+# Une erreur (4xx/5xx) annule la réservation : le client peut réessayer avec la même clé.
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import CleIdempotence
+
+# Durée de conservation d'une réponse (secondes)
+IDEMPOTENCE_DUREE = float(os.getenv("IDEMPOTENCE_DUREE", "86400"))
+# Attente maximale d'une requête concurrente portant la même clé (valeur PostgreSQL)
+IDEMPOTENCE_ATTENTE = os.getenv("IDEMPOTENCE_ATTENTE", "10s")
+LONGUEUR_MAX_CLE = 255
+
+# lock_not_available : lock_timeout atteint
+_VERROU_INDISPONIBLE = "55P03"
+
+stats = {"reservees": 0, "rejouees": 0, "attentes_expirees": 0}
+
+
+def empreinte(corps: BaseModel) -> str:
+    return hashlib.sha256(corps.json().encode()).hexdigest()
+
+
+def verifier_cle(cle: str) -> str:
+    cle = cle.strip()
+    if not cle or len(cle) > LONGUEUR_MAX_CLE:
+        raise HTTPException(status_code=400,
+                            detail=f"Idempotency-Key doit contenir de 1 à {LONGUEUR_MAX_CLE} caractères.")
+    return cle
+
+
+# -------------------- Requêtes (partagées sync / async) --------------------
+def _requete_expiree(utilisateur_id: int, cle: str):
+    return delete(CleIdempotence).where(
+        CleIdempotence.utilisateur_id == utilisateur_id,
+        CleIdempotence.cle == cle,
+        CleIdempotence.expire_a <= datetime.utcnow(),
+    )
+
+
+def _requete_reservation(utilisateur_id: int, cle: str, empreinte_requete: str):
+    maintenant = datetime.utcnow()
+    return (
+        pg_insert(CleIdempotence)
+        .values(utilisateur_id=utilisateur_id, cle=cle, empreinte=empreinte_requete,
+                cree_a=maintenant, expire_a=maintenant + timedelta(seconds=IDEMPOTENCE_DUREE))
+        .on_conflict_do_nothing(index_elements=[CleIdempotence.utilisateur_id, CleIdempotence.cle])
+        .returning(CleIdempotence.cle)
+    )
+
+
+def _requete_lecture(utilisateur_id: int, cle: str):
+    return select(CleIdempotence.empreinte, CleIdempotence.code_http, CleIdempotence.corps).where(
+        CleIdempotence.utilisateur_id == utilisateur_id, CleIdempotence.cle == cle
+    )
+
+
+_ATTENTE = text(f"SET LOCAL lock_timeout = '{IDEMPOTENCE_ATTENTE}'")
+_FIN_ATTENTE = text("SET LOCAL lock_timeout TO DEFAULT")
+
+
+def _reponse_rejouee(ligne, empreinte_requete: str) -> Response:
+    if ligne.empreinte != empreinte_requete:
+        raise HTTPException(status_code=422,
+                            detail="Idempotency-Key déjà utilisée pour une requête différente.")
+    stats["rejouees"] += 1
+    return Response(content=ligne.corps, status_code=ligne.code_http, media_type="application/json",
+                    headers={"Idempotent-Replayed": "true"})
+
+
+def _attente_expiree(erreur: DBAPIError) -> bool:
+    return getattr(erreur.orig, "pgcode", None) == _VERROU_INDISPONIBLE
+
+
+def _en_cours() -> HTTPException:
+    stats["attentes_expirees"] += 1
+    return HTTPException(status_code=409, detail="Une requête avec cette Idempotency-Key est en cours.",
+                         headers={"Retry-After": "1"})
+
+
+def corps_reponse(contenu, modele) -> str:
+    """Corps JSON tel que FastAPI l'écrirait pour response_model=modele."""
+    return JSONResponse(content=jsonable_encoder(modele.from_orm(contenu))).body.decode()
+
+
+def _requete_enregistrement(utilisateur_id: int, cle: str, code_http: int, corps: str):
+    return (
+        update(CleIdempotence)
+        .where(CleIdempotence.utilisateur_id == utilisateur_id, CleIdempotence.cle == cle)
+        .values(code_http=code_http, corps=corps)
+    )
+
+
+# -------------------- Session synchrone --------------------
+def reserver(db: Session, utilisateur_id: int, cle: str, empreinte_requete: str) -> Optional[Response]:
+    """None si la clé est réservée pour cette requête, sinon la réponse d'origine à rejouer."""
+    db.execute(_requete_expiree(utilisateur_id, cle))
+    db.execute(_ATTENTE)
+    try:
+        reservee = db.execute(_requete_reservation(utilisateur_id, cle, empreinte_requete)).first()
+    except DBAPIError as e:
+        if not _attente_expiree(e):
+            raise
+        db.rollback()
+        raise _en_cours()
+    db.execute(_FIN_ATTENTE)
+    if reservee is not None:
+        stats["reservees"] += 1
+        return None
+    return _reponse_rejouee(db.execute(_requete_lecture(utilisateur_id, cle)).one(), empreinte_requete)
+
+
+def enregistrer(db: Session, utilisateur_id: int, cle: str, code_http: int, corps: str) -> None:
+    db.execute(_requete_enregistrement(utilisateur_id, cle, code_http, corps))
+
+
+def purger(db: Session) -> int:
+    supprimees = db.execute(delete(CleIdempotence).where(CleIdempotence.expire_a <= datetime.utcnow())).rowcount
+    db.commit()
+    return supprimees
+
+
+# -------------------- AsyncSession (DB_ASYNC=1) --------------------
+async def reserver_async(db: AsyncSession, utilisateur_id: int, cle: str,
+                         empreinte_requete: str) -> Optional[Response]:
+    await db.execute(_requete_expiree(utilisateur_id, cle))
+    await db.execute(_ATTENTE)
+    try:
+        reservee = (await db.execute(_requete_reservation(utilisateur_id, cle, empreinte_requete))).first()
+    except DBAPIError as e:
+        if not _attente_expiree(e):
+            raise
+        await db.rollback()
+        raise _en_cours()
+    await db.execute(_FIN_ATTENTE)
+    if reservee is not None:
+        stats["reservees"] += 1
+        return None
+    return _reponse_rejouee((await db.execute(_requete_lecture(utilisateur_id, cle))).one(), empreinte_requete)
+
+
+async def enregistrer_async(db: AsyncSession, utilisateur_id: int, cle: str, code_http: int, corps: str) -> None:
+    await db.execute(_requete_enregistrement(utilisateur_id, cle, code_http, corps))
+
+
+def statistiques() -> Dict[str, int]:
+    return dict(stats)
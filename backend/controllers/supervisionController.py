@@ -1,58 +1,324 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
-from models import Transaction
-from typing import Dict
+from datetime import datetime
+from sqlalchemy.orm import Session
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from models import Transaction, TauxChange, SupervisionAgregat, SupervisionHeure, SupervisionJour
+from typing import Dict, List, Optional, Tuple
 
-def tableau_de_bord_supervision(db: Session) -> Dict:
-    # 🔹 Total par service
-    total_par_service_raw = db.query(
-        Transaction.service,
-        func.sum(Transaction.montant)
-    ).group_by(Transaction.service).all()
+DIMENSIONS = ("service", "devise", "statut")
+
+# Séries temporelles : une table de compteurs par granularité
+TABLES_SERIES = {"heure": SupervisionHeure, "jour": SupervisionJour}
+GRANULARITES = tuple(TABLES_SERIES)
+
+# Nombre de transactions récentes renvoyées avec leur taux (le tableau n'en affiche pas plus)
+LIMITE_TRANSACTIONS_AVEC_TAUX = 200
+
+
+# 🔹 État d'une transaction vu par les agrégats : (service, devise, statut, montant, date_transaction)
+def etat_transaction(transaction: Transaction) -> Tuple[str, str, str, float, Optional[datetime]]:
+    statut = transaction.statut or "en attente"
+    return (
+        transaction.service,
+        transaction.devise,
+        str(getattr(statut, "value", statut)),
+        float(transaction.montant or 0.0),
+        transaction.date_transaction,
+    )
+
+
+def debut_periode(date: datetime, granularite: str) -> datetime:
+    if granularite == "jour":
+        return date.replace(hour=0, minute=0, second=0, microsecond=0)
+    return date.replace(minute=0, second=0, microsecond=0)
+
+
+def ajouter_delta(deltas: Dict, cles: Tuple[str, str, str], nombre: int, montant: float,
+                  date_transaction: Optional[datetime] = None) -> None:
+    """
+    Cumule un delta : clés (dimension, cle) pour les totaux, et
+    (granularite, debut, service, devise, statut) pour les séries si la date est connue.
+    """
+    for dimension, cle in zip(DIMENSIONS, cles):
+        courant = deltas.setdefault((dimension, cle), [0, 0.0])
+        courant[0] += nombre
+        courant[1] += montant
+    if date_transaction is not None:
+        for granularite in GRANULARITES:
+            courant = deltas.setdefault((granularite, debut_periode(date_transaction, granularite), *cles), [0, 0.0])
+            courant[0] += nombre
+            courant[1] += montant
+
+
+def _upsert_compteurs(table, lignes: List[Dict], index_elements: List[str]):
+    stmt = pg_insert(table).values(lignes)
+    return stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={
+            "nombre": table.nombre + stmt.excluded.nombre,
+            "montant_total": table.montant_total + stmt.excluded.montant_total,
+        },
+    )
+
+
+def requetes_deltas(deltas: Dict) -> List:
+    """
+    UPSERT par table pour les deltas cumulés par ajouter_delta (liste vide si rien à appliquer).
+    À exécuter avant le commit de l'écriture, pour rester dans la même transaction SQL.
+    """
+    totaux: List[Dict] = []
+    series: Dict[str, List[Dict]] = {granularite: [] for granularite in GRANULARITES}
+    for cle, (nombre, montant) in deltas.items():
+        if not (nombre or montant):
+            continue
+        if len(cle) == 2:
+            totaux.append({"dimension": cle[0], "cle": cle[1], "nombre": nombre, "montant_total": montant})
+        else:
+            granularite, debut, service, devise, statut = cle
+            series[granularite].append({"debut": debut, "service": service, "devise": devise,
+                                        "statut": statut, "nombre": nombre, "montant_total": montant})
+
+    # Ordre fixe des lignes (et des tables) : pas de deadlock entre écritures concurrentes
+    requetes = []
+    if totaux:
+        totaux.sort(key=lambda l: (l["dimension"], l["cle"]))
+        requetes.append(_upsert_compteurs(SupervisionAgregat, totaux, ["dimension", "cle"]))
+    for granularite, table in TABLES_SERIES.items():
+        lignes = sorted(series[granularite], key=lambda l: (l["debut"], l["service"], l["devise"], l["statut"]))
+        if lignes:
+            requetes.append(_upsert_compteurs(table, lignes, ["debut", "service", "devise", "statut"]))
+    return requetes
+
+
+def appliquer_deltas(db: Session, deltas: Dict) -> None:
+    for stmt in requetes_deltas(deltas):
+        db.execute(stmt)
+
+
+def calculer_delta(avant: Optional[Tuple], apres: Optional[Tuple]) -> Dict:
+    """avant=None pour une création, apres=None pour une suppression."""
+    deltas: Dict = {}
+    if avant == apres:
+        return deltas
+    if avant:
+        ajouter_delta(deltas, avant[:3], -1, -avant[3], avant[4])
+    if apres:
+        ajouter_delta(deltas, apres[:3], 1, apres[3], apres[4])
+    return deltas
+
+
+def appliquer_delta(db: Session, avant: Optional[Tuple], apres: Optional[Tuple]) -> None:
+    appliquer_deltas(db, calculer_delta(avant, apres))
+
+
+# 🔹 Retire des agrégats toutes les transactions d'un taux (suppression en cascade)
+def retirer_transactions_du_taux(db: Session, taux_id: int) -> None:
+    retirer_transactions(db, Transaction.taux_change_id == taux_id)
+
+
+# 🔹 Retire des agrégats les transactions qui vérifient les critères (avant suppression ou archivage)
+def retirer_transactions(db: Session, *criteres) -> None:
+    heure = func.date_trunc("hour", Transaction.date_transaction)
+    groupes = (
+        db.query(
+            Transaction.service,
+            Transaction.devise,
+            Transaction.statut,
+            heure,
+            func.count(Transaction.id),
+            func.coalesce(func.sum(Transaction.montant), 0),
+        )
+        .filter(*criteres)
+        .group_by(Transaction.service, Transaction.devise, Transaction.statut, heure)
+        .all()
+    )
+    deltas: Dict = {}
+    for service, devise, statut, debut, nombre, montant in groupes:
+        ajouter_delta(deltas, (service, devise, statut or "en attente"), -int(nombre), -float(montant), debut)
+    appliquer_deltas(db, deltas)
+
+
+# 🔁 Recalcul complet depuis la table transactions
+def reconstruire_agregats(db: Session) -> int:
+    # Bloque les écritures concurrentes le temps du recalcul (les lectures restent possibles)
+    db.execute(text("LOCK TABLE transactions IN SHARE MODE"))
+    db.query(SupervisionAgregat).delete(synchronize_session=False)
+
+    nb_lignes = 0
+    for dimension in DIMENSIONS:
+        colonne = getattr(Transaction, dimension)
+        cle = func.coalesce(colonne, "en attente") if dimension == "statut" else colonne
+        groupes = (
+            db.query(cle, func.count(Transaction.id), func.coalesce(func.sum(Transaction.montant), 0))
+            .group_by(cle)
+            .all()
+        )
+        for valeur, nombre, montant in groupes:
+            db.add(SupervisionAgregat(
+                dimension=dimension, cle=valeur, nombre=int(nombre), montant_total=float(montant)
+            ))
+            nb_lignes += 1
+
+    nb_lignes += remplir_series(db)
+    db.commit()
+    return nb_lignes
+
+
+def remplir_series(db: Session) -> int:
+    """Séries horaires recalculées en SQL depuis transactions, séries journalières depuis les heures."""
+    statut = func.coalesce(Transaction.statut, "en attente")
+    heure = func.date_trunc("hour", Transaction.date_transaction)
+    for table in TABLES_SERIES.values():
+        db.query(table).delete(synchronize_session=False)
+
+    db.execute(insert(SupervisionHeure).from_select(
+        ["debut", "service", "devise", "statut", "nombre", "montant_total"],
+        select(heure, Transaction.service, Transaction.devise, statut,
+               func.count(Transaction.id), func.coalesce(func.sum(Transaction.montant), 0))
+        .where(Transaction.date_transaction.isnot(None))
+        .group_by(heure, Transaction.service, Transaction.devise, statut),
+    ))
+    jour = func.date_trunc("day", SupervisionHeure.debut)
+    db.execute(insert(SupervisionJour).from_select(
+        ["debut", "service", "devise", "statut", "nombre", "montant_total"],
+        select(jour, SupervisionHeure.service, SupervisionHeure.devise, SupervisionHeure.statut,
+               func.sum(SupervisionHeure.nombre), func.sum(SupervisionHeure.montant_total))
+        .group_by(jour, SupervisionHeure.service, SupervisionHeure.devise, SupervisionHeure.statut),
+    ))
+    return sum(db.query(table).count() for table in TABLES_SERIES.values())
+
+
+def agregats_vides(db: Session) -> bool:
+    return (
+        db.query(SupervisionAgregat.dimension).first() is None
+        or db.query(SupervisionHeure.debut).first() is None
+    )
 
+
+# 🔹 Lecture des agrégats : O(nombre de groupes)
+def requete_agregats():
+    return (
+        select(SupervisionAgregat.dimension, SupervisionAgregat.cle,
+               SupervisionAgregat.nombre, SupervisionAgregat.montant_total)
+        .where(SupervisionAgregat.nombre > 0)
+        .order_by(SupervisionAgregat.dimension, SupervisionAgregat.cle)
+    )
+
+
+def formater_agregats(lignes) -> Dict[str, List[Tuple[str, int, float]]]:
+    resultat: Dict[str, List[Tuple[str, int, float]]] = {dimension: [] for dimension in DIMENSIONS}
+    for dimension, cle, nombre, montant_total in lignes:
+        resultat[dimension].append((cle, int(nombre), round(float(montant_total), 2)))
+    return resultat
+
+
+def lire_agregats(db: Session) -> Dict[str, List[Tuple[str, int, float]]]:
+    return formater_agregats(db.execute(requete_agregats()).all())
+
+
+# 📈 Séries temporelles : lecture des périodes [debut, fin[ dans la table de la granularité
+def requete_serie(granularite: str, debut: datetime, fin: datetime,
+                  service: Optional[str] = None, devise: Optional[str] = None, statut: Optional[str] = None):
+    table = TABLES_SERIES[granularite]
+    stmt = (
+        select(table.debut, table.service, table.devise, table.statut, table.nombre, table.montant_total)
+        .where(table.debut >= debut_periode(debut, granularite), table.debut < fin, table.nombre != 0)
+        .order_by(table.debut, table.service, table.devise, table.statut)
+    )
+    for colonne, valeur in (("service", service), ("devise", devise), ("statut", statut)):
+        if valeur is not None:
+            stmt = stmt.where(getattr(table, colonne) == valeur)
+    return stmt
+
+
+def formater_serie(granularite: str, debut: datetime, fin: datetime, lignes) -> Dict:
+    points: Dict[datetime, Dict] = {}
+    for periode, service, devise, statut, nombre, montant_total in lignes:
+        point = points.setdefault(periode, {"periode": periode, "nombre": 0, "montant_total": 0.0, "details": []})
+        point["nombre"] += int(nombre)
+        point["montant_total"] += float(montant_total)
+        point["details"].append({
+            "service": service, "devise": devise, "statut": statut,
+            "nombre": int(nombre), "montant_total": round(float(montant_total), 2),
+        })
+    for point in points.values():
+        point["montant_total"] = round(point["montant_total"], 2)
+    return {"granularite": granularite, "debut": debut, "fin": fin, "points": list(points.values())}
+
+
+def lire_serie(db: Session, granularite: str, debut: datetime, fin: datetime, **filtres) -> Dict:
+    return formater_serie(granularite, debut, fin, db.execute(requete_serie(granularite, debut, fin, **filtres)).all())
+
+
+# 🔹 Transactions récentes avec leur taux (colonnes seulement, sans charger les objets ORM)
+def requete_transactions_avec_taux(limite: int = LIMITE_TRANSACTIONS_AVEC_TAUX):
+    return (
+        select(
+            Transaction.id,
+            Transaction.numero_transaction,
+            Transaction.montant,
+            Transaction.devise,
+            Transaction.service,
+            Transaction.statut,
+            Transaction.date_transaction,
+            TauxChange.taux,
+        )
+        .join(TauxChange, Transaction.taux_change_id == TauxChange.id)
+        .order_by(Transaction.date_transaction.desc(), Transaction.id.desc())
+        .limit(limite)
+    )
+
+
+def formater_transactions_avec_taux(lignes) -> List[Dict]:
+    return [
+        {
+            "numero_transaction": numero,
+            "montant": float(montant) if montant is not None else 0.0,
+            "devise": devise,
+            "service": service,
+            "statut": statut,
+            "date_transaction": date_transaction,
+            "taux_change": taux,
+            "id": transaction_id,
+        }
+        for transaction_id, numero, montant, devise, service, statut, date_transaction, taux in lignes
+    ]
+
+
+def transactions_avec_taux(db: Session, limite: int = LIMITE_TRANSACTIONS_AVEC_TAUX) -> List[Dict]:
+    return formater_transactions_avec_taux(db.execute(requete_transactions_avec_taux(limite)).all())
+
+
+def formater_tableau_de_bord(agregats: Dict, transactions: List[Dict]) -> Dict:
+    # 🔹 Total par service
     total_par_service = [
-        {"service": service, "total": float(total) if total else 0.0}
-        for service, total in total_par_service_raw
+        {"service": service, "total": montant}
+        for service, _, montant in agregats["service"]
     ]
 
     # 🔹 Total par devise
-    total_par_devise_raw = db.query(
-        Transaction.devise,
-        func.sum(Transaction.montant)
-    ).group_by(Transaction.devise).all()
-
     total_par_devise = [
-        {"devise": devise, "total": float(total) if total else 0.0}
-        for devise, total in total_par_devise_raw
+        {"devise": devise, "total": montant}
+        for devise, _, montant in agregats["devise"]
     ]
 
     # 🔹 Total par statut
-    total_par_statut_raw = db.query(
-        Transaction.statut,
-        func.count(Transaction.id)
-    ).group_by(Transaction.statut).all()
-
     total_par_statut = [
-        {"statut": statut, "nombre": count}
-        for statut, count in total_par_statut_raw
+        {"statut": statut, "nombre": nombre}
+        for statut, nombre, _ in agregats["statut"]
     ]
 
     # 🔹 Transactions avec taux de change
-    transactions_avec_taux = db.query(Transaction)\
-        .options(joinedload(Transaction.taux_change))\
-        .filter(Transaction.taux_change_id.isnot(None))\
-        .filter(Transaction.taux_change != None)\
-        .all()
-
-    transactions_details = []
-    for t in transactions_avec_taux:
-        transactions_details.append({
-            "numero_transaction": t.numero_transaction,
-            "montant": t.montant,
-            "devise": t.devise,
-            "service": t.service,
-            "taux_change": t.taux_change.taux if t.taux_change else None
-        })
+    transactions_details = [
+        {
+            "numero_transaction": t["numero_transaction"],
+            "montant": t["montant"],
+            "devise": t["devise"],
+            "service": t["service"],
+            "taux_change": t["taux_change"]
+        }
+        for t in transactions
+    ]
 
     return {
         "total_par_service": total_par_service,
@@ -60,3 +326,36 @@ def tableau_de_bord_supervision(db: Session) -> Dict:
         "total_par_statut": total_par_statut,
         "transactions_avec_taux": transactions_details
     }
+
+
+# 🔹 Format de /supervision/resume
+def formater_resume(agregats: Dict, transactions: List[Dict]) -> Dict:
+    return {
+        "total_par_service": [
+            {
+                "service": service,
+                "nombre": nombre,
+                "montant_total": montant_total,
+            }
+            for service, nombre, montant_total in agregats["service"]
+        ],
+        "total_par_devise": [
+            {
+                "devise": devise,
+                "montant_total": montant_total,
+            }
+            for devise, _, montant_total in agregats["devise"]
+        ],
+        "total_par_statut": [
+            {
+                "statut": statut,
+                "nombre": nombre,
+            }
+            for statut, nombre, _ in agregats["statut"]
+        ],
+        "transactions_avec_taux": transactions,
+    }
+
+
+def tableau_de_bord_supervision(db: Session) -> Dict:
+    return formater_tableau_de_bord(lire_agregats(db), transactions_avec_taux(db))
@@ -0,0 +1,44 @@
+# Variantes asynchrones (AsyncSession, DB_ASYNC=1) de supervisionController.
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from controllers.supervisionController import (
+    LIMITE_TRANSACTIONS_AVEC_TAUX,
+    calculer_delta,
+    formater_agregats,
+    formater_serie,
+    formater_tableau_de_bord,
+    formater_transactions_avec_taux,
+    requete_agregats,
+    requete_serie,
+    requetes_deltas,
+    requete_transactions_avec_taux,
+)
+
+
+async def appliquer_deltas(db: AsyncSession, deltas: Dict) -> None:
+    for stmt in requetes_deltas(deltas):
+        await db.execute(stmt)
+
+
+async def appliquer_delta(db: AsyncSession, avant: Optional[Tuple], apres: Optional[Tuple]) -> None:
+    await appliquer_deltas(db, calculer_delta(avant, apres))
+
+
+async def lire_agregats(db: AsyncSession) -> Dict[str, List[Tuple[str, int, float]]]:
+    return formater_agregats((await db.execute(requete_agregats())).all())
+
+
+async def lire_serie(db: AsyncSession, granularite: str, debut: datetime, fin: datetime, **filtres) -> Dict:
+    lignes = (await db.execute(requete_serie(granularite, debut, fin, **filtres))).all()
+    return formater_serie(granularite, debut, fin, lignes)
+
+
+async def transactions_avec_taux(db: AsyncSession, limite: int = LIMITE_TRANSACTIONS_AVEC_TAUX) -> List[Dict]:
+    return formater_transactions_avec_taux((await db.execute(requete_transactions_avec_taux(limite))).all())
+
+
+async def tableau_de_bord_supervision(db: AsyncSession) -> Dict:
+    return formater_tableau_de_bord(await lire_agregats(db), await transactions_avec_taux(db))
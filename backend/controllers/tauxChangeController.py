@@ -2,11 +2,14 @@ from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from models import TauxChange
 from schemas import TauxChangeCreate
+from controllers import supervisionController
+from utils.cache_taux import cache_taux
+from utils.versions_donnees import TAUX, TRANSACTIONS, signaler
 from datetime import datetime
 
 
-# ✅ Créer un taux de change avec validations solides
-def creer_taux_change(taux_data: TauxChangeCreate, db: Session):
+# 🔧 Validation commune création / mise à jour : (source, cible) en majuscules
+def normaliser_devises(taux_data: TauxChangeCreate):
     source = taux_data.devise_source.strip().upper()
     cible = taux_data.devise_cible.strip().upper()
 
@@ -16,6 +19,13 @@ def creer_taux_change(taux_data: TauxChangeCreate, db: Session):
     if taux_data.taux <= 0:
         raise HTTPException(status_code=400, detail="Le taux doit être strictement supérieur à 0.")
 
+    return source, cible
+
+
+# ✅ Créer un taux de change avec validations solides
+def creer_taux_change(taux_data: TauxChangeCreate, db: Session):
+    source, cible = normaliser_devises(taux_data)
+
     existant = db.query(TauxChange).filter(
         TauxChange.devise_source == source,
         TauxChange.devise_cible == cible
@@ -31,14 +41,16 @@ def creer_taux_change(taux_data: TauxChangeCreate, db: Session):
         date_enregistrement=datetime.utcnow()
     )
     db.add(nouveau_taux)
+    signaler(db, TAUX)
     db.commit()
     db.refresh(nouveau_taux)
+    cache_taux.recharger()
     return nouveau_taux
 
 
-# ✅ Lister tous les taux de change
-def lister_taux_change(db: Session):
-    taux_list = db.query(TauxChange).order_by(TauxChange.date_enregistrement.desc()).all()
+# ✅ Lister tous les taux de change (depuis le cache, déjà trié)
+def lister_taux_change():
+    taux_list = cache_taux.lister()
     if not taux_list:
         raise HTTPException(status_code=404, detail="Aucun taux de change disponible.")
     return taux_list
@@ -46,14 +58,7 @@ def lister_taux_change(db: Session):
 
 # ✅ Mettre à jour un taux existant avec validation
 def mettre_a_jour_taux(taux_id: int, taux_data: TauxChangeCreate, db: Session):
-    source = taux_data.devise_source.strip().upper()
-    cible = taux_data.devise_cible.strip().upper()
-
-    if source == cible:
-        raise HTTPException(status_code=400, detail="Les devises source et cible doivent être différentes.")
-
-    if taux_data.taux <= 0:
-        raise HTTPException(status_code=400, detail="Le taux doit être strictement supérieur à 0.")
+    source, cible = normaliser_devises(taux_data)
 
     taux = db.query(TauxChange).filter(TauxChange.id == taux_id).first()
     if not taux:
@@ -64,8 +69,10 @@ def mettre_a_jour_taux(taux_id: int, taux_data: TauxChangeCreate, db: Session):
     taux.taux = taux_data.taux
     taux.date_enregistrement = datetime.utcnow()
 
+    signaler(db, TAUX)
     db.commit()
     db.refresh(taux)
+    cache_taux.recharger()
     return taux
 
 
@@ -75,6 +82,10 @@ def supprimer_taux(taux_id: int, db: Session):
     if not taux:
         raise HTTPException(status_code=404, detail="Taux de change non trouvé.")
 
+    # Les transactions liées partent en cascade : on les retire des agrégats dans la même transaction
+    supervisionController.retirer_transactions_du_taux(db, taux_id)
     db.delete(taux)
+    signaler(db, TAUX, TRANSACTIONS)
     db.commit()
+    cache_taux.recharger()
     return {"message": "Taux de change supprimé avec succès."}
@@ -0,0 +1,71 @@
+# Variantes asynchrones (AsyncSession, DB_ASYNC=1) de tauxChangeController.
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import TauxChange
+from schemas import TauxChangeCreate
+from controllers import tauxChangeController
+from controllers.tauxChangeController import normaliser_devises
+from utils.cache_taux import cache_taux
+from utils.versions_donnees import TAUX, signaler_async
+
+
+# ✅ Créer un taux de change
+async def creer_taux_change(taux_data: TauxChangeCreate, db: AsyncSession):
+    source, cible = normaliser_devises(taux_data)
+
+    existant = (await db.execute(
+        select(TauxChange.id).where(TauxChange.devise_source == source, TauxChange.devise_cible == cible)
+    )).first()
+    if existant:
+        raise HTTPException(status_code=409, detail="Ce taux de change existe déjà.")
+
+    nouveau_taux = TauxChange(
+        devise_source=source,
+        devise_cible=cible,
+        taux=taux_data.taux,
+        date_enregistrement=datetime.utcnow()
+    )
+    db.add(nouveau_taux)
+    await signaler_async(db, TAUX)
+    await db.commit()
+    await db.refresh(nouveau_taux)
+    await cache_taux.recharger_async()
+    return nouveau_taux
+
+
+# ✅ Lister tous les taux de change (depuis le cache)
+async def lister_taux_change():
+    taux_list = (await cache_taux.instantane_async()).liste
+    if not taux_list:
+        raise HTTPException(status_code=404, detail="Aucun taux de change disponible.")
+    return taux_list
+
+
+# ✅ Mettre à jour un taux existant
+async def mettre_a_jour_taux(taux_id: int, taux_data: TauxChangeCreate, db: AsyncSession):
+    source, cible = normaliser_devises(taux_data)
+
+    taux = await db.get(TauxChange, taux_id)
+    if not taux:
+        raise HTTPException(status_code=404, detail="Taux de change non trouvé.")
+
+    taux.devise_source = source
+    taux.devise_cible = cible
+    taux.taux = taux_data.taux
+    taux.date_enregistrement = datetime.utcnow()
+
+    await signaler_async(db, TAUX)
+    await db.commit()
+    await db.refresh(taux)
+    await cache_taux.recharger_async()
+    return taux
+
+
+# ✅ Supprimer un taux : la suppression en cascade des transactions (relation ORM)
+#    réutilise le code synchrone, exécuté sur la session sous-jacente via run_sync.
+async def supprimer_taux(taux_id: int, db: AsyncSession):
+    return await db.run_sync(lambda session: tauxChangeController.supprimer_taux(taux_id, session))
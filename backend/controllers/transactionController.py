@@ -1,20 +1,54 @@
+import base64
+import binascii
+import csv
+import io
+import json
+import os
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+
 from fastapi import HTTPException
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
-from models import Transaction, Utilisateur, TauxChange
-from schemas import TransactionCreate, TransactionUpdate
+from sqlalchemy.orm import Session, Query
+from sqlalchemy import Integer, String, any_, literal, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from models import NumeroTransaction, Transaction, Utilisateur, TauxChange
+from schemas import TransactionCreate, TransactionReponse, TransactionUpdate, TransactionFiltres, TransactionStatutLot
+from controllers import supervisionController, alertesController, idempotenceController
+from database import SessionLocal
+from utils.cache_identite import charger_utilisateur_courant
+from utils.cache_taux import cache_taux
+from utils import receipt_generator, reponses_rapides
+from utils.commit_groupe import COMMIT_GROUPE, COMMIT_GROUPE_ATTENTE_MAX, CommitGroupe, CommitGroupeArrete
+from utils.versions_donnees import TRANSACTIONS, signaler
+
+ROLES_ACCES_COMPLET = {"service", "superviseur", "admin", "supervisor"}
+NUMERO_DEJA_UTILISE = "Numéro de transaction déjà existant."
 
 # ✅ Créer une nouvelle transaction (avec taux_change_id si fourni)
-def creer_transaction(transaction: TransactionCreate, utilisateur_email: str, db: Session):
-    utilisateur = db.query(Utilisateur).filter(Utilisateur.email == utilisateur_email).first()
+#    Avec une clé d'idempotence, un rejeu renvoie la réponse d'origine (idempotenceController).
+def creer_transaction(transaction: TransactionCreate, utilisateur_email: str, db: Session,
+                      cle_idempotence: Optional[str] = None):
+    utilisateur = charger_utilisateur_courant(utilisateur_email, db)
     if not utilisateur:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé.")
 
+    if cle_idempotence is not None:
+        rejouee = idempotenceController.reserver(db, utilisateur.id, cle_idempotence,
+                                                 idempotenceController.empreinte(transaction))
+        if rejouee is not None:
+            return rejouee
+
     if transaction.taux_change_id:
-        taux = db.query(TauxChange).filter(TauxChange.id == transaction.taux_change_id).first()
+        taux = cache_taux.lire(transaction.taux_change_id, db)
         if not taux:
             raise HTTPException(status_code=404, detail="Taux de change non trouvé.")
 
+    if commit_groupe_actif(cle_idempotence):
+        db.close()  # connexion rendue au pool pendant l'attente du groupe
+        return attendre_commit_groupe(ligne_transaction(transaction, utilisateur.id, datetime.utcnow()))
+
     nouvelle_transaction = Transaction(
         utilisateur_id=utilisateur.id,
         montant=transaction.montant,
@@ -26,51 +60,404 @@ def creer_transaction(transaction: TransactionCreate, utilisateur_email: str, db
     )
 
     db.add(nouvelle_transaction)
+    try:
+        db.flush()  # id + date_transaction, pour le moteur d'alertes
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=NUMERO_DEJA_UTILISE)
+    supervisionController.appliquer_delta(db, None, supervisionController.etat_transaction(nouvelle_transaction))
+    alertesController.enregistrer_alertes(db, alertesController.constats_creation(
+        db.info, nouvelle_transaction.id, utilisateur.id, nouvelle_transaction.montant,
+        nouvelle_transaction.date_transaction,
+    ))
+    if cle_idempotence is not None:
+        idempotenceController.enregistrer(db, utilisateur.id, cle_idempotence, 201,
+                                          idempotenceController.corps_reponse(nouvelle_transaction, TransactionReponse))
+    signaler(db, TRANSACTIONS)
     db.commit()
     db.refresh(nouvelle_transaction)
     return nouvelle_transaction
 
 
-# ✅ Lister les transactions selon le rôle
-def lister_transactions(utilisateur_email: str, role: str, db: Session):
+# ✅ Commit groupé (COMMIT_GROUPE=1) : les créations concurrentes d'un même worker partagent
+#    un INSERT multi-lignes et un COMMIT. Une création avec clé d'idempotence reste individuelle
+#    (sa réservation doit vivre dans la transaction qui crée la ligne).
+def inserer_groupe(db: Session, lignes: List[dict]) -> List[Union[dict, HTTPException]]:
+    """Une transaction créée (colonnes de TransactionReponse) ou une erreur 409 par ligne, dans l'ordre."""
+    reserves = reserver_numeros(db, [ligne["numero_transaction"] for ligne in lignes])
+    a_inserer = []
+    for ligne in lignes:
+        if ligne["numero_transaction"] in reserves:
+            reserves.discard(ligne["numero_transaction"])  # un même numéro deux fois : le premier gagne
+            a_inserer.append(ligne)
+    creees: Dict[str, dict] = {}
+    if a_inserer:
+        stmt = pg_insert(Transaction).values(a_inserer).returning(*reponses_rapides.COLONNES_TRANSACTION)
+        creees = {ligne.numero_transaction: dict(ligne._mapping) for ligne in db.execute(stmt)}
+
+    deltas: Dict = {}
+    constats = []
+    for ligne in a_inserer:
+        t = creees[ligne["numero_transaction"]]
+        supervisionController.ajouter_delta(deltas, (t["service"], t["devise"], t["statut"]), 1,
+                                            float(t["montant"]), t["date_transaction"])
+        constats += alertesController.constats_creation(
+            db.info, t["id"], ligne["utilisateur_id"], t["montant"], t["date_transaction"]
+        )
+    supervisionController.appliquer_deltas(db, deltas)
+    alertesController.enregistrer_alertes(db, constats)
+    if creees:
+        signaler(db, TRANSACTIONS)
+    return [
+        creees.pop(ligne["numero_transaction"], None) or HTTPException(status_code=409, detail=NUMERO_DEJA_UTILISE)
+        for ligne in lignes
+    ]
+
+
+commit_groupe = CommitGroupe(inserer_groupe)
+
+
+def commit_groupe_actif(cle_idempotence: Optional[str]) -> bool:
+    return COMMIT_GROUPE and cle_idempotence is None
+
+
+# Attente bornée : fil d'écriture arrêté ou en retard → 503. La ligne peut encore être écrite :
+# un nouvel essai avec le même numéro reçoit alors 409 (NUMERO_DEJA_UTILISE), jamais un doublon.
+def commit_groupe_indisponible() -> HTTPException:
+    return HTTPException(status_code=503, detail="Création momentanément indisponible, réessayez plus tard.",
+                         headers={"Retry-After": "1"})
+
+
+def attendre_commit_groupe(ligne: dict):
+    try:
+        return commit_groupe.soumettre(ligne).result(timeout=COMMIT_GROUPE_ATTENTE_MAX)
+    except (FutureTimeout, CommitGroupeArrete):
+        raise commit_groupe_indisponible()
+
+
+# ✅ Créer des transactions en lot (intégrations partenaires)
+#    Taux vérifiés via le cache, numéros réservés dans le registre (ON CONFLICT DO NOTHING),
+#    des INSERT multi-lignes, un seul commit.
+TAILLE_MAX_LOT = 5000
+TAILLE_INSERT_LOT = 1000
+
+
+def ligne_transaction(transaction: TransactionCreate, utilisateur_id: int, date_transaction: datetime) -> dict:
+    statut = transaction.statut or "en attente"
+    return {
+        "utilisateur_id": utilisateur_id,
+        "montant": transaction.montant,
+        "devise": transaction.devise,
+        "service": transaction.service,
+        "numero_transaction": transaction.numero_transaction,
+        "statut": str(getattr(statut, "value", statut)),
+        "date_transaction": date_transaction,
+        "taux_change_id": transaction.taux_change_id,
+    }
+
+
+def reserver_numeros(db: Session, numeros: List[str]) -> Set[str]:
+    """Numéros déjà pris (même archivés) écartés ; le trigger rattache les réservés à leur transaction."""
+    return set(db.execute(
+        pg_insert(NumeroTransaction)
+        .values([{"numero_transaction": numero} for numero in dict.fromkeys(numeros)])
+        .on_conflict_do_nothing(index_elements=[NumeroTransaction.numero_transaction])
+        .returning(NumeroTransaction.numero_transaction)
+    ).scalars())
+
+
+def creer_transactions_en_lot(transactions: List[TransactionCreate], utilisateur_email: str, db: Session):
+    if len(transactions) > TAILLE_MAX_LOT:
+        raise HTTPException(status_code=413, detail=f"Lot trop volumineux (maximum {TAILLE_MAX_LOT} transactions).")
+
+    utilisateur = charger_utilisateur_courant(utilisateur_email, db)
+    if not utilisateur:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé.")
+
+    ids_taux = {t.taux_change_id for t in transactions if t.taux_change_id}
+    taux_existants = cache_taux.existants(ids_taux) if ids_taux else set()
+
+    resultats: Dict[int, dict] = {}
+    a_inserer: Dict[str, Tuple[int, dict]] = {}
+    maintenant = datetime.utcnow()
+    for index, transaction in enumerate(transactions):
+        numero = transaction.numero_transaction
+        if transaction.taux_change_id and transaction.taux_change_id not in taux_existants:
+            resultats[index] = {"index": index, "numero_transaction": numero,
+                                "resultat": "erreur", "detail": "Taux de change non trouvé."}
+        elif numero in a_inserer:
+            resultats[index] = {"index": index, "numero_transaction": numero,
+                                "resultat": "doublon", "detail": "Numéro présent plusieurs fois dans le lot."}
+        else:
+            a_inserer[numero] = (index, ligne_transaction(transaction, utilisateur.id, maintenant))
+
+    lignes = [ligne for _, ligne in a_inserer.values()]
+    ids_crees: Dict[str, int] = {}
+    for debut in range(0, len(lignes), TAILLE_INSERT_LOT):
+        paquet = lignes[debut:debut + TAILLE_INSERT_LOT]
+        reserves = reserver_numeros(db, [ligne["numero_transaction"] for ligne in paquet])
+        paquet = [ligne for ligne in paquet if ligne["numero_transaction"] in reserves]
+        if not paquet:
+            continue
+        stmt = (
+            pg_insert(Transaction)
+            .values(paquet)
+            .returning(Transaction.id, Transaction.numero_transaction)
+        )
+        ids_crees.update({numero: transaction_id for transaction_id, numero in db.execute(stmt)})
+
+    deltas: Dict = {}
+    constats = []
+    for numero, (index, ligne) in a_inserer.items():
+        if numero in ids_crees:
+            resultats[index] = {"index": index, "numero_transaction": numero,
+                                "resultat": "créée", "id": ids_crees[numero]}
+            supervisionController.ajouter_delta(
+                deltas, (ligne["service"], ligne["devise"], ligne["statut"]), 1, float(ligne["montant"]), maintenant
+            )
+            constats += alertesController.constats_creation(
+                db.info, ids_crees[numero], utilisateur.id, ligne["montant"], maintenant
+            )
+        else:
+            resultats[index] = {"index": index, "numero_transaction": numero,
+                                "resultat": "doublon", "detail": NUMERO_DEJA_UTILISE}
+    supervisionController.appliquer_deltas(db, deltas)
+    alertesController.enregistrer_alertes(db, constats)
+    signaler(db, TRANSACTIONS)
+    db.commit()
+
+    return {
+        "creees": len(ids_crees),
+        "rejetees": len(transactions) - len(ids_crees),
+        "resultats": [resultats[index] for index in range(len(transactions))],
+    }
+
+
+# 🔖 Curseur opaque : base64url("<date_transaction iso>|<id>")
+def encoder_curseur(transaction: Transaction) -> str:
+    brut = f"{transaction.date_transaction.isoformat()}|{transaction.id}"
+    return base64.urlsafe_b64encode(brut.encode()).decode().rstrip("=")
+
+
+def decoder_curseur(curseur: str) -> Tuple[datetime, int]:
+    try:
+        rembourrage = "=" * (-len(curseur) % 4)
+        brut = base64.urlsafe_b64decode(curseur + rembourrage).decode()
+        date_iso, transaction_id = brut.rsplit("|", 1)
+        return datetime.fromisoformat(date_iso), int(transaction_id)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide.")
+
+
+# ✅ Requête de base selon le rôle + filtres (réutilisée par la liste et l'export)
+def requete_transactions(utilisateur_email: str, role: str, db: Session,
+                         filtres: Optional[TransactionFiltres] = None) -> Query:
     role_norm = (role or "").lower()
-    if role_norm in {"service", "superviseur", "admin", "supervisor"}:
+    if role_norm in ROLES_ACCES_COMPLET:
         # Accès complet
-        return db.query(Transaction).all()
+        query = db.query(Transaction)
     elif role_norm == "agent":
-        # L'agent ne voit que les transactions en attente
-        return db.query(Transaction).filter(Transaction.statut == "en attente").all()
+        # L'agent ne voit que les transactions en attente, hors baux actifs d'autres agents
+        utilisateur = charger_utilisateur_courant(utilisateur_email, db)
+        if not utilisateur:
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé.")
+        query = db.query(Transaction).filter(Transaction.statut == "en attente",
+                                             hors_bail_d_autrui(utilisateur.id))
     elif role_norm == "client":
-        utilisateur = db.query(Utilisateur).filter(Utilisateur.email == utilisateur_email).first()
+        utilisateur = charger_utilisateur_courant(utilisateur_email, db)
         if not utilisateur:
             raise HTTPException(status_code=404, detail="Utilisateur non trouvé.")
-        return db.query(Transaction).filter(Transaction.utilisateur_id == utilisateur.id).all()
+        query = db.query(Transaction).filter(Transaction.utilisateur_id == utilisateur.id)
     else:
         raise HTTPException(status_code=403, detail="Rôle non autorisé à consulter les transactions.")
 
+    return appliquer_filtres(query, filtres)
+
+
+def appliquer_filtres(requete, filtres: Optional[TransactionFiltres]):
+    """Ajoute les filtres optionnels ; fonctionne avec une Query comme avec un select()."""
+    if filtres:
+        if filtres.statut:
+            requete = requete.filter(Transaction.statut == filtres.statut.value)
+        if filtres.service:
+            requete = requete.filter(Transaction.service == filtres.service)
+        if filtres.devise:
+            requete = requete.filter(Transaction.devise == filtres.devise)
+        if filtres.date_debut:
+            requete = requete.filter(Transaction.date_transaction >= filtres.date_debut)
+        if filtres.date_fin:
+            requete = requete.filter(Transaction.date_transaction < filtres.date_fin)
+    return requete
+
+
+# ✅ Lister les transactions selon le rôle (pagination keyset, plus récentes d'abord)
+def paginer(requete, limit: int, cursor: Optional[str]):
+    if cursor:
+        date_curseur, id_curseur = decoder_curseur(cursor)
+        requete = requete.filter(
+            tuple_(Transaction.date_transaction, Transaction.id) < tuple_(date_curseur, id_curseur)
+        )
+    # limit + 1 pour savoir s'il reste une page sans faire de COUNT
+    return (
+        requete.order_by(Transaction.date_transaction.desc(), Transaction.id.desc())
+        .limit(limit + 1)
+    )
+
+
+def formater_page(lignes: List[Transaction], limit: int) -> Dict:
+    items = lignes[:limit]
+    next_cursor = encoder_curseur(items[-1]) if len(lignes) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def lister_transactions(utilisateur_email: str, role: str, db: Session,
+                        filtres: Optional[TransactionFiltres] = None,
+                        limit: int = 50, cursor: Optional[str] = None):
+    query = requete_transactions(utilisateur_email, role, db, filtres)
+    if reponses_rapides.SERIALISATION_RAPIDE:
+        # Tuples de colonnes encodés directement (SERIALISATION_RAPIDE=1)
+        query = query.with_entities(*reponses_rapides.COLONNES_TRANSACTION)
+        return reponses_rapides.page_transactions(formater_page(paginer(query, limit, cursor).all(), limit))
+    return formater_page(paginer(query, limit, cursor).all(), limit)
+
+
+# 📤 Export (transactions + utilisateur + taux), lu par lots via un curseur serveur
+COLONNES_EXPORT = (
+    ("id", Transaction.id),
+    ("numero_transaction", Transaction.numero_transaction),
+    ("montant", Transaction.montant),
+    ("devise", Transaction.devise),
+    ("service", Transaction.service),
+    ("statut", Transaction.statut),
+    ("date_transaction", Transaction.date_transaction),
+    ("utilisateur_id", Transaction.utilisateur_id),
+    ("utilisateur_nom", Utilisateur.nom),
+    ("utilisateur_email", Utilisateur.email),
+    ("taux_change_id", Transaction.taux_change_id),
+    ("devise_source", TauxChange.devise_source),
+    ("devise_cible", TauxChange.devise_cible),
+    ("taux", TauxChange.taux),
+)
+TAILLE_LOT_EXPORT = 2000
+
+
+def requete_export(utilisateur_email: str, role: str, db: Session,
+                   filtres: Optional[TransactionFiltres] = None) -> Query:
+    return (
+        requete_transactions(utilisateur_email, role, db, filtres)
+        .join(Utilisateur, Transaction.utilisateur_id == Utilisateur.id)
+        .outerjoin(TauxChange, Transaction.taux_change_id == TauxChange.id)
+        .with_entities(*(colonne for _, colonne in COLONNES_EXPORT))
+        .order_by(Transaction.id)
+    )
+
+
+def _valeur_export(valeur):
+    return valeur.isoformat() if isinstance(valeur, datetime) else valeur
+
+
+def flux_export_transactions(query: Query, format_export: str) -> Iterator[Union[str, bytes]]:
+    """
+    Générateur pour StreamingResponse. Il ouvre sa propre session (sur le même moteur,
+    primaire ou réplique) : celle de la requête est déjà fermée quand le corps est envoyé.
+    """
+    noms = [nom for nom, _ in COLONNES_EXPORT]
+    db = SessionLocal(bind=query.session.get_bind())
+    try:
+        resultats = query.with_session(db).execution_options(yield_per=TAILLE_LOT_EXPORT)
+        if format_export == "ndjson" and reponses_rapides.SERIALISATION_RAPIDE:
+            for lot in reponses_rapides.par_lots(resultats, TAILLE_LOT_EXPORT):
+                yield reponses_rapides.ndjson(noms, lot)
+            return
+
+        tampon = io.StringIO()
+        writer = csv.writer(tampon)
+        if format_export == "csv":
+            writer.writerow(noms)
+
+        for numero, ligne in enumerate(resultats, start=1):
+            valeurs = [_valeur_export(v) for v in ligne]
+            if format_export == "csv":
+                writer.writerow(valeurs)
+            else:
+                tampon.write(json.dumps(dict(zip(noms, valeurs)), ensure_ascii=False))
+                tampon.write("\n")
+            if numero % TAILLE_LOT_EXPORT == 0:
+                yield tampon.getvalue()
+                tampon.seek(0)
+                tampon.truncate()
+
+        reste = tampon.getvalue()
+        if reste:
+            yield reste
+    finally:
+        db.close()
+
+
+# 🧾 Reçus : champs affichés, lus avec les mêmes règles de visibilité que la liste
+TAILLE_MAX_LOT_RECUS = 500
+
+
+def champs_recus(transaction_ids: List[int], utilisateur_email: str, role: str, db: Session) -> List[Dict[str, str]]:
+    """Champs des reçus demandés, dans l'ordre des ids ; 404 si l'un d'eux n'est pas accessible."""
+    ids = list(dict.fromkeys(transaction_ids))
+    if len(ids) > TAILLE_MAX_LOT_RECUS:
+        raise HTTPException(status_code=413, detail=f"Lot trop volumineux (maximum {TAILLE_MAX_LOT_RECUS} reçus).")
+
+    lignes = (
+        requete_transactions(utilisateur_email, role, db)
+        .join(Utilisateur, Transaction.utilisateur_id == Utilisateur.id)
+        .filter(Transaction.id == any_(literal(ids, ARRAY(Integer))))
+        .with_entities(
+            Transaction.id, Transaction.numero_transaction, Transaction.montant, Transaction.devise,
+            Transaction.service, Transaction.statut, Transaction.date_transaction,
+            Utilisateur.nom, Utilisateur.email,
+        )
+        .all()
+    )
+    par_id = {ligne.id: receipt_generator.champs_recu(ligne._mapping) for ligne in lignes}
+    manquants = [i for i in ids if i not in par_id]
+    if manquants:
+        raise HTTPException(status_code=404, detail=f"Transaction(s) non trouvée(s) : {manquants}.")
+    return [par_id[i] for i in ids]
+
+
+def recu_transaction(transaction_id: int, utilisateur_email: str, role: str, db: Session) -> Tuple[str, bytes]:
+    champs = champs_recus([transaction_id], utilisateur_email, role, db)[0]
+    return receipt_generator.nom_fichier_recu(champs), receipt_generator.generer_recu_pdf(champs)
+
+
+# 🔒 Ligne relue sous verrou (FOR UPDATE) : une écriture concurrente sur la même transaction attend
+#    le commit de la première, puis ses vérifications (statut, propriétaire) portent sur l'état validé.
+#    Sans cela, deux PATCH simultanés passent le contrôle « en attente » et les agrégats comptent deux fois.
+def charger_transaction_verrouillee(db: Session, *criteres) -> Optional[Transaction]:
+    return db.query(Transaction).filter(*criteres).populate_existing().with_for_update().first()
+
 
 # ✅ Supprimer une transaction (client uniquement)
 def supprimer_transaction(transaction_id: int, utilisateur_email: str, db: Session):
-    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    transaction = charger_transaction_verrouillee(db, Transaction.id == transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction non trouvée.")
 
-    utilisateur = db.query(Utilisateur).filter(Utilisateur.email == utilisateur_email).first()
+    utilisateur = charger_utilisateur_courant(utilisateur_email, db)
     if not utilisateur or transaction.utilisateur_id != utilisateur.id:
         raise HTTPException(status_code=403, detail="Non autorisé à supprimer cette transaction.")
 
+    supervisionController.appliquer_delta(db, supervisionController.etat_transaction(transaction), None)
     db.delete(transaction)
+    signaler(db, TRANSACTIONS)
     db.commit()
     return {"message": "Transaction supprimée avec succès."}
 
 
 # ✅ Modifier une transaction (client + statut "en attente")
 def modifier_transaction(transaction_id: int, update_data: TransactionUpdate, utilisateur_email: str, db: Session):
-    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    transaction = charger_transaction_verrouillee(db, Transaction.id == transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction non trouvée.")
 
-    utilisateur = db.query(Utilisateur).filter(Utilisateur.email == utilisateur_email).first()
+    utilisateur = charger_utilisateur_courant(utilisateur_email, db)
     if not utilisateur or transaction.utilisateur_id != utilisateur.id:
         raise HTTPException(status_code=403, detail="Non autorisé à modifier cette transaction.")
 
@@ -78,13 +465,23 @@ def modifier_transaction(transaction_id: int, update_data: TransactionUpdate, ut
         raise HTTPException(status_code=400, detail="Transaction modifiable uniquement si en attente.")
 
     if update_data.taux_change_id:
-        taux = db.query(TauxChange).filter(TauxChange.id == update_data.taux_change_id).first()
+        taux = cache_taux.lire(update_data.taux_change_id, db)
         if not taux:
             raise HTTPException(status_code=404, detail="Taux de change non trouvé.")
 
+    avant = supervisionController.etat_transaction(transaction)
     for key, value in update_data.dict(exclude_unset=True).items():
         setattr(transaction, key, value)
-
+    apres = supervisionController.etat_transaction(transaction)
+    if apres[2] != avant[2]:  # statut modifié (en attente → validée/annulée)
+        transaction.date_statut = datetime.utcnow()
+    supervisionController.appliquer_delta(db, avant, apres)
+    alertesController.enregistrer_alertes(db, alertesController.constats_mise_a_jour(
+        db.info, transaction.id, transaction.utilisateur_id, transaction.montant, transaction.statut,
+        transaction.date_statut,
+    ))
+
+    signaler(db, TRANSACTIONS)
     db.commit()
     db.refresh(transaction)
     return transaction
@@ -92,10 +489,12 @@ def modifier_transaction(transaction_id: int, update_data: TransactionUpdate, ut
 
 # ✅ Changer le statut (validation métier côté controller)
 #    (Le contrôle d'autorisation 'seul superviseur/admin' est appliqué dans la route via require_one_of)
-def changer_statut_transaction(transaction_id: int, statut: str, db: Session):
-    transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+def changer_statut_transaction(transaction_id: int, statut: str, db: Session,
+                               utilisateur_id: Optional[int] = None):
+    transaction = charger_transaction_verrouillee(db, Transaction.id == transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction non trouvée.")
+    verifier_bail(transaction, utilisateur_id)
 
     # Seules ces transitions sont permises ici
     if transaction.statut != "en attente":
@@ -105,17 +504,27 @@ def changer_statut_transaction(transaction_id: int, statut: str, db: Session):
     if statut not in valeurs_autorisees:
         raise HTTPException(status_code=400, detail="Statut invalide. Doit être 'validée' ou 'annulée'.")
 
+    avant = supervisionController.etat_transaction(transaction)
     transaction.statut = statut
+    transaction.date_statut = datetime.utcnow()
+    transaction.agent_id = transaction.bail_expire_a = None  # sortie de la file : bail rendu
+    supervisionController.appliquer_delta(db, avant, supervisionController.etat_transaction(transaction))
+    alertesController.enregistrer_alertes(db, alertesController.constats_mise_a_jour(
+        db.info, transaction.id, transaction.utilisateur_id, transaction.montant, statut, transaction.date_statut
+    ))
+    signaler(db, TRANSACTIONS)
     db.commit()
     db.refresh(transaction)
     return transaction
 
 
 # (Optionnel) ✅ Changer le statut par NUMÉRO de transaction
-def changer_statut_transaction_par_numero(numero_transaction: str, statut: str, db: Session):
-    transaction = db.query(Transaction).filter(Transaction.numero_transaction == numero_transaction).first()
+def changer_statut_transaction_par_numero(numero_transaction: str, statut: str, db: Session,
+                                         utilisateur_id: Optional[int] = None):
+    transaction = charger_transaction_verrouillee(db, Transaction.numero_transaction == numero_transaction)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction non trouvée.")
+    verifier_bail(transaction, utilisateur_id)
 
     if transaction.statut != "en attente":
         raise HTTPException(status_code=400, detail="Statut modifiable uniquement si la transaction est en attente.")
@@ -124,64 +533,203 @@ def changer_statut_transaction_par_numero(numero_transaction: str, statut: str,
     if statut not in valeurs_autorisees:
         raise HTTPException(status_code=400, detail="Statut invalide. Doit être 'validée' ou 'annulée'.")
 
+    avant = supervisionController.etat_transaction(transaction)
     transaction.statut = statut
+    transaction.date_statut = datetime.utcnow()
+    transaction.agent_id = transaction.bail_expire_a = None  # sortie de la file : bail rendu
+    supervisionController.appliquer_delta(db, avant, supervisionController.etat_transaction(transaction))
+    alertesController.enregistrer_alertes(db, alertesController.constats_mise_a_jour(
+        db.info, transaction.id, transaction.utilisateur_id, transaction.montant, statut, transaction.date_statut
+    ))
+    signaler(db, TRANSACTIONS)
     db.commit()
     db.refresh(transaction)
     return transaction
 
 
-# ✅ Supervision complète (retour aligné avec le frontend)
-def tableau_de_bord_supervision(db: Session):
-    # Agrégats
-    total_par_service_raw = (
-        db.query(Transaction.service, func.sum(Transaction.montant))
-        .group_by(Transaction.service)
-        .all()
+# ✅ Changer le statut en lot : un seul UPDATE conditionnel (seules les transactions encore en attente changent)
+TAILLE_MAX_LOT_STATUT = 5000
+
+
+def changer_statut_en_lot(lot: TransactionStatutLot, db: Session, utilisateur_id: Optional[int] = None):
+    ids = list(dict.fromkeys(lot.ids))
+    numeros = list(dict.fromkeys(lot.numeros_transaction))
+    if len(ids) + len(numeros) > TAILLE_MAX_LOT_STATUT:
+        raise HTTPException(status_code=413, detail=f"Lot trop volumineux (maximum {TAILLE_MAX_LOT_STATUT} transactions).")
+
+    statut = lot.statut.value
+    maintenant = datetime.utcnow()
+    colonnes = Transaction.__table__.columns
+    stmt = (
+        update(Transaction)
+        .where(
+            Transaction.statut == "en attente",
+            hors_bail_d_autrui(utilisateur_id),
+            or_(
+                Transaction.id == any_(literal(ids, ARRAY(Integer))),
+                Transaction.numero_transaction == any_(literal(numeros, ARRAY(String))),
+            ),
+        )
+        .values(statut=statut, date_statut=maintenant, agent_id=None, bail_expire_a=None)  # bail rendu
+        .returning(*colonnes)
+        .execution_options(synchronize_session=False)
     )
-    total_par_devise_raw = (
-        db.query(Transaction.devise, func.sum(Transaction.montant))
-        .group_by(Transaction.devise)
-        .all()
+    modifiees = [dict(ligne._mapping) for ligne in db.execute(stmt)]
+
+    # Agrégats : seule la dimension statut bouge (en attente → statut cible)
+    deltas: Dict = {}
+    constats = []
+    for t in modifiees:
+        supervisionController.ajouter_delta(deltas, (t["service"], t["devise"], "en attente"), -1,
+                                            -float(t["montant"]), t["date_transaction"])
+        supervisionController.ajouter_delta(deltas, (t["service"], t["devise"], statut), 1,
+                                            float(t["montant"]), t["date_transaction"])
+        constats += alertesController.constats_mise_a_jour(
+            db.info, t["id"], t["utilisateur_id"], t["montant"], statut, maintenant
+        )
+    supervisionController.appliquer_deltas(db, deltas)
+    alertesController.enregistrer_alertes(db, constats)
+    signaler(db, TRANSACTIONS)
+    db.commit()
+
+    # Cibles non modifiées : prises à bail par un autre agent, plus en attente, ou inexistantes
+    ids_restants = set(ids) - {t["id"] for t in modifiees}
+    numeros_restants = set(numeros) - {t["numero_transaction"] for t in modifiees}
+    raisons_ids, raisons_numeros = {}, {}
+    if ids_restants or numeros_restants:
+        for transaction_id, numero, statut_actuel in db.query(
+            Transaction.id, Transaction.numero_transaction, Transaction.statut
+        ).filter(
+            or_(Transaction.id.in_(ids_restants), Transaction.numero_transaction.in_(numeros_restants))
+        ):
+            raison = BAIL_D_AUTRUI if statut_actuel == "en attente" else "plus en attente"
+            raisons_ids[transaction_id] = raisons_numeros[numero] = raison
+
+    ignorees = [
+        {"cle": str(transaction_id), "raison": raisons_ids.get(transaction_id, "introuvable")}
+        for transaction_id in ids if transaction_id in ids_restants
+    ] + [
+        {"cle": numero, "raison": raisons_numeros.get(numero, "introuvable")}
+        for numero in numeros if numero in numeros_restants
+    ]
+    return {"modifiees": modifiees, "ignorees": ignorees}
+
+
+# ✅ Repasser une transaction à "en attente" (par ID ou par NUMÉRO)
+def remettre_en_attente(db: Session, transaction_id: Optional[int] = None,
+                        numero_transaction: Optional[str] = None, utilisateur_id: Optional[int] = None):
+    if transaction_id is not None:
+        transaction = charger_transaction_verrouillee(db, Transaction.id == transaction_id)
+    else:
+        transaction = charger_transaction_verrouillee(db, Transaction.numero_transaction == numero_transaction)
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction non trouvée.")
+    verifier_bail(transaction, utilisateur_id)
+
+    avant = supervisionController.etat_transaction(transaction)
+    transaction.statut = "en attente"
+    transaction.date_statut = datetime.utcnow()
+    transaction.agent_id = transaction.bail_expire_a = None  # de retour dans la file, sans bail
+    supervisionController.appliquer_delta(db, avant, supervisionController.etat_transaction(transaction))
+    signaler(db, TRANSACTIONS)
+    db.commit()
+    db.refresh(transaction)
+    return transaction
+
+
+# ✅ File d'attente des agents : les N plus anciennes transactions en attente, prises à bail
+#    FOR UPDATE SKIP LOCKED : deux agents ne se bloquent pas et ne reçoivent jamais la même ligne
+#    (une ligne prise entre-temps est revérifiée, son bail l'exclut). Bail expiré = ligne reprenable.
+FILE_ATTENTE_BAIL = float(os.getenv("FILE_ATTENTE_BAIL", "300"))
+FILE_ATTENTE_MAX = 100
+
+
+def prendre_transactions(agent_id: int, n: int, db: Session) -> Dict:
+    maintenant = datetime.utcnow()
+    expire_a = maintenant + timedelta(seconds=FILE_ATTENTE_BAIL)
+    libres = (
+        select(Transaction.id, Transaction.date_transaction)
+        .where(
+            Transaction.statut == "en attente",
+            or_(Transaction.bail_expire_a.is_(None), Transaction.bail_expire_a <= maintenant),
+        )
+        .order_by(Transaction.date_transaction, Transaction.id)
+        .limit(n)
+        .with_for_update(skip_locked=True)
     )
-    total_par_statut_raw = (
-        db.query(Transaction.statut, func.count(Transaction.id))
-        .group_by(Transaction.statut)
-        .all()
+    stmt = (
+        update(Transaction)
+        .where(tuple_(Transaction.id, Transaction.date_transaction).in_(libres))
+        .values(agent_id=agent_id, bail_expire_a=expire_a)
+        .returning(*reponses_rapides.COLONNES_TRANSACTION)
+        .execution_options(synchronize_session=False)
     )
+    prises = sorted((dict(ligne._mapping) for ligne in db.execute(stmt)),
+                    key=lambda t: (t["date_transaction"], t["id"]))
+    db.commit()
+    return {"bail_expire_a": expire_a, "transactions": prises}
+
+
+# Le bail est respecté partout : la liste d'un agent omet les baux actifs des autres, et un
+# changement de statut sur une ligne prise à bail par quelqu'un d'autre est refusé (409).
+BAIL_D_AUTRUI = "prise à bail par un autre agent"
+
+
+def hors_bail_d_autrui(utilisateur_id: Optional[int]):
+    """Condition SQL : aucun bail actif, ou un bail de cet utilisateur."""
+    return or_(Transaction.bail_expire_a.is_(None), Transaction.bail_expire_a <= datetime.utcnow(),
+               Transaction.agent_id == utilisateur_id)
+
+
+def verifier_bail(transaction: Transaction, utilisateur_id: Optional[int]) -> None:
+    if (transaction.bail_expire_a is not None and transaction.bail_expire_a > datetime.utcnow()
+            and transaction.agent_id != utilisateur_id):
+        raise HTTPException(status_code=409, detail=f"Transaction {BAIL_D_AUTRUI}.")
+
+
+def liberer_transactions(agent_id: int, ids: List[int], db: Session) -> Dict:
+    """Rend avant expiration les baux de l'agent (transactions qu'il ne traitera pas)."""
+    liberees = db.execute(
+        update(Transaction)
+        .where(Transaction.id == any_(literal(ids, ARRAY(Integer))), Transaction.agent_id == agent_id,
+               Transaction.bail_expire_a > datetime.utcnow())
+        .values(agent_id=None, bail_expire_a=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return {"liberees": liberees}
+
 
+# ✅ Supervision complète (retour aligné avec le frontend)
+#    Lit les agrégats maintenus à l'écriture : O(nombre de groupes), pas O(transactions)
+def formater_tableau_de_bord(agregats: Dict, transactions: List[Dict]) -> Dict:
     # 🔁 Clés alignées avec le composant Supervision (montant_total)
     total_par_service = [
-        {"service": service, "montant_total": float(total) if total else 0.0}
-        for service, total in total_par_service_raw
+        {"service": service, "montant_total": montant}
+        for service, _, montant in agregats["service"]
     ]
     total_par_devise = [
-        {"devise": devise, "montant_total": float(total) if total else 0.0}
-        for devise, total in total_par_devise_raw
+        {"devise": devise, "montant_total": montant}
+        for devise, _, montant in agregats["devise"]
     ]
     total_par_statut = [
-        {"statut": statut, "nombre": count}
-        for statut, count in total_par_statut_raw
+        {"statut": statut, "nombre": nombre}
+        for statut, nombre, _ in agregats["statut"]
     ]
 
-    # Transactions avec taux — inclure statut + date pour l'affichage
-    transactions_avec_taux = (
-        db.query(Transaction)
-        .options(joinedload(Transaction.taux_change))
-        .filter(Transaction.taux_change_id.isnot(None))
-        .all()
-    )
-
-    tx_list = []
-    for t in transactions_avec_taux:
-        tx_list.append({
-            "numero_transaction": t.numero_transaction,
-            "montant": float(t.montant) if t.montant is not None else None,
-            "devise": t.devise,
-            "service": t.service,
-            "statut": t.statut,
-            "date_transaction": getattr(t, "date_transaction", None),
-            "taux_change": t.taux_change.taux if getattr(t, "taux_change", None) else None
-        })
+    # Transactions récentes avec taux — inclure statut + date pour l'affichage
+    tx_list = [
+        {
+            "numero_transaction": t["numero_transaction"],
+            "montant": t["montant"],
+            "devise": t["devise"],
+            "service": t["service"],
+            "statut": t["statut"],
+            "date_transaction": t["date_transaction"],
+            "taux_change": t["taux_change"]
+        }
+        for t in transactions
+    ]
 
     return {
         "total_par_service": total_par_service,
@@ -189,3 +737,10 @@ def tableau_de_bord_supervision(db: Session):
         "total_par_statut": total_par_statut,
         "transactions_avec_taux": tx_list
     }
+
+
+def tableau_de_bord_supervision(db: Session):
+    return formater_tableau_de_bord(
+        supervisionController.lire_agregats(db),
+        supervisionController.transactions_avec_taux(db),
+    )
@@ -0,0 +1,169 @@
+# Variantes asynchrones (AsyncSession, DB_ASYNC=1) des opérations les plus sollicitées.
+# Les règles métier et les formats de réponse sont ceux de transactionController.
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Transaction
+from schemas import TransactionCreate, TransactionFiltres, TransactionReponse
+from controllers import supervisionControllerAsync, alertesController, idempotenceController
+from controllers.supervisionController import etat_transaction
+from controllers.transactionController import (
+    NUMERO_DEJA_UTILISE,
+    ROLES_ACCES_COMPLET,
+    appliquer_filtres,
+    commit_groupe,
+    commit_groupe_actif,
+    commit_groupe_indisponible,
+    formater_page,
+    formater_tableau_de_bord,
+    hors_bail_d_autrui,
+    ligne_transaction,
+    paginer,
+    verifier_bail,
+)
+from utils.cache_identite import charger_utilisateur_courant_async
+from utils import reponses_rapides
+from utils.cache_taux import cache_taux
+from utils.commit_groupe import COMMIT_GROUPE_ATTENTE_MAX, CommitGroupeArrete
+from utils.versions_donnees import TRANSACTIONS, signaler_async
+
+
+async def _enregistrer_alertes(db: AsyncSession, constats) -> None:
+    stmt = alertesController.requete_alertes(constats)
+    if stmt is not None:
+        await db.execute(stmt)
+
+
+# ✅ Créer une nouvelle transaction
+async def creer_transaction(transaction: TransactionCreate, utilisateur_email: str, db: AsyncSession,
+                            cle_idempotence: Optional[str] = None):
+    utilisateur = await charger_utilisateur_courant_async(utilisateur_email, db)
+    if not utilisateur:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé.")
+
+    if cle_idempotence is not None:
+        rejouee = await idempotenceController.reserver_async(db, utilisateur.id, cle_idempotence,
+                                                             idempotenceController.empreinte(transaction))
+        if rejouee is not None:
+            return rejouee
+
+    if transaction.taux_change_id:
+        taux = await cache_taux.lire_async(transaction.taux_change_id, db)
+        if not taux:
+            raise HTTPException(status_code=404, detail="Taux de change non trouvé.")
+
+    if commit_groupe_actif(cle_idempotence):
+        await db.close()  # connexion rendue au pool pendant l'attente du groupe
+        futur = commit_groupe.soumettre(ligne_transaction(transaction, utilisateur.id, datetime.utcnow()))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(futur), COMMIT_GROUPE_ATTENTE_MAX)
+        except (asyncio.TimeoutError, CommitGroupeArrete):
+            raise commit_groupe_indisponible()
+
+    nouvelle_transaction = Transaction(
+        utilisateur_id=utilisateur.id,
+        montant=transaction.montant,
+        devise=transaction.devise,
+        service=transaction.service,
+        numero_transaction=transaction.numero_transaction,
+        statut=transaction.statut or "en attente",
+        taux_change_id=transaction.taux_change_id
+    )
+
+    db.add(nouvelle_transaction)
+    try:
+        await db.flush()  # id + date_transaction, pour le moteur d'alertes
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=NUMERO_DEJA_UTILISE)
+    await supervisionControllerAsync.appliquer_delta(db, None, etat_transaction(nouvelle_transaction))
+    await _enregistrer_alertes(db, alertesController.constats_creation(
+        db.info, nouvelle_transaction.id, utilisateur.id, nouvelle_transaction.montant,
+        nouvelle_transaction.date_transaction,
+    ))
+    if cle_idempotence is not None:
+        await idempotenceController.enregistrer_async(
+            db, utilisateur.id, cle_idempotence, 201,
+            idempotenceController.corps_reponse(nouvelle_transaction, TransactionReponse),
+        )
+    await signaler_async(db, TRANSACTIONS)
+    await db.commit()
+    await db.refresh(nouvelle_transaction)
+    return nouvelle_transaction
+
+
+# ✅ Lister les transactions selon le rôle (pagination keyset)
+async def lister_transactions(utilisateur_email: str, role: str, db: AsyncSession,
+                              filtres: Optional[TransactionFiltres] = None,
+                              limit: int = 50, cursor: Optional[str] = None):
+    role_norm = (role or "").lower()
+    rapide = reponses_rapides.SERIALISATION_RAPIDE
+    stmt = select(*reponses_rapides.COLONNES_TRANSACTION) if rapide else select(Transaction)
+    if role_norm in ROLES_ACCES_COMPLET:
+        pass
+    elif role_norm == "agent":
+        utilisateur = await charger_utilisateur_courant_async(utilisateur_email, db)
+        if not utilisateur:
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé.")
+        stmt = stmt.where(Transaction.statut == "en attente", hors_bail_d_autrui(utilisateur.id))
+    elif role_norm == "client":
+        utilisateur = await charger_utilisateur_courant_async(utilisateur_email, db)
+        if not utilisateur:
+            raise HTTPException(status_code=404, detail="Utilisateur non trouvé.")
+        stmt = stmt.where(Transaction.utilisateur_id == utilisateur.id)
+    else:
+        raise HTTPException(status_code=403, detail="Rôle non autorisé à consulter les transactions.")
+
+    stmt = paginer(appliquer_filtres(stmt, filtres), limit, cursor)
+    if rapide:
+        return reponses_rapides.page_transactions(formater_page((await db.execute(stmt)).all(), limit))
+    lignes = (await db.execute(stmt)).scalars().all()
+    return formater_page(lignes, limit)
+
+
+# ✅ Changer le statut (par ID ou par NUMÉRO), y compris le retour à "en attente"
+async def changer_statut(statut: str, db: AsyncSession, transaction_id: Optional[int] = None,
+                         numero_transaction: Optional[str] = None, utilisateur_id: Optional[int] = None):
+    # Ligne verrouillée (FOR UPDATE) : le contrôle « en attente » porte sur l'état validé
+    stmt = select(Transaction).with_for_update().execution_options(populate_existing=True)
+    if transaction_id is not None:
+        stmt = stmt.where(Transaction.id == transaction_id)
+    else:
+        stmt = stmt.where(Transaction.numero_transaction == numero_transaction)
+    transaction = (await db.execute(stmt)).scalars().first()
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transaction non trouvée.")
+    verifier_bail(transaction, utilisateur_id)
+
+    if statut != "en attente":
+        if transaction.statut != "en attente":
+            raise HTTPException(status_code=400, detail="Statut modifiable uniquement si la transaction est en attente.")
+        if statut not in {"validée", "annulée"}:
+            raise HTTPException(status_code=400, detail="Statut invalide. Doit être 'validée' ou 'annulée'.")
+
+    avant = etat_transaction(transaction)
+    transaction.statut = statut
+    transaction.date_statut = datetime.utcnow()
+    transaction.agent_id = transaction.bail_expire_a = None  # bail rendu (sortie de la file ou retour sans bail)
+    await supervisionControllerAsync.appliquer_delta(db, avant, etat_transaction(transaction))
+    await _enregistrer_alertes(db, alertesController.constats_mise_a_jour(
+        db.info, transaction.id, transaction.utilisateur_id, transaction.montant, statut, transaction.date_statut
+    ))
+    await signaler_async(db, TRANSACTIONS)
+    await db.commit()
+    await db.refresh(transaction)
+    return transaction
+
+
+# ✅ Supervision complète (même format que transactionController)
+async def tableau_de_bord_supervision(db: AsyncSession):
+    return formater_tableau_de_bord(
+        await supervisionControllerAsync.lire_agregats(db),
+        await supervisionControllerAsync.transactions_avec_taux(db),
+    )
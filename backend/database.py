@@ -1,11 +1,21 @@
 # database.py
+import logging
 import os
+import threading
+import time
+from typing import Optional
 from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 
-from sqlalchemy import create_engine
+from fastapi import Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi_jwt_auth import AuthJWT
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from dotenv import load_dotenv
 
+from utils.metriques import PoolAsyncMesure, PoolMesure, surveiller_moteur
+
 # Charge .env en local (inoffensif en prod)
 load_dotenv()
 
@@ -33,14 +43,31 @@ if not DATABASE_URL:
 
 DATABASE_URL = _ensure_ssl_if_azure(DATABASE_URL)
 
+def _url_asyncpg(url: str) -> str:
+    """
+    postgresql://...?sslmode=require  ->  postgresql+asyncpg://...?ssl=require
+    (asyncpg ne connaît pas le paramètre libpq 'sslmode').
+    """
+    parsed = urlparse(url)
+    q = dict(parse_qsl(parsed.query))
+    if "sslmode" in q:
+        q["ssl"] = q.pop("sslmode")
+    scheme = "postgresql+asyncpg"
+    return urlunparse(parsed._replace(scheme=scheme, query=urlencode(q)))
+
+# Mode asynchrone (AsyncEngine + asyncpg) pour les routes critiques : DB_ASYNC=1
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+
 # Engine SQLAlchemy avec options adaptées à App Service
 engine = create_engine(
     DATABASE_URL,
+    poolclass=PoolMesure,   # QueuePool + mesure du temps d'attente (/metrics)
     pool_pre_ping=True,     # évite les connexions mortes
     pool_recycle=300,       # recycle les connexions (5 min)
     future=True,
     echo=False,
 )
+surveiller_moteur(engine, "primaire")
 
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
 Base = declarative_base()
@@ -52,3 +79,157 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# -------------------- Réplique en lecture (optionnelle) --------------------
+# DATABASE_READ_URL absent : toutes les lectures restent sur le primaire.
+DATABASE_READ_URL = _ensure_ssl_if_azure(os.getenv("DATABASE_READ_URL", ""))
+# Retard max toléré (secondes) avant de renvoyer les lectures vers le primaire
+REPLICA_RETARD_MAX = float(os.getenv("REPLICA_RETARD_MAX", "5"))
+# Fréquence de mesure du retard (secondes)
+REPLICA_INTERVALLE_VERIFICATION = float(os.getenv("REPLICA_INTERVALLE_VERIFICATION", "2"))
+# Après une écriture, les lectures de l'utilisateur vont au primaire pendant ce délai (secondes)
+LECTURE_APRES_ECRITURE = float(os.getenv("LECTURE_APRES_ECRITURE", "5"))
+COOKIE_ECRITURE_RECENTE = "ecriture_recente"
+
+read_engine = None
+ReadSessionLocal = None
+if DATABASE_READ_URL:
+    read_engine = create_engine(
+        DATABASE_READ_URL,
+        poolclass=PoolMesure,
+        pool_pre_ping=True,
+        pool_recycle=300,
+        future=True,
+        echo=False,
+    )
+    surveiller_moteur(read_engine, "replique")
+    ReadSessionLocal = sessionmaker(bind=read_engine, autocommit=False, autoflush=False, future=True)
+
+# Retard de rejeu (0 si tout le WAL reçu est rejoué : une réplique au repos n'est pas « en retard »)
+_REQUETE_RETARD = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+class EtatReplica:
+    """Dernier retard mesuré, rafraîchi au plus toutes les REPLICA_INTERVALLE_VERIFICATION secondes."""
+
+    def __init__(self):
+        self.retard: Optional[float] = None  # None : injoignable ou jamais mesuré
+        self._mesure_a = 0.0
+        self._verrou = threading.Lock()
+
+    def mesurer(self) -> Optional[float]:
+        try:
+            with read_engine.connect() as connexion:
+                self.retard = float(connexion.execute(_REQUETE_RETARD).scalar() or 0.0)
+        except Exception as e:
+            if self.retard is not None:
+                logging.warning(f"Réplique injoignable, lectures sur le primaire : {e}")
+            self.retard = None
+        return self.retard
+
+    def utilisable(self) -> bool:
+        if read_engine is None:
+            return False
+        # Un seul thread mesure ; les autres utilisent la dernière valeur
+        if time.monotonic() - self._mesure_a > REPLICA_INTERVALLE_VERIFICATION and self._verrou.acquire(blocking=False):
+            try:
+                self._mesure_a = time.monotonic()
+                self.mesurer()
+            finally:
+                self._verrou.release()
+        return self.retard is not None and self.retard <= REPLICA_RETARD_MAX
+
+
+etat_replica = EtatReplica()
+
+# Lecture de ses propres écritures : sujet JWT → instant de la dernière écriture (par worker ;
+# le cookie COOKIE_ECRITURE_RECENTE couvre les requêtes servies par un autre worker)
+_ecritures_recentes = {}
+_verrou_ecritures = threading.Lock()
+
+
+def marquer_ecriture(sujet: str) -> None:
+    maintenant = time.monotonic()
+    with _verrou_ecritures:
+        _ecritures_recentes[sujet] = maintenant
+        if len(_ecritures_recentes) > 10000:
+            for cle in [c for c, t in _ecritures_recentes.items() if maintenant - t > LECTURE_APRES_ECRITURE]:
+                del _ecritures_recentes[cle]
+
+
+def ecriture_recente(sujet: Optional[str]) -> bool:
+    if sujet is None:
+        return False
+    instant = _ecritures_recentes.get(sujet)
+    return instant is not None and time.monotonic() - instant <= LECTURE_APRES_ECRITURE
+
+
+def sujet_jwt(Authorize: AuthJWT) -> Optional[str]:
+    """Sujet du jeton s'il est présent et valide (l'authentification reste vérifiée par la route)."""
+    try:
+        Authorize.jwt_optional()
+        return Authorize.get_jwt_subject()
+    except Exception:
+        return None
+
+
+def lecture_sur_replica(request: Request, Authorize: AuthJWT) -> bool:
+    if read_engine is None or COOKIE_ECRITURE_RECENTE in request.cookies:
+        return False
+    return not ecriture_recente(sujet_jwt(Authorize)) and etat_replica.utilisable()
+
+
+# Dépendance FastAPI des routes en lecture seule : réplique si à jour, sinon primaire
+def get_read_db(request: Request, Authorize: AuthJWT = Depends()):
+    db = ReadSessionLocal() if lecture_sur_replica(request, Authorize) else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Engine asynchrone : créé seulement si DB_ASYNC=1 (asyncpg n'est requis que dans ce cas)
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    async_engine = create_async_engine(
+        _url_asyncpg(DATABASE_URL),
+        poolclass=PoolAsyncMesure,
+        pool_pre_ping=True,
+        pool_recycle=300,
+        echo=False,
+    )
+    surveiller_moteur(async_engine.sync_engine, "primaire_async")
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+async_read_engine = None
+AsyncReadSessionLocal = None
+if DB_ASYNC and DATABASE_READ_URL:
+    async_read_engine = create_async_engine(
+        _url_asyncpg(DATABASE_READ_URL),
+        poolclass=PoolAsyncMesure,
+        pool_pre_ping=True,
+        pool_recycle=300,
+        echo=False,
+    )
+    surveiller_moteur(async_read_engine.sync_engine, "replique_async")
+    AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine, autoflush=False, expire_on_commit=False)
+
+# Dépendance FastAPI asynchrone
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_read_async_db(request: Request, Authorize: AuthJWT = Depends()):
+    # La mesure du retard est synchrone mais bornée (au plus une par intervalle, hors boucle)
+    sur_replica = async_read_engine is not None and await run_in_threadpool(lecture_sur_replica, request, Authorize)
+    async with (AsyncReadSessionLocal() if sur_replica else AsyncSessionLocal()) as db:
+        yield db
@@ -1,13 +1,29 @@
 # main.py
+import asyncio
 import os
 import logging
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 
-from database import engine, Base
+from fastapi_jwt_auth import AuthJWT
+from database import (
+    SessionLocal, engine, DB_ASYNC, async_engine, async_read_engine, read_engine,
+    COOKIE_ECRITURE_RECENTE, LECTURE_APRES_ECRITURE, marquer_ecriture, sujet_jwt,
+)
 import models  # tes modèles doivent hériter de Base
+from controllers import (
+    alertesController, analytiqueController, idempotenceController, supervisionController, transactionController,
+)
+from utils import admission, partitions, pool_hachage, receipt_generator
+from controllers.fluxSupervisionController import diffuseur
+from utils.migrations import appliquer_migrations
+from utils.cache_taux import cache_taux
+from utils.cache_identite import cache_identite
+from utils.versions_donnees import TAUX, cache_etags, versions_donnees
+from utils import metriques
 
 # Routers
 from routes.authRoutes import auth_router
@@ -25,6 +41,13 @@ app = FastAPI(
     redoc_url="/redoc",
 )
 
+# 🚦 Contrôle d'admission par classe de routes (lectures lourdes, écritures, auth) : 503 + Retry-After
+#    quand une classe est saturée. Déclaré avant CORS : il s'exécute à l'intérieur, les 503 portent
+#    donc les en-têtes CORS et restent lisibles par le frontend.
+if admission.ADMISSION_CONTROLE:
+    app.add_middleware(admission.ControleAdmission)
+    metriques.surveiller_admission(admission.stats)
+
 # 🔐 CORS
 # Pour tester rapidement sur Azure, ouvre à tous (*). Ensuite remplace par ton domaine React:
 # p.ex. ["https://<ton-front>.azurestaticapps.net", "http://localhost:3000"]
@@ -39,10 +62,133 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 📦 Création des tables au démarrage (au lieu d'exécuter à l'import)
+# 📊 Métriques Prometheus (latence par route, SQL par requête, pools, caches) : GET /metrics
+app.middleware("http")(metriques.mesurer_requete)
+metriques.surveiller_cache("identite", cache_identite.stats)
+metriques.surveiller_cache("recus", receipt_generator.cache_recus.stats)
+metriques.surveiller_cache("taux", lambda: {"version": cache_taux.version})
+metriques.surveiller_cache("hachage", pool_hachage.stats)
+metriques.surveiller_cache("etags", cache_etags.stats)
+metriques.surveiller_cache("idempotence", idempotenceController.statistiques)
+metriques.surveiller_cache("flux_supervision", diffuseur.stats)
+metriques.surveiller_cache("commit_groupe", transactionController.commit_groupe.stats)
+
+# 🏷️ Versions des données (ETag) : un taux modifié par un autre worker invalide le cache local
+# (rechargé ensuite sur le primaire, jamais sur une réplique)
+versions_donnees.abonner(TAUX, cache_taux.invalider)
+
+# 📖 Lecture de ses propres écritures : après une écriture réussie, les lectures de
+# l'utilisateur restent sur le primaire pendant LECTURE_APRES_ECRITURE secondes
+METHODES_ECRITURE = {"POST", "PUT", "PATCH", "DELETE"}
+
+@app.middleware("http")
+async def suivre_ecritures(request: Request, call_next):
+    response = await call_next(request)
+    if read_engine is not None and request.method in METHODES_ECRITURE and response.status_code < 400:
+        sujet = sujet_jwt(AuthJWT(req=request))
+        if sujet:
+            marquer_ecriture(sujet)
+            response.set_cookie(COOKIE_ECRITURE_RECENTE, "1", max_age=int(LECTURE_APRES_ECRITURE) or 1,
+                                httponly=True, samesite="lax")
+    return response
+
+# 📦 Schéma géré par Alembic (migrations/) ; désactivable pour migrer à part (python manage.py migrer)
+MIGRATIONS_AU_DEMARRAGE = os.getenv("MIGRATIONS_AU_DEMARRAGE", "1") == "1"
+
 @app.on_event("startup")
 def on_startup():
-    Base.metadata.create_all(bind=engine)
+    if MIGRATIONS_AU_DEMARRAGE:
+        appliquer_migrations()
+
+    # Agrégats de supervision : premier démarrage sur une base existante → recalcul complet
+    db = SessionLocal()
+    try:
+        cache_taux.recharger()
+        if supervisionController.agregats_vides(db) and db.query(models.Transaction.id).first():
+            logging.info("Agrégats de supervision vides : reconstruction...")
+            supervisionController.reconstruire_agregats(db)
+        # Fenêtres glissantes du moteur d'alertes : dernières minutes d'activité
+        alertesController.moteur.reconstruire(db)
+    finally:
+        db.close()
+    versions_donnees.ecouter(engine)
+
+# ⏱️ Tâches de fond périodiques (fonctions synchrones, exécutées dans le threadpool)
+_taches_periodiques = []
+
+async def executer_periodiquement(fonction, intervalle: float):
+    while True:
+        try:
+            await run_in_threadpool(fonction)
+        except Exception:
+            logging.exception("Tâche périodique %s échouée", fonction.__name__)
+        await asyncio.sleep(intervalle)
+
+# 🧮 Instantané colonnes de /supervision/analytique : rafraîchi toutes les ANALYTIQUE_INTERVALLE
+# secondes (0 : désactivé, p.ex. si `python manage.py instantane-analytique` tourne en cron)
+ANALYTIQUE_INTERVALLE = float(os.getenv("ANALYTIQUE_INTERVALLE", "60"))
+
+def rafraichir_instantane():
+    db = SessionLocal()
+    try:
+        analytiqueController.rafraichir_instantane(db)
+    finally:
+        db.close()
+
+# 🗂️ Partitions mensuelles de transactions : mois à venir créés au démarrage puis chaque jour
+PARTITIONS_INTERVALLE = float(os.getenv("PARTITIONS_INTERVALLE", "86400"))
+
+def maintenir_partitions():
+    with engine.begin() as connexion:
+        creees = partitions.maintenir_partitions(connexion)
+    if creees:
+        logging.info("Partitions créées : %s", ", ".join(creees))
+
+# 🔁 Clés d'idempotence expirées (POST /transactions/ avec Idempotency-Key) : purgées toutes les heures
+IDEMPOTENCE_PURGE_INTERVALLE = float(os.getenv("IDEMPOTENCE_PURGE_INTERVALLE", "3600"))
+
+def purger_cles_idempotence():
+    db = SessionLocal()
+    try:
+        supprimees = idempotenceController.purger(db)
+    finally:
+        db.close()
+    if supprimees:
+        logging.info("Clés d'idempotence expirées supprimées : %s", supprimees)
+
+# 🚨 Fenêtres du moteur d'alertes : rechargées depuis la base toutes les ALERTE_SYNCHRONISATION_INTERVALLE
+#    secondes (écritures des autres workers prises en compte, utilisateurs inactifs libérés)
+ALERTE_SYNCHRONISATION_INTERVALLE = float(os.getenv("ALERTE_SYNCHRONISATION_INTERVALLE", "60"))
+
+def synchroniser_fenetres_alertes():
+    db = SessionLocal()
+    try:
+        alertesController.moteur.reconstruire(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def demarrer_taches_periodiques():
+    for fonction, intervalle in ((rafraichir_instantane, ANALYTIQUE_INTERVALLE),
+                                 (maintenir_partitions, PARTITIONS_INTERVALLE),
+                                 (purger_cles_idempotence, IDEMPOTENCE_PURGE_INTERVALLE),
+                                 (synchroniser_fenetres_alertes, ALERTE_SYNCHRONISATION_INTERVALLE)):
+        if intervalle > 0:
+            _taches_periodiques.append(asyncio.create_task(executer_periodiquement(fonction, intervalle)))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    for tache in _taches_periodiques:
+        tache.cancel()
+    versions_donnees.arreter()
+    diffuseur.arreter()
+    transactionController.commit_groupe.arreter()
+    pool_hachage.arreter_pool()
+    receipt_generator.arreter_pool()
+    if async_engine is not None:
+        await async_engine.dispose()
+    if async_read_engine is not None:
+        await async_read_engine.dispose()
 
 # ✅ Gestionnaire d’erreur 422
 @app.exception_handler(RequestValidationError)
@@ -51,6 +197,16 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     return JSONResponse(status_code=422, content={"detail": exc.errors()})
 
 # 🧩 Routers
+# DB_ASYNC=1 : les variantes asynchrones passent en premier (même chemin + méthode → elles gagnent)
+if DB_ASYNC:
+    from routes.transactionRoutesAsync import transaction_router_async
+    from routes.tauxChangeRoutesAsync import taux_change_router_async
+    from routes.supervisionRoutesAsync import supervision_router_async
+
+    app.include_router(transaction_router_async)
+    app.include_router(taux_change_router_async)
+    app.include_router(supervision_router_async)
+
 app.include_router(auth_router)
 app.include_router(transaction_router)
 app.include_router(utilisateur_router)
@@ -62,3 +218,7 @@ app.include_router(alertes_router)
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(content=metriques.exposition(), media_type=metriques.CONTENT_TYPE_LATEST)
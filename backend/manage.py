@@ -0,0 +1,91 @@
+# manage.py — commandes d'administration (python manage.py <commande>)
+import argparse
+import logging
+from datetime import datetime
+
+from database import SessionLocal, engine
+import models  # noqa: F401  (enregistre les tables sur Base)
+from controllers import analytiqueController, archivageController, supervisionController
+from utils import partitions
+from utils.migrations import appliquer_migrations
+
+
+def migrer(args):
+    appliquer_migrations(args.revision)
+    print(f"[OK] Schéma à jour ({args.revision}).")
+
+
+def reconstruire_agregats(args):
+    db = SessionLocal()
+    try:
+        nb_lignes = supervisionController.reconstruire_agregats(db)
+    finally:
+        db.close()
+    print(f"[OK] Agrégats et séries de supervision reconstruits ({nb_lignes} lignes).")
+
+
+def instantane_analytique(args):
+    db = SessionLocal()
+    try:
+        meta = analytiqueController.rafraichir_instantane(db, complet=args.complet)
+    finally:
+        db.close()
+    if meta is None:
+        print("[--] Un autre processus met déjà l'instantané à jour.")
+    else:
+        print(f"[OK] Instantané analytique génération {meta['generation']} ({meta['lignes']} lignes, dernier id {meta['dernier_id']}).")
+
+
+def creer_partitions(args):
+    depuis = datetime.strptime(args.depuis, "%Y-%m") if args.depuis else None
+    with engine.begin() as connexion:
+        creees = partitions.maintenir_partitions(connexion, depuis=depuis, avance=args.avance)
+    print(f"[OK] {len(creees)} partition(s) créée(s){' : ' + ', '.join(creees) if creees else ''}.")
+
+
+def archiver_transactions(args):
+    db = SessionLocal()
+    try:
+        archives = archivageController.archiver(db, args.mois_conserves, args.dossier)
+    finally:
+        db.close()
+    for archive in archives:
+        print(f"[OK] {archive['mois']} : {archive['transactions']} transactions, {archive['alertes']} alertes "
+              f"→ {archive['fichiers']['transactions']}")
+    if not archives:
+        print("[--] Aucune partition à archiver.")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Commandes d'administration de l'API transactions.")
+    commandes = parser.add_subparsers(dest="commande", required=True)
+
+    p = commandes.add_parser("migrer", help="Applique les migrations Alembic (alembic upgrade).")
+    p.add_argument("revision", nargs="?", default="head")
+    p.set_defaults(func=migrer)
+
+    p = commandes.add_parser("reconstruire-agregats", help="Recalcule les agrégats et les séries (heure, jour) de supervision depuis la table transactions.")
+    p.set_defaults(func=reconstruire_agregats)
+
+    p = commandes.add_parser("instantane-analytique", help="Met à jour l'instantané colonnes utilisé par /supervision/analytique.")
+    p.add_argument("--complet", action="store_true", help="Reconstruit tout au lieu d'ajouter les nouvelles transactions.")
+    p.set_defaults(func=instantane_analytique)
+
+    p = commandes.add_parser("partitions", help="Crée les partitions mensuelles de transactions (mois courant + à venir).")
+    p.add_argument("--depuis", help="Premier mois à créer (AAAA-MM), p.ex. avant un import d'historique.")
+    p.add_argument("--avance", type=int, default=partitions.PARTITIONS_AVANCE, help="Mois créés après le mois courant.")
+    p.set_defaults(func=creer_partitions)
+
+    p = commandes.add_parser("archiver-transactions", help="Exporte en CSV gzip puis détache les partitions des mois anciens.")
+    p.add_argument("--mois-conserves", type=int, default=archivageController.ARCHIVES_MOIS_CONSERVES,
+                   help="Mois gardés en ligne en plus du mois courant.")
+    p.add_argument("--dossier", default=archivageController.ARCHIVES_DOSSIER)
+    p.set_defaults(func=archiver_transactions)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
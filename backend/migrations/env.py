@@ -0,0 +1,46 @@
+# migrations/env.py — Alembic utilise l'engine de database.py (DATABASE_URL)
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import engine, Base, DATABASE_URL
+import models  # noqa: F401  (enregistre les tables sur Base)
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def include_object(objet, nom, type_, reflete, compare_a):
+    # Partitions de transactions : créées par utils/partitions.py, pas déclarées dans models.py
+    if type_ == "table" and reflete and nom.startswith("transactions_") and compare_a is None:
+        return False
+    return True
+
+
+def run_migrations_offline():
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata,
+                          include_object=include_object)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
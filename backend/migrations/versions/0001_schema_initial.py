@@ -0,0 +1,68 @@
+"""schéma initial (tables créées jusqu'ici par create_all)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "utilisateurs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("nom", sa.String(100), nullable=False),
+        sa.Column("email", sa.String(120), nullable=False, unique=True),
+        sa.Column("mot_de_passe", sa.String(255), nullable=False),
+        sa.Column("role", sa.String(20)),
+    )
+    op.create_index("ix_utilisateurs_id", "utilisateurs", ["id"])
+
+    op.create_table(
+        "taux_changes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("devise_source", sa.String(10), nullable=False),
+        sa.Column("devise_cible", sa.String(10), nullable=False),
+        sa.Column("taux", sa.Float(), nullable=False),
+        sa.Column("date_enregistrement", sa.DateTime()),
+        sa.UniqueConstraint("devise_source", "devise_cible", name="uix_devises"),
+        sa.CheckConstraint("taux > 0", name="check_taux_positif"),
+    )
+    op.create_index("ix_taux_changes_id", "taux_changes", ["id"])
+
+    op.create_table(
+        "transactions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("utilisateur_id", sa.Integer(), sa.ForeignKey("utilisateurs.id"), nullable=False),
+        sa.Column("montant", sa.Float(), nullable=False),
+        sa.Column("devise", sa.String(10), nullable=False),
+        sa.Column("service", sa.String(50), nullable=False),
+        sa.Column("numero_transaction", sa.String(100), nullable=False, unique=True),
+        sa.Column("statut", sa.String(20)),
+        sa.Column("date_transaction", sa.DateTime()),
+        sa.Column("taux_change_id", sa.Integer(), sa.ForeignKey("taux_changes.id")),
+    )
+    op.create_index("ix_transactions_id", "transactions", ["id"])
+
+    op.create_table(
+        "alertes",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("transaction_id", sa.Integer(), sa.ForeignKey("transactions.id"), nullable=False),
+        sa.Column("motif", sa.String(255), nullable=False),
+        sa.Column("date_alerte", sa.DateTime()),
+    )
+    op.create_index("ix_alertes_id", "alertes", ["id"])
+
+
+def downgrade():
+    op.drop_table("alertes")
+    op.drop_table("transactions")
+    op.drop_table("taux_changes")
+    op.drop_table("utilisateurs")
@@ -0,0 +1,31 @@
+"""agrégats de supervision
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # La table a pu être créée par create_all avant l'arrivée des migrations
+    if sa.inspect(op.get_bind()).has_table("supervision_agregats"):
+        return
+    op.create_table(
+        "supervision_agregats",
+        sa.Column("dimension", sa.String(20), primary_key=True),
+        sa.Column("cle", sa.String(100), primary_key=True),
+        sa.Column("nombre", sa.Integer(), nullable=False),
+        sa.Column("montant_total", sa.Float(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("supervision_agregats")
@@ -0,0 +1,45 @@
+"""index pour les requêtes réelles (keyset, rôle client, file d'attente agent, FK, alertes)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Les index sont construits avec CREATE INDEX CONCURRENTLY (hors transaction) :
+la table transactions reste accessible en écriture pendant la construction.
+Voir migrations/README.md.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+INDEX = [
+    # Pagination keyset de GET /transactions (ORDER BY date_transaction DESC, id DESC)
+    ("ix_transactions_date_id", "transactions", ["date_transaction", "id"], {}),
+    # Rôle client + contrôles de vélocité par utilisateur
+    ("ix_transactions_utilisateur_date", "transactions", ["utilisateur_id", "date_transaction"], {}),
+    # Vue agent : seules les transactions en attente (index partiel, petit)
+    ("ix_transactions_en_attente", "transactions", ["date_transaction", "id"],
+     {"postgresql_where": sa.text("statut = 'en attente'")}),
+    # Clés étrangères (suppression d'un taux, jointures, alertes)
+    ("ix_transactions_taux_change_id", "transactions", ["taux_change_id"], {}),
+    ("ix_alertes_transaction_id", "alertes", ["transaction_id"], {}),
+    # Alertes sur montant élevé
+    ("ix_transactions_montant", "transactions", ["montant"], {}),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for nom, table, colonnes, options in INDEX:
+            op.create_index(nom, table, colonnes, postgresql_concurrently=True, if_not_exists=True, **options)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for nom, table, _, _ in reversed(INDEX):
+            op.drop_index(nom, table_name=table, postgresql_concurrently=True, if_exists=True)
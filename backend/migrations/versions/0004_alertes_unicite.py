@@ -0,0 +1,34 @@
+"""alertes : une seule alerte par (transaction, motif)
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Le moteur de détection insère ses constats avec ON CONFLICT DO NOTHING :
+la contrainte rend l'enregistrement idempotent. Les doublons éventuels
+(ancien comportement) sont supprimés avant de la poser.
+"""
+from alembic import op
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        """
+        DELETE FROM alertes a
+        USING alertes b
+        WHERE a.transaction_id = b.transaction_id
+          AND a.motif = b.motif
+          AND a.id > b.id
+        """
+    )
+    op.create_unique_constraint("uix_alertes_transaction_motif", "alertes", ["transaction_id", "motif"])
+
+
+def downgrade():
+    op.drop_constraint("uix_alertes_transaction_motif", "alertes", type_="unique")
@@ -0,0 +1,37 @@
+"""séries de supervision par heure et par jour
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+Tables vides à la création : elles sont remplies au démarrage suivant
+(agrégats considérés vides) ou par `python manage.py reconstruire-agregats`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+TABLES = ("supervision_heures", "supervision_jours")
+
+
+def upgrade():
+    for table in TABLES:
+        op.create_table(
+            table,
+            sa.Column("debut", sa.DateTime(), primary_key=True),
+            sa.Column("service", sa.String(50), primary_key=True),
+            sa.Column("devise", sa.String(10), primary_key=True),
+            sa.Column("statut", sa.String(20), primary_key=True),
+            sa.Column("nombre", sa.Integer(), nullable=False),
+            sa.Column("montant_total", sa.Float(), nullable=False),
+        )
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_table(table)
@@ -0,0 +1,182 @@
+"""transactions partitionnée par mois (date_transaction) + registre des numéros
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+La table est recréée (PARTITION BY RANGE) et les lignes recopiées : migration à
+programmer hors des heures de pointe sur une grosse base. Voir migrations/README.md.
+
+- Clé primaire (id, date_transaction) : une table partitionnée exige la clé de
+  partition dans toute contrainte d'unicité.
+- L'unicité de numero_transaction passe par la table numeros_transaction, tenue
+  à jour par trigger ; elle survit à l'archivage des partitions.
+- alertes.transaction_id perd sa clé étrangère (même contrainte) ; la suppression
+  en cascade reste faite par l'ORM.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+# Mois créés à l'avance lors de la migration (le démarrage de l'API complète ensuite)
+MOIS_AVANCE = 3
+
+COLONNES = ("id, utilisateur_id, montant, devise, service, numero_transaction, "
+            "statut, date_transaction, taux_change_id")
+
+INDEX = [
+    ("ix_transactions_date_id", ["date_transaction", "id"], {}),
+    ("ix_transactions_utilisateur_date", ["utilisateur_id", "date_transaction"], {}),
+    ("ix_transactions_en_attente", ["date_transaction", "id"],
+     {"postgresql_where": sa.text("statut = 'en attente'")}),
+    ("ix_transactions_taux_change_id", ["taux_change_id"], {}),
+    ("ix_transactions_montant", ["montant"], {}),
+]
+
+FONCTION_REGISTRE = """
+CREATE OR REPLACE FUNCTION numeros_transaction_maj() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM numeros_transaction WHERE numero_transaction = OLD.numero_transaction;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        -- Un numéro réservé sans transaction (insertion en lot en cours) est repris
+        INSERT INTO numeros_transaction (numero_transaction, transaction_id, date_transaction)
+        VALUES (NEW.numero_transaction, NEW.id, NEW.date_transaction)
+        ON CONFLICT (numero_transaction) DO UPDATE
+            SET transaction_id = EXCLUDED.transaction_id, date_transaction = EXCLUDED.date_transaction
+            WHERE numeros_transaction.transaction_id IS NULL;
+        IF NOT FOUND THEN
+            RAISE unique_violation USING
+                MESSAGE = format('Numéro de transaction déjà utilisé : %s', NEW.numero_transaction),
+                CONSTRAINT = 'numeros_transaction_pkey';
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$
+"""
+
+
+def _mois(date):
+    return datetime(date.year, date.month, 1)
+
+
+def _mois_suivant(mois):
+    return datetime(mois.year + mois.month // 12, mois.month % 12 + 1, 1)
+
+
+def upgrade():
+    op.execute("ALTER TABLE transactions RENAME TO transactions_avant_partition")
+    # La séquence des id survit à l'ancienne table
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE transactions (
+            id integer NOT NULL DEFAULT nextval('transactions_id_seq'),
+            utilisateur_id integer NOT NULL,
+            montant double precision NOT NULL,
+            devise varchar(10) NOT NULL,
+            service varchar(50) NOT NULL,
+            numero_transaction varchar(100) NOT NULL,
+            statut varchar(20),
+            date_transaction timestamp without time zone NOT NULL,
+            taux_change_id integer
+        ) PARTITION BY RANGE (date_transaction)
+    """)
+    op.execute("CREATE TABLE transactions_defaut PARTITION OF transactions DEFAULT")
+
+    connexion = op.get_bind()
+    plus_ancienne = connexion.execute(sa.text(
+        "SELECT min(date_transaction) FROM transactions_avant_partition"
+    )).scalar()
+    maintenant = _mois(datetime.utcnow())
+    mois = _mois(plus_ancienne) if plus_ancienne and plus_ancienne < maintenant else maintenant
+    dernier = maintenant
+    for _ in range(MOIS_AVANCE):
+        dernier = _mois_suivant(dernier)
+    while mois <= dernier:
+        op.execute(
+            f"CREATE TABLE transactions_p{mois:%Y_%m} PARTITION OF transactions "
+            f"FOR VALUES FROM ('{mois:%Y-%m-%d}') TO ('{_mois_suivant(mois):%Y-%m-%d}')"
+        )
+        mois = _mois_suivant(mois)
+
+    op.execute(f"""
+        INSERT INTO transactions ({COLONNES})
+        SELECT id, utilisateur_id, montant, devise, service, numero_transaction, statut,
+               coalesce(date_transaction, now() AT TIME ZONE 'utc'), taux_change_id
+        FROM transactions_avant_partition
+    """)
+    op.execute("DROP TABLE transactions_avant_partition CASCADE")  # + FK alertes.transaction_id
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+
+    op.create_primary_key("transactions_pkey", "transactions", ["id", "date_transaction"])
+    op.create_foreign_key("transactions_utilisateur_id_fkey", "transactions", "utilisateurs",
+                          ["utilisateur_id"], ["id"])
+    op.create_foreign_key("transactions_taux_change_id_fkey", "transactions", "taux_changes",
+                          ["taux_change_id"], ["id"])
+    for nom, colonnes, options in INDEX:
+        op.create_index(nom, "transactions", colonnes, **options)
+
+    op.create_table(
+        "numeros_transaction",
+        sa.Column("numero_transaction", sa.String(100), primary_key=True),
+        sa.Column("transaction_id", sa.Integer()),
+        sa.Column("date_transaction", sa.DateTime()),
+    )
+    op.execute(
+        "INSERT INTO numeros_transaction (numero_transaction, transaction_id, date_transaction) "
+        "SELECT numero_transaction, id, date_transaction FROM transactions"
+    )
+    op.execute(FONCTION_REGISTRE)
+    op.execute(
+        "CREATE TRIGGER trg_numeros_transaction "
+        "AFTER INSERT OR DELETE OR UPDATE OF numero_transaction, date_transaction ON transactions "
+        "FOR EACH ROW EXECUTE FUNCTION numeros_transaction_maj()"
+    )
+    op.execute("ANALYZE transactions")
+
+
+def downgrade():
+    # Les partitions archivées (détachées) ne sont pas réintégrées
+    op.execute("DROP TRIGGER trg_numeros_transaction ON transactions")
+    op.execute("DROP FUNCTION numeros_transaction_maj()")
+    op.drop_table("numeros_transaction")
+
+    op.execute("ALTER TABLE transactions RENAME TO transactions_partitionnee")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY NONE")
+    for nom, _, _ in INDEX:
+        op.execute(f"DROP INDEX {nom}")
+    op.execute("ALTER TABLE transactions_partitionnee DROP CONSTRAINT transactions_pkey")
+    op.execute("ALTER TABLE transactions_partitionnee DROP CONSTRAINT transactions_utilisateur_id_fkey")
+    op.execute("ALTER TABLE transactions_partitionnee DROP CONSTRAINT transactions_taux_change_id_fkey")
+
+    op.create_table(
+        "transactions",
+        sa.Column("id", sa.Integer(), primary_key=True,
+                  server_default=sa.text("nextval('transactions_id_seq')")),
+        sa.Column("utilisateur_id", sa.Integer(), sa.ForeignKey("utilisateurs.id"), nullable=False),
+        sa.Column("montant", sa.Float(), nullable=False),
+        sa.Column("devise", sa.String(10), nullable=False),
+        sa.Column("service", sa.String(50), nullable=False),
+        sa.Column("numero_transaction", sa.String(100), nullable=False, unique=True),
+        sa.Column("statut", sa.String(20)),
+        sa.Column("date_transaction", sa.DateTime()),
+        sa.Column("taux_change_id", sa.Integer(), sa.ForeignKey("taux_changes.id")),
+    )
+    op.execute(f"INSERT INTO transactions ({COLONNES}) SELECT {COLONNES} FROM transactions_partitionnee")
+    op.execute("DROP TABLE transactions_partitionnee")
+    op.execute("ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id")
+    op.create_index("ix_transactions_id", "transactions", ["id"])
+    for nom, colonnes, options in INDEX:
+        op.create_index(nom, "transactions", colonnes, **options)
+    op.execute("DELETE FROM alertes WHERE transaction_id NOT IN (SELECT id FROM transactions)")
+    op.create_foreign_key("alertes_transaction_id_fkey", "alertes", "transactions",
+                          ["transaction_id"], ["id"])
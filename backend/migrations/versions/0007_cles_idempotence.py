@@ -0,0 +1,36 @@
+"""clés d'idempotence de POST /transactions/
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+Une ligne par (utilisateur, clé) avec la réponse d'origine ; les lignes
+expirées sont purgées par l'API (IDEMPOTENCE_PURGE_INTERVALLE).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "cles_idempotence",
+        sa.Column("utilisateur_id", sa.Integer(), primary_key=True),
+        sa.Column("cle", sa.String(255), primary_key=True),
+        sa.Column("empreinte", sa.String(64), nullable=False),
+        sa.Column("code_http", sa.Integer()),
+        sa.Column("corps", sa.Text()),
+        sa.Column("cree_a", sa.DateTime(), nullable=False),
+        sa.Column("expire_a", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_cles_idempotence_expire_a", "cles_idempotence", ["expire_a"])
+
+
+def downgrade():
+    op.drop_index("ix_cles_idempotence_expire_a", table_name="cles_idempotence")
+    op.drop_table("cles_idempotence")
@@ -0,0 +1,29 @@
+"""transactions : bail de la file d'attente des agents
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+Colonnes nullables sans valeur par défaut : ajout instantané, propagé
+à toutes les partitions. Le bail est porté par la ligne elle-même, ce qui
+permet à SELECT ... FOR UPDATE SKIP LOCKED de revérifier un bail posé par
+une requête concurrente (voir transactionController.prendre_transactions).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("transactions", sa.Column("agent_id", sa.Integer(), nullable=True))
+    op.add_column("transactions", sa.Column("bail_expire_a", sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("transactions", "bail_expire_a")
+    op.drop_column("transactions", "agent_id")
@@ -0,0 +1,32 @@
+"""transactions : date du dernier changement de statut
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+
+Colonne nullable sans valeur par défaut : ajout instantané, propagé à toutes
+les partitions. Elle horodate les annulations pour le moteur d'alertes, en
+direct comme à la reconstruction des fenêtres (alertesController) ; les
+lignes antérieures restent à NULL. L'index partiel (annulées seulement) est
+créé sur chaque partition : à programmer hors des heures de pointe sur une
+grosse base.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("transactions", sa.Column("date_statut", sa.DateTime(), nullable=True))
+    op.create_index("ix_transactions_annulees_date_statut", "transactions", ["date_statut"],
+                    postgresql_where=sa.text("statut = 'annulée'"))
+
+
+def downgrade():
+    op.drop_index("ix_transactions_annulees_date_statut", table_name="transactions")
+    op.drop_column("transactions", "date_statut")
@@ -1,6 +1,6 @@
 from sqlalchemy import (
     Column, Integer, String, ForeignKey,
-    DateTime, Float, UniqueConstraint, CheckConstraint
+    DateTime, Float, Text, UniqueConstraint, CheckConstraint, Index, text
 )
 from sqlalchemy.orm import relationship
 from database import Base
@@ -48,22 +48,44 @@ class TauxChange(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
-    __table_args__ = {'extend_existing': True}
+    # Partitionnée par mois sur date_transaction (migration 0006, utils/partitions.py).
+    # Index créés par les migrations 0003, 0006 et 0009 (déclarés ici pour l'autogénération Alembic)
+    __table_args__ = (
+        Index('ix_transactions_date_id', 'date_transaction', 'id'),
+        Index('ix_transactions_utilisateur_date', 'utilisateur_id', 'date_transaction'),
+        Index('ix_transactions_en_attente', 'date_transaction', 'id',
+              postgresql_where=text("statut = 'en attente'")),
+        Index('ix_transactions_taux_change_id', 'taux_change_id'),
+        Index('ix_transactions_montant', 'montant'),
+        Index('ix_transactions_annulees_date_statut', 'date_statut',
+              postgresql_where=text("statut = 'annulée'")),
+        {'extend_existing': True, 'postgresql_partition_by': 'RANGE (date_transaction)'}
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    # Clé primaire SQL (id, date_transaction) imposée par le partitionnement ; l'ORM identifie par id
+    id = Column(Integer, primary_key=True, autoincrement=True)
     utilisateur_id = Column(Integer, ForeignKey('utilisateurs.id'), nullable=False)
     montant = Column(Float, nullable=False)
     devise = Column(String(10), nullable=False)
     service = Column(String(50), nullable=False)  # Western Union, RIA, etc.
-    numero_transaction = Column(String(100), unique=True, nullable=False)
+    # Unicité garantie par le registre numeros_transaction (trigger), pas par un index ici
+    numero_transaction = Column(String(100), nullable=False)
     statut = Column(String(20), default="en attente")  # en attente, validée, annulée
-    date_transaction = Column(DateTime, default=datetime.utcnow)
+    date_statut = Column(DateTime, nullable=True)  # dernier changement de statut (migration 0009)
+    date_transaction = Column(DateTime, primary_key=True, default=datetime.utcnow)
 
     taux_change_id = Column(Integer, ForeignKey('taux_changes.id'), nullable=True)
 
+    # Bail de la file d'attente des agents (migration 0008) : pris par agent_id jusqu'à bail_expire_a
+    agent_id = Column(Integer, nullable=True)
+    bail_expire_a = Column(DateTime, nullable=True)
+
     utilisateur = relationship("Utilisateur", back_populates="transactions")
     taux_change = relationship("TauxChange", back_populates="transactions")
-    alertes = relationship("Alerte", back_populates="transaction", cascade="all, delete")
+    alertes = relationship("Alerte", back_populates="transaction", cascade="all, delete",
+                           primaryjoin="Transaction.id == foreign(Alerte.transaction_id)")
+
+    __mapper_args__ = {"primary_key": [id]}
 
     def __repr__(self):
         return (
@@ -71,18 +93,110 @@ class Transaction(Base):
             f"Statut: {self.statut}>"
         )
 
+# -------------------- Registre des numéros de transaction --------------------
+
+class NumeroTransaction(Base):
+    """
+    Un numéro par ligne, y compris pour les transactions archivées : l'unicité de
+    numero_transaction ne peut pas être imposée par la table partitionnée elle-même.
+    Alimenté par le trigger trg_numeros_transaction (migration 0006).
+    """
+    __tablename__ = "numeros_transaction"
+    __table_args__ = {'extend_existing': True}
+
+    numero_transaction = Column(String(100), primary_key=True)
+    transaction_id = Column(Integer)  # NULL : numéro réservé par une insertion en lot en cours
+    date_transaction = Column(DateTime)
+
+    def __repr__(self):
+        return f"<NumeroTransaction {self.numero_transaction} - TX {self.transaction_id}>"
+
+# -------------------- Clés d'idempotence --------------------
+
+class CleIdempotence(Base):
+    """
+    Réponse mémorisée d'un POST /transactions/ envoyé avec l'en-tête Idempotency-Key.
+    La ligne est insérée dans la transaction qui crée la transaction métier : elle n'existe
+    (et ne se rejoue) que si la création a été validée.
+    """
+    __tablename__ = "cles_idempotence"
+    __table_args__ = (
+        Index('ix_cles_idempotence_expire_a', 'expire_a'),
+        {'extend_existing': True}
+    )
+
+    utilisateur_id = Column(Integer, primary_key=True)
+    cle = Column(String(255), primary_key=True)
+    empreinte = Column(String(64), nullable=False)  # sha256 du corps de la requête
+    code_http = Column(Integer)
+    corps = Column(Text)
+    cree_a = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expire_a = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<CleIdempotence {self.utilisateur_id} - {self.cle}>"
+
 # -------------------- Alerte --------------------
 
 class Alerte(Base):
     __tablename__ = "alertes"
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index('ix_alertes_transaction_id', 'transaction_id'),
+        UniqueConstraint('transaction_id', 'motif', name='uix_alertes_transaction_motif'),
+        {'extend_existing': True}
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    transaction_id = Column(Integer, ForeignKey('transactions.id'), nullable=False)
+    # Sans clé étrangère depuis le partitionnement de transactions (migration 0006)
+    transaction_id = Column(Integer, nullable=False)
     motif = Column(String(255), nullable=False)
     date_alerte = Column(DateTime, default=datetime.utcnow)
 
-    transaction = relationship("Transaction", back_populates="alertes")
+    transaction = relationship("Transaction", back_populates="alertes",
+                               primaryjoin="Transaction.id == foreign(Alerte.transaction_id)")
 
     def __repr__(self):
         return f"<Alerte {self.id} - TX {self.transaction_id}>"
+
+# -------------------- Agrégats de supervision --------------------
+
+class SupervisionAgregat(Base):
+    """Compteurs maintenus à chaque écriture (dimension = service, devise ou statut)."""
+    __tablename__ = "supervision_agregats"
+    __table_args__ = {'extend_existing': True}
+
+    dimension = Column(String(20), primary_key=True)
+    cle = Column(String(100), primary_key=True)
+    nombre = Column(Integer, nullable=False, default=0)
+    montant_total = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<SupervisionAgregat {self.dimension}={self.cle}: {self.nombre} / {self.montant_total}>"
+
+
+# -------------------- Séries de supervision (par heure / par jour) --------------------
+
+class _SeriePeriodique:
+    """Compteurs d'une période (début tronqué à l'heure ou au jour) pour un triplet service/devise/statut."""
+    debut = Column(DateTime, primary_key=True)
+    service = Column(String(50), primary_key=True)
+    devise = Column(String(10), primary_key=True)
+    statut = Column(String(20), primary_key=True)
+    nombre = Column(Integer, nullable=False, default=0)
+    montant_total = Column(Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return (
+            f"<{type(self).__name__} {self.debut} {self.service}/{self.devise}/{self.statut}: "
+            f"{self.nombre} / {self.montant_total}>"
+        )
+
+
+class SupervisionHeure(_SeriePeriodique, Base):
+    __tablename__ = "supervision_heures"
+    __table_args__ = {'extend_existing': True}
+
+
+class SupervisionJour(_SeriePeriodique, Base):
+    __tablename__ = "supervision_jours"
+    __table_args__ = {'extend_existing': True}
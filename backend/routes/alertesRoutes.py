@@ -1,31 +1,25 @@
 # routes/alertesRoutes.py
 
-from fastapi import APIRouter, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from fastapi_jwt_auth import AuthJWT
-from controllers.authController import get_db
-from models import Transaction
+from database import get_read_db
+from controllers import alertesController
 
 alertes_router = APIRouter(
     prefix="/alertes",
     tags=["Alertes"]
 )
 
+# 🚨 Alertes levées par le moteur de détection (plus récentes d'abord)
 @alertes_router.get("/")
-def alertes_suspectes(db: Session = Depends(get_db), Authorize: AuthJWT = Depends()):
+def alertes_suspectes(
+    limit: int = Query(100, ge=1, le=1000),
+    avant_id: Optional[int] = Query(None, description="Page suivante : id de la dernière alerte reçue"),
+    db: Session = Depends(get_read_db),
+    Authorize: AuthJWT = Depends(),
+):
     Authorize.jwt_required()
-
-    SEUIL = 10000  # Exemple de seuil
-
-    alertes = db.query(Transaction).filter(Transaction.montant > SEUIL).all()
-
-    return [
-        {
-            "id": transaction.id,
-            "montant": transaction.montant,
-            "service": transaction.service,
-            "client": transaction.client_id,
-            "statut": transaction.statut,
-            "date": transaction.date
-        } for transaction in alertes
-    ]
+    return alertesController.lister_alertes(db, limit=limit, avant_id=avant_id)
@@ -16,18 +16,18 @@ auth_router = APIRouter(
     response_model=UtilisateurReponse,
     status_code=status.HTTP_201_CREATED
 )
-def inscription(
+async def inscription(
     utilisateur: UtilisateurInscription,
     db: Session = Depends(authController.get_db)
 ):
     """
     Crée un nouvel utilisateur dans la base de données.
     """
-    return authController.inscrire_utilisateur(utilisateur, db)
+    return await authController.inscrire_utilisateur(utilisateur, db)
 
 # Route de connexion
 @auth_router.post("/connexion")
-def connexion(
+async def connexion(
     utilisateur: UtilisateurConnexion,
     Authorize: AuthJWT = Depends(),
     db: Session = Depends(authController.get_db)
@@ -35,7 +35,7 @@ def connexion(
     """
     Authentifie un utilisateur et retourne un token JWT.
     """
-    return authController.connexion_utilisateur(utilisateur, Authorize, db)
+    return await authController.connexion_utilisateur(utilisateur, Authorize, db)
 
 # Route de renouvellement de token
 @auth_router.post("/renouveler-token")
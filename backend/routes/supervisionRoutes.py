@@ -1,9 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
 from fastapi_jwt_auth import AuthJWT
-from controllers.authController import get_db
-from models import Utilisateur, Transaction
-from sqlalchemy import func
+from database import get_read_db
+from controllers import analytiqueController, supervisionController
+from controllers.fluxSupervisionController import diffuseur
+from schemas import GranulariteSerie, StatutTransactionEnum
+from utils.cache_identite import charger_utilisateur_courant
+from utils.versions_donnees import TAUX, TRANSACTIONS, cache_etags
 
 supervision_router = APIRouter(
     prefix="/supervision",
@@ -12,11 +19,7 @@ supervision_router = APIRouter(
 
 ALLOWED_ROLES = {"service", "superviseur", "admin", "supervisor"}
 
-@supervision_router.get("/resume")
-def supervision_resume(
-    db: Session = Depends(get_db),
-    Authorize: AuthJWT = Depends()
-):
+def verifier_acces_supervision(Authorize: AuthJWT, db: Session) -> None:
     # ✅ Auth
     try:
         Authorize.jwt_required()
@@ -25,93 +28,108 @@ def supervision_resume(
     utilisateur_email = Authorize.get_jwt_subject()
 
     # ✅ Rôle: service / superviseur / admin
-    utilisateur = db.query(Utilisateur).filter(Utilisateur.email == utilisateur_email).first()
+    utilisateur = charger_utilisateur_courant(utilisateur_email, db)
     role = (getattr(utilisateur, "role", "") or "").lower()
     if not utilisateur or role not in ALLOWED_ROLES:
         raise HTTPException(status_code=403, detail="Accès refusé : rôle 'service' ou 'superviseur' requis.")
 
-    try:
-        # ✅ Total par service
-        total_par_service_raw = (
-            db.query(
-                Transaction.service.label("service"),
-                func.count().label("nombre"),
-                func.coalesce(func.sum(Transaction.montant), 0).label("montant_total")
-            )
-            .group_by(Transaction.service)
-            .all()
-        )
 
-        # ✅ Total par devise
-        total_par_devise_raw = (
-            db.query(
-                Transaction.devise.label("devise"),
-                func.coalesce(func.sum(Transaction.montant), 0).label("montant_total")
-            )
-            .group_by(Transaction.devise)
-            .all()
-        )
+def utc_naif(moment: Optional[datetime]) -> Optional[datetime]:
+    """Paramètre de requête → UTC naïf, comme les colonnes en base (`...Z` ou `+02:00` acceptés)."""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
 
-        # ✅ Total par statut
-        total_par_statut_raw = (
-            db.query(
-                Transaction.statut.label("statut"),
-                func.count(Transaction.id).label("nombre")
-            )
-            .group_by(Transaction.statut)
-            .all()
-        )
 
-        # ✅ Transactions avec taux de change
-        transactions_avec_taux = (
-            db.query(Transaction)
-            .options(joinedload(Transaction.taux_change))
-            .filter(Transaction.taux_change_id.isnot(None))
-            .all()
-        )
+def bornes_serie(granularite: GranulariteSerie, debut: Optional[datetime], fin: Optional[datetime]):
+    """Par défaut : les dernières 24 heures (heure) ou les 30 derniers jours (jour)."""
+    debut, fin = utc_naif(debut), utc_naif(fin)
+    fin = fin or datetime.utcnow()
+    debut = debut or fin - (timedelta(hours=24) if granularite == GranulariteSerie.heure else timedelta(days=30))
+    if debut >= fin:
+        raise HTTPException(status_code=400, detail="'debut' doit précéder 'fin'.")
+    return debut, fin
 
-        result = {
-            "total_par_service": [
-                {
-                    "service": service,
-                    "nombre": int(nombre or 0),
-                    "montant_total": float(montant_total or 0.0),
-                }
-                for service, nombre, montant_total in total_par_service_raw
-            ],
-            "total_par_devise": [
-                {
-                    "devise": devise,
-                    "montant_total": float(montant_total or 0.0),
-                }
-                for devise, montant_total in total_par_devise_raw
-            ],
-            "total_par_statut": [
-                {
-                    "statut": statut,
-                    "nombre": int(nombre or 0),
-                }
-                for statut, nombre in total_par_statut_raw
-            ],
-            "transactions_avec_taux": [
-                {
-                    "numero_transaction": t.numero_transaction,
-                    "montant": float(t.montant) if t.montant is not None else 0.0,
-                    "devise": t.devise,
-                    "service": t.service,
-                    "statut": t.statut,  # ← ajouté
-                    "date_transaction": getattr(t, "date_transaction", None),  # ← ajouté
-                    "taux_change": (t.taux_change.taux if getattr(t, "taux_change", None) else None),
-                    "id": t.id,  # utile si le front choisit d'utiliser l'id
-                }
-                for t in transactions_avec_taux
-            ],
-        }
-
-        return result
+
+@supervision_router.get("/resume")
+def supervision_resume(
+    request: Request,
+    db: Session = Depends(get_read_db),
+    Authorize: AuthJWT = Depends()
+):
+    verifier_acces_supervision(Authorize, db)
+    # ✅ ETag : 304 sans requête tant que ni transactions ni taux n'ont changé
+    non_modifie, jeton = cache_etags.verifier(request, "supervision_resume", (TRANSACTIONS, TAUX))
+    if non_modifie:
+        return non_modifie
+
+    try:
+        # ✅ Agrégats maintenus à l'écriture + transactions récentes avec taux
+        return cache_etags.repondre(request, jeton, supervisionController.formater_resume(
+            supervisionController.lire_agregats(db),
+            supervisionController.transactions_avec_taux(db),
+        ))
 
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Erreur lors de la récupération des données de supervision : {str(e)}"
         )
+
+
+# 📡 Flux SSE : instantané complet (format de /resume), puis deltas à chaque écriture validée
+@supervision_router.get("/flux")
+def supervision_flux(
+    request: Request,
+    db: Session = Depends(get_read_db),
+    Authorize: AuthJWT = Depends()
+):
+    verifier_acces_supervision(Authorize, db)
+    return StreamingResponse(
+        diffuseur.flux(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# 📈 Série temporelle (heure ou jour) lue dans les tables de séries, jamais dans transactions
+@supervision_router.get("/serie")
+def supervision_serie(
+    granularite: GranulariteSerie = GranulariteSerie.heure,
+    debut: Optional[datetime] = None,
+    fin: Optional[datetime] = None,
+    service: Optional[str] = None,
+    devise: Optional[str] = None,
+    statut: Optional[StatutTransactionEnum] = None,
+    db: Session = Depends(get_read_db),
+    Authorize: AuthJWT = Depends()
+):
+    verifier_acces_supervision(Authorize, db)
+    debut, fin = bornes_serie(granularite, debut, fin)
+    return supervisionController.lire_serie(
+        db, granularite.value, debut, fin,
+        service=service, devise=devise, statut=statut.value if statut else None,
+    )
+
+
+# 🧮 Regroupements libres (service × devise × statut × jour/heure) calculés sur l'instantané colonnes
+@supervision_router.get("/analytique")
+def supervision_analytique(
+    par: Optional[str] = Query(None, description="Dimensions séparées par des virgules : service,devise,statut,jour,heure"),
+    service: Optional[List[str]] = Query(None),
+    devise: Optional[List[str]] = Query(None),
+    statut: Optional[List[StatutTransactionEnum]] = Query(None),
+    debut: Optional[datetime] = None,
+    fin: Optional[datetime] = None,
+    db: Session = Depends(get_read_db),
+    Authorize: AuthJWT = Depends()
+):
+    verifier_acces_supervision(Authorize, db)
+    debut, fin = utc_naif(debut), utc_naif(fin)
+    if debut and fin and debut >= fin:
+        raise HTTPException(status_code=400, detail="'debut' doit précéder 'fin'.")
+    return analytiqueController.analyse_supervision(
+        analytiqueController.lire_dimensions(par),
+        {"service": service, "devise": devise, "statut": [s.value for s in statut] if statut else None},
+        debut, fin,
+    )
@@ -0,0 +1,70 @@
+# Routes asynchrones (DB_ASYNC=1) : incluses avant supervision_router dans main.py.
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi_jwt_auth import AuthJWT
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from controllers import supervisionControllerAsync
+from controllers.supervisionController import formater_resume
+from database import get_async_db, get_read_async_db
+from routes.supervisionRoutes import ALLOWED_ROLES, bornes_serie
+from schemas import GranulariteSerie, StatutTransactionEnum
+from utils.cache_identite import charger_utilisateur_courant_async
+from utils.versions_donnees import TAUX, TRANSACTIONS, cache_etags
+
+supervision_router_async = APIRouter(
+    prefix="/supervision",
+    tags=["Supervision"]
+)
+
+async def verifier_acces_supervision(Authorize: AuthJWT, db: AsyncSession) -> None:
+    # ✅ Auth
+    try:
+        Authorize.jwt_required()
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Authentification requise.")
+    utilisateur_email = Authorize.get_jwt_subject()
+
+    # ✅ Rôle: service / superviseur / admin
+    utilisateur = await charger_utilisateur_courant_async(utilisateur_email, db)
+    role = (getattr(utilisateur, "role", "") or "").lower()
+    if not utilisateur or role not in ALLOWED_ROLES:
+        raise HTTPException(status_code=403, detail="Accès refusé : rôle 'service' ou 'superviseur' requis.")
+
+
+@supervision_router_async.get("/resume")
+async def supervision_resume(
+    request: Request,
+    db: AsyncSession = Depends(get_read_async_db),
+    Authorize: AuthJWT = Depends()
+):
+    await verifier_acces_supervision(Authorize, db)
+    non_modifie, jeton = cache_etags.verifier(request, "supervision_resume", (TRANSACTIONS, TAUX))
+    if non_modifie:
+        return non_modifie
+
+    return cache_etags.repondre(request, jeton, formater_resume(
+        await supervisionControllerAsync.lire_agregats(db),
+        await supervisionControllerAsync.transactions_avec_taux(db),
+    ))
+
+
+@supervision_router_async.get("/serie")
+async def supervision_serie(
+    granularite: GranulariteSerie = GranulariteSerie.heure,
+    debut: Optional[datetime] = None,
+    fin: Optional[datetime] = None,
+    service: Optional[str] = None,
+    devise: Optional[str] = None,
+    statut: Optional[StatutTransactionEnum] = None,
+    db: AsyncSession = Depends(get_read_async_db),
+    Authorize: AuthJWT = Depends()
+):
+    await verifier_acces_supervision(Authorize, db)
+    debut, fin = bornes_serie(granularite, debut, fin)
+    return await supervisionControllerAsync.lire_serie(
+        db, granularite.value, debut, fin,
+        service=service, devise=devise, statut=statut.value if statut else None,
+    )
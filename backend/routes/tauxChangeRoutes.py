@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Request, status
 from sqlalchemy.orm import Session
 from controllers import tauxChangeController
 from schemas import TauxChangeCreate, TauxChangeResponse
 from controllers.authController import get_db
 from fastapi_jwt_auth import AuthJWT
+from utils.versions_donnees import TAUX, cache_etags
 
 taux_change_router = APIRouter(
     prefix="/tauxchange",
@@ -23,16 +24,20 @@ def creer_taux_change(
     print("Payload reçu:", taux.dict())  # 🔍 pour diagnostiquer les erreurs 422
     return tauxChangeController.creer_taux_change(taux, db)
 
-# ✅ Lister les taux
+# ✅ Lister les taux (servis par cache_taux, sans session ; ETag : 304 tant qu'aucun taux n'a changé)
 @taux_change_router.get("/", response_model=list[TauxChangeResponse])
 def lister_taux_change(
-    db: Session = Depends(get_db),
+    request: Request,
     Authorize: AuthJWT = Depends()
 ):
     Authorize.jwt_required()
     current_user = Authorize.get_jwt_subject()
     print(f"[GET] Liste taux consultée par: {current_user}")
-    return tauxChangeController.lister_taux_change(db)
+    non_modifie, jeton = cache_etags.verifier(request, "tauxchange", (TAUX,))
+    if non_modifie:
+        return non_modifie
+    taux_list = tauxChangeController.lister_taux_change()
+    return cache_etags.repondre(request, jeton, [TauxChangeResponse.from_orm(t) for t in taux_list])
 
 # ✅ Mettre à jour un taux existant
 @taux_change_router.put("/{taux_id}", response_model=TauxChangeResponse)
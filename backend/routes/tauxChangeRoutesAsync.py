@@ -0,0 +1,58 @@
+# Routes asynchrones (DB_ASYNC=1) : incluses avant taux_change_router dans main.py.
+from fastapi import APIRouter, Depends, Request, status
+from fastapi_jwt_auth import AuthJWT
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from controllers import tauxChangeControllerAsync
+from database import get_async_db
+from schemas import TauxChangeCreate, TauxChangeResponse
+from utils.versions_donnees import TAUX, cache_etags
+
+taux_change_router_async = APIRouter(
+    prefix="/tauxchange",
+    tags=["taux de change"]
+)
+
+# ✅ Créer un taux de change
+@taux_change_router_async.post("/", response_model=TauxChangeResponse, status_code=status.HTTP_201_CREATED)
+async def creer_taux_change(
+    taux: TauxChangeCreate,
+    db: AsyncSession = Depends(get_async_db),
+    Authorize: AuthJWT = Depends()
+):
+    Authorize.jwt_required()
+    return await tauxChangeControllerAsync.creer_taux_change(taux, db)
+
+# ✅ Lister les taux (servis par cache_taux, sans session)
+@taux_change_router_async.get("/", response_model=list[TauxChangeResponse])
+async def lister_taux_change(
+    request: Request,
+    Authorize: AuthJWT = Depends()
+):
+    Authorize.jwt_required()
+    non_modifie, jeton = cache_etags.verifier(request, "tauxchange", (TAUX,))
+    if non_modifie:
+        return non_modifie
+    taux_list = await tauxChangeControllerAsync.lister_taux_change()
+    return cache_etags.repondre(request, jeton, [TauxChangeResponse.from_orm(t) for t in taux_list])
+
+# ✅ Mettre à jour un taux existant
+@taux_change_router_async.put("/{taux_id}", response_model=TauxChangeResponse)
+async def mettre_a_jour_taux(
+    taux_id: int,
+    taux: TauxChangeCreate,
+    db: AsyncSession = Depends(get_async_db),
+    Authorize: AuthJWT = Depends()
+):
+    Authorize.jwt_required()
+    return await tauxChangeControllerAsync.mettre_a_jour_taux(taux_id, taux, db)
+
+# ✅ Supprimer un taux
+@taux_change_router_async.delete("/{taux_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def supprimer_taux(
+    taux_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    Authorize: AuthJWT = Depends()
+):
+    Authorize.jwt_required()
+    await tauxChangeControllerAsync.supprimer_taux(taux_id, db)
@@ -1,24 +1,40 @@
+from datetime import datetime
 from typing import List, Dict, Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
 from fastapi_jwt_auth import AuthJWT
 from sqlalchemy.orm import Session
 
-from controllers import transactionController
+from controllers import idempotenceController, transactionController
 from schemas import (
     TransactionCreate,
     TransactionReponse,
     TransactionUpdateStatut,
     TransactionUpdate,
+    TransactionFiltres,
+    TransactionPage,
+    StatutTransactionEnum,
+    FormatExport,
+    ResultatLot,
+    TransactionStatutLot,
+    ResultatStatutLot,
+    RecusLot,
+    BailFileAttente,
+    LiberationFileAttente,
+    ResultatLiberation,
 )
 from controllers.authController import get_db
-from models import Utilisateur, Transaction
+from database import get_read_db
+from utils.cache_identite import UtilisateurCourant, charger_utilisateur_courant
+from utils import receipt_generator
 
 transaction_router = APIRouter(prefix="/transactions", tags=["transactions"])
 
 # --------- Helpers ----------
 def get_current_user(
     Authorize: AuthJWT = Depends(), db: Session = Depends(get_db)
-) -> Utilisateur:
+) -> UtilisateurCourant:
     try:
         Authorize.jwt_required()
     except Exception:
@@ -34,11 +50,7 @@ def get_current_user(
             detail="Jeton invalide: sujet manquant."
         )
 
-    utilisateur = (
-        db.query(Utilisateur)
-        .filter(Utilisateur.email == utilisateur_email)
-        .first()
-    )
+    utilisateur = charger_utilisateur_courant(utilisateur_email, db)
     if not utilisateur:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -47,14 +59,22 @@ def get_current_user(
     return utilisateur
 
 
-def require_role(user: Utilisateur, role: str) -> None:
+def get_cle_idempotence(
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+) -> Optional[str]:
+    if idempotency_key is None:
+        return None
+    return idempotenceController.verifier_cle(idempotency_key)
+
+
+def require_role(user: UtilisateurCourant, role: str) -> None:
     if str(user.role or "").lower() != role.lower():
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Accès réservé au rôle '{role}'."
         )
 
-def require_one_of(user: Utilisateur, roles: List[str]) -> None:
+def require_one_of(user: UtilisateurCourant, roles: List[str]) -> None:
     role_user = str(user.role or "").lower()
     allowed = {str(r).lower() for r in roles}
     if role_user not in allowed:
@@ -63,42 +83,173 @@ def require_one_of(user: Utilisateur, roles: List[str]) -> None:
             detail=f"Accès réservé aux rôles: {', '.join(roles)}."
         )
 
+# Les agents traitent la file (validation, annulation) : ils ne remettent rien en attente
+def verifier_statut_agent(user: UtilisateurCourant, statut: str) -> None:
+    if str(user.role or "").lower() == "agent" and statut == "en attente":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Un agent ne peut pas remettre une transaction en attente."
+        )
+
+def get_filtres(
+    statut: Optional[StatutTransactionEnum] = None,
+    service: Optional[str] = None,
+    devise: Optional[str] = None,
+    date_debut: Optional[datetime] = None,
+    date_fin: Optional[datetime] = None,
+) -> TransactionFiltres:
+    return TransactionFiltres(
+        statut=statut,
+        service=service,
+        devise=devise,
+        date_debut=date_debut,
+        date_fin=date_fin,
+    )
+
+def ajouter_alerts_count(payload: Dict[str, Any]) -> Dict[str, Any]:
+    if "alerts_count" not in payload:
+        try:
+            txs = payload.get("transactions_avec_taux") or []
+            alerts_count = sum(1 for t in txs if float(t.get("montant", 0)) > 200)
+            payload["alerts_count"] = alerts_count
+        except Exception:
+            payload.setdefault("alerts_count", 0)
+    return payload
+
 # --------- Endpoints ----------
 
 # ✅ Créer une transaction
 @transaction_router.post("/", response_model=TransactionReponse, status_code=status.HTTP_201_CREATED)
 def creer_transaction(
     transaction: TransactionCreate,
+    cle_idempotence: Optional[str] = Depends(get_cle_idempotence),
     db: Session = Depends(get_db),
-    user: Utilisateur = Depends(get_current_user),
+    user: UtilisateurCourant = Depends(get_current_user),
 ):
-    return transactionController.creer_transaction(transaction, user.email, db)
+    return transactionController.creer_transaction(transaction, user.email, db, cle_idempotence)
 
-# ✅ Lister toutes les transactions (selon rôle)
-@transaction_router.get("/", response_model=List[TransactionReponse])
-def lister_transactions(
+# ✅ Créer des transactions en lot (résultat par élément, doublons signalés sans tout annuler)
+@transaction_router.post("/batch", response_model=ResultatLot)
+def creer_transactions_en_lot(
+    transactions: List[TransactionCreate],
+    db: Session = Depends(get_db),
+    user: UtilisateurCourant = Depends(get_current_user),
+):
+    return transactionController.creer_transactions_en_lot(transactions, user.email, db)
+
+# ✅ File d'attente des agents : prendre à bail les N prochaines transactions en attente
+ROLES_FILE_ATTENTE = ["agent", "service", "superviseur", "admin", "supervisor"]
+
+@transaction_router.post("/file-attente/prendre", response_model=BailFileAttente)
+def prendre_transactions(
+    n: int = Query(20, ge=1, le=transactionController.FILE_ATTENTE_MAX),
+    db: Session = Depends(get_db),
+    user: UtilisateurCourant = Depends(get_current_user),
+):
+    require_one_of(user, ROLES_FILE_ATTENTE)
+    return transactionController.prendre_transactions(user.id, n, db)
+
+# ✅ Rendre des baux avant leur expiration
+@transaction_router.post("/file-attente/liberer", response_model=ResultatLiberation)
+def liberer_transactions(
+    liberation: LiberationFileAttente,
     db: Session = Depends(get_db),
-    user: Utilisateur = Depends(get_current_user),
+    user: UtilisateurCourant = Depends(get_current_user),
 ):
-    return transactionController.lister_transactions(user.email, user.role, db)
+    require_one_of(user, ROLES_FILE_ATTENTE)
+    return transactionController.liberer_transactions(user.id, liberation.ids, db)
+
+# ✅ Lister toutes les transactions (selon rôle, paginé par curseur)
+@transaction_router.get("/", response_model=TransactionPage)
+def lister_transactions(
+    filtres: TransactionFiltres = Depends(get_filtres),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    user: UtilisateurCourant = Depends(get_current_user),
+):
+    return transactionController.lister_transactions(user.email, user.role, db, filtres, limit, cursor)
 
 # ✅ Mes transactions
-@transaction_router.get("/mes-transactions", response_model=List[TransactionReponse])
+@transaction_router.get("/mes-transactions", response_model=TransactionPage)
 def mes_transactions(
+    filtres: TransactionFiltres = Depends(get_filtres),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db),
+    user: UtilisateurCourant = Depends(get_current_user),
+):
+    return transactionController.lister_transactions(user.email, user.role, db, filtres, limit, cursor)
+
+# ✅ Export complet (CSV ou NDJSON) en flux, mêmes filtres que la liste
+@transaction_router.get("/export")
+def exporter_transactions(
+    format: FormatExport = FormatExport.csv,
+    filtres: TransactionFiltres = Depends(get_filtres),
+    db: Session = Depends(get_read_db),
+    user: UtilisateurCourant = Depends(get_current_user),
+):
+    query = transactionController.requete_export(user.email, user.role, db, filtres)
+    if format == FormatExport.csv:
+        media_type, extension = "text/csv; charset=utf-8", "csv"
+    else:
+        media_type, extension = "application/x-ndjson", "ndjson"
+    return StreamingResponse(
+        transactionController.flux_export_transactions(query, format.value),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transactions.{extension}"'},
+    )
+
+# 🧾 Reçu PDF d'une transaction (rendu en mémoire, mis en cache)
+@transaction_router.get("/{transaction_id}/recu")
+def telecharger_recu(
+    transaction_id: int,
+    db: Session = Depends(get_read_db),
+    user: UtilisateurCourant = Depends(get_current_user),
+):
+    nom_fichier, pdf = transactionController.recu_transaction(transaction_id, user.email, user.role, db)
+    return Response(
+        content=pdf,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{nom_fichier}"'},
+    )
+
+# 🧾 Reçus en lot : archive ZIP, rendus dans un pool de processus
+@transaction_router.post("/recus")
+async def telecharger_recus(
+    lot: RecusLot,
     db: Session = Depends(get_db),
-    user: Utilisateur = Depends(get_current_user),
+    user: UtilisateurCourant = Depends(get_current_user),
 ):
-    return transactionController.lister_transactions(user.email, user.role, db)
+    champs = await run_in_threadpool(transactionController.champs_recus, lot.ids, user.email, user.role, db)
+    archive = await receipt_generator.generer_zip_recus(champs)
+    return Response(
+        content=archive,
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="recus.zip"'},
+    )
+
+# ✅ Modifier le statut en lot (ids et/ou numéros) — service/superviseur/admin
+@transaction_router.patch("/status", response_model=ResultatStatutLot)
+def changer_statut_en_lot(
+    lot: TransactionStatutLot,
+    db: Session = Depends(get_db),
+    user: UtilisateurCourant = Depends(get_current_user),
+):
+    require_one_of(user, ["agent", "service", "superviseur", "admin", "supervisor"])
+    verifier_statut_agent(user, lot.statut)
+    return transactionController.changer_statut_en_lot(lot, db, utilisateur_id=user.id)
 
-# ✅ Modifier le statut (par ID) — superviseur/admin
+# ✅ Modifier le statut (par ID) — agent/superviseur/admin
 @transaction_router.patch("/{transaction_id}/status", response_model=TransactionReponse)
 def changer_statut_par_id(
     transaction_id: int,
     update: TransactionUpdateStatut,
     db: Session = Depends(get_db),
-    user: Utilisateur = Depends(get_current_user),
+    user: UtilisateurCourant = Depends(get_current_user),
 ):
-    require_one_of(user, ["superviseur", "admin", "supervisor"])
+    require_one_of(user, ["agent", "superviseur", "admin", "supervisor"])
+    verifier_statut_agent(user, update.statut)
 
     valeurs_autorisees = {"en attente", "validée", "annulée"}
     if update.statut not in valeurs_autorisees:
@@ -109,29 +260,25 @@ def changer_statut_par_id(
 
     # Utilise la logique métier du controller
     if update.statut in {"validée", "annulée"}:
-        tx = transactionController.changer_statut_transaction(transaction_id, update.statut, db)
+        tx = transactionController.changer_statut_transaction(transaction_id, update.statut, db,
+                                                              utilisateur_id=user.id)
     else:
         # on autorise aussi repasser à "en attente" si nécessaire
-        tx_obj = db.query(Transaction).filter(Transaction.id == transaction_id).first()
-        if not tx_obj:
-            raise HTTPException(status_code=404, detail="Transaction non trouvée.")
-        tx_obj.statut = update.statut
-        db.commit()
-        db.refresh(tx_obj)
-        tx = tx_obj
+        tx = transactionController.remettre_en_attente(db, transaction_id=transaction_id, utilisateur_id=user.id)
 
     return tx
 
-# ✅ Modifier le statut (par NUMÉRO) — service/superviseur/admin
+# ✅ Modifier le statut (par NUMÉRO) — agent/service/superviseur/admin
 @transaction_router.patch("/{numero_transaction}/statut", response_model=TransactionReponse)
 def changer_statut_par_numero(
     numero_transaction: str,
     update: TransactionUpdateStatut,
     db: Session = Depends(get_db),
-    user: Utilisateur = Depends(get_current_user),
+    user: UtilisateurCourant = Depends(get_current_user),
 ):
     # ← ICI on ajoute "service"
-    require_one_of(user, ["service", "superviseur", "admin", "supervisor"])
+    require_one_of(user, ["agent", "service", "superviseur", "admin", "supervisor"])
+    verifier_statut_agent(user, update.statut)
 
     valeurs_autorisees = {"en attente", "validée", "annulée"}
     if update.statut not in valeurs_autorisees:
@@ -141,15 +288,11 @@ def changer_statut_par_numero(
         )
 
     if update.statut in {"validée", "annulée"}:
-        tx = transactionController.changer_statut_transaction_par_numero(numero_transaction, update.statut, db)
+        tx = transactionController.changer_statut_transaction_par_numero(numero_transaction, update.statut, db,
+                                                                         utilisateur_id=user.id)
     else:
-        tx_obj = db.query(Transaction).filter(Transaction.numero_transaction == numero_transaction).first()
-        if not tx_obj:
-            raise HTTPException(status_code=404, detail="Transaction non trouvée.")
-        tx_obj.statut = update.statut
-        db.commit()
-        db.refresh(tx_obj)
-        tx = tx_obj
+        tx = transactionController.remettre_en_attente(db, numero_transaction=numero_transaction,
+                                                       utilisateur_id=user.id)
 
     return tx
 
@@ -157,26 +300,19 @@ def changer_statut_par_numero(
 # ✅ Supervision (service)
 @transaction_router.get("/supervision/resume", response_model=Dict[str, Any])
 def supervision_resume(
-    db: Session = Depends(get_db),
-    user: Utilisateur = Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+    user: UtilisateurCourant = Depends(get_current_user),
 ):
     require_role(user, "service")
     payload = transactionController.tableau_de_bord_supervision(db)
-    if "alerts_count" not in payload:
-        try:
-            txs = payload.get("transactions_avec_taux") or []
-            alerts_count = sum(1 for t in txs if float(t.get("montant", 0)) > 200)
-            payload["alerts_count"] = alerts_count
-        except Exception:
-            payload.setdefault("alerts_count", 0)
-    return payload
+    return ajouter_alerts_count(payload)
 
 # ✅ Supprimer une transaction
 @transaction_router.delete("/{transaction_id}", status_code=status.HTTP_204_NO_CONTENT)
 def supprimer_transaction(
     transaction_id: int,
     db: Session = Depends(get_db),
-    user: Utilisateur = Depends(get_current_user),
+    user: UtilisateurCourant = Depends(get_current_user),
 ):
     transactionController.supprimer_transaction(transaction_id, user.email, db)
     return
@@ -187,6 +323,6 @@ def modifier_transaction(
     transaction_id: int,
     update_data: TransactionUpdate,
     db: Session = Depends(get_db),
-    user: Utilisateur = Depends(get_current_user),
+    user: UtilisateurCourant = Depends(get_current_user),
 ):
     return transactionController.modifier_transaction(transaction_id, update_data, user.email, db)
@@ -0,0 +1,126 @@
+# Routes asynchrones (DB_ASYNC=1) : incluses avant transaction_router dans main.py,
+# elles remplacent les routes synchrones de même chemin et méthode.
+from typing import Dict, Any, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi_jwt_auth import AuthJWT
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from controllers import transactionControllerAsync
+from database import get_async_db, get_read_async_db
+from schemas import (
+    TransactionCreate,
+    TransactionReponse,
+    TransactionUpdateStatut,
+    TransactionFiltres,
+    TransactionPage,
+)
+from routes.transactionRoutes import (
+    ajouter_alerts_count, get_cle_idempotence, get_filtres, require_one_of, require_role, verifier_statut_agent,
+)
+from utils.cache_identite import UtilisateurCourant, charger_utilisateur_courant_async
+
+transaction_router_async = APIRouter(prefix="/transactions", tags=["transactions"])
+
+# --------- Helpers ----------
+async def get_current_user_async(
+    Authorize: AuthJWT = Depends(), db: AsyncSession = Depends(get_async_db)
+) -> UtilisateurCourant:
+    try:
+        Authorize.jwt_required()
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentification requise."
+        )
+
+    utilisateur_email = Authorize.get_jwt_subject()
+    if not utilisateur_email:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Jeton invalide: sujet manquant."
+        )
+
+    utilisateur = await charger_utilisateur_courant_async(utilisateur_email, db)
+    if not utilisateur:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Utilisateur non trouvé."
+        )
+    return utilisateur
+
+
+async def _changer_statut(update: TransactionUpdateStatut, db: AsyncSession, user: UtilisateurCourant, **cible):
+    valeurs_autorisees = {"en attente", "validée", "annulée"}
+    if update.statut not in valeurs_autorisees:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Statut invalide. Valeurs autorisées: {', '.join(valeurs_autorisees)}"
+        )
+    verifier_statut_agent(user, update.statut.value)
+    return await transactionControllerAsync.changer_statut(update.statut.value, db, utilisateur_id=user.id, **cible)
+
+# --------- Endpoints ----------
+
+# ✅ Créer une transaction
+@transaction_router_async.post("/", response_model=TransactionReponse, status_code=status.HTTP_201_CREATED)
+async def creer_transaction(
+    transaction: TransactionCreate,
+    cle_idempotence: Optional[str] = Depends(get_cle_idempotence),
+    db: AsyncSession = Depends(get_async_db),
+    user: UtilisateurCourant = Depends(get_current_user_async),
+):
+    return await transactionControllerAsync.creer_transaction(transaction, user.email, db, cle_idempotence)
+
+# ✅ Lister toutes les transactions (selon rôle, paginé par curseur)
+@transaction_router_async.get("/", response_model=TransactionPage)
+async def lister_transactions(
+    filtres: TransactionFiltres = Depends(get_filtres),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_async_db),
+    user: UtilisateurCourant = Depends(get_current_user_async),
+):
+    return await transactionControllerAsync.lister_transactions(user.email, user.role, db, filtres, limit, cursor)
+
+# ✅ Mes transactions
+@transaction_router_async.get("/mes-transactions", response_model=TransactionPage)
+async def mes_transactions(
+    filtres: TransactionFiltres = Depends(get_filtres),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_async_db),
+    user: UtilisateurCourant = Depends(get_current_user_async),
+):
+    return await transactionControllerAsync.lister_transactions(user.email, user.role, db, filtres, limit, cursor)
+
+# ✅ Modifier le statut (par ID) — agent/superviseur/admin
+@transaction_router_async.patch("/{transaction_id}/status", response_model=TransactionReponse)
+async def changer_statut_par_id(
+    transaction_id: int,
+    update: TransactionUpdateStatut,
+    db: AsyncSession = Depends(get_async_db),
+    user: UtilisateurCourant = Depends(get_current_user_async),
+):
+    require_one_of(user, ["agent", "superviseur", "admin", "supervisor"])
+    return await _changer_statut(update, db, user, transaction_id=transaction_id)
+
+# ✅ Modifier le statut (par NUMÉRO) — agent/service/superviseur/admin
+@transaction_router_async.patch("/{numero_transaction}/statut", response_model=TransactionReponse)
+async def changer_statut_par_numero(
+    numero_transaction: str,
+    update: TransactionUpdateStatut,
+    db: AsyncSession = Depends(get_async_db),
+    user: UtilisateurCourant = Depends(get_current_user_async),
+):
+    require_one_of(user, ["agent", "service", "superviseur", "admin", "supervisor"])
+    return await _changer_statut(update, db, user, numero_transaction=numero_transaction)
+
+# ✅ Supervision (service)
+@transaction_router_async.get("/supervision/resume", response_model=Dict[str, Any])
+async def supervision_resume(
+    db: AsyncSession = Depends(get_read_async_db),
+    user: UtilisateurCourant = Depends(get_current_user_async),
+):
+    require_role(user, "service")
+    payload = await transactionControllerAsync.tableau_de_bord_supervision(db)
+    return ajouter_alerts_count(payload)
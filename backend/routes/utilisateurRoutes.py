@@ -4,7 +4,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from fastapi_jwt_auth import AuthJWT
 from controllers.authController import get_db
-from models import Utilisateur
+from routes.transactionRoutes import get_current_user, require_one_of
+from utils.cache_identite import UtilisateurCourant, cache_identite, charger_utilisateur_courant
 
 utilisateur_router = APIRouter(
     prefix="/utilisateur",
@@ -16,7 +17,7 @@ def lire_profil(Authorize: AuthJWT = Depends(), db: Session = Depends(get_db)):
     try:
         Authorize.jwt_required()
         email = Authorize.get_jwt_subject()
-        utilisateur = db.query(Utilisateur).filter(Utilisateur.email == email).first()
+        utilisateur = charger_utilisateur_courant(email, db)
         if not utilisateur:
             raise HTTPException(status_code=404, detail="Utilisateur non trouvé.")
         return {
@@ -26,3 +27,10 @@ def lire_profil(Authorize: AuthJWT = Depends(), db: Session = Depends(get_db)):
         }
     except Exception:
         raise HTTPException(status_code=401, detail="Accès non autorisé.")
+
+
+# ✅ Statistiques du cache d'identité — superviseur/admin
+@utilisateur_router.get("/cache-identite")
+def stats_cache_identite(user: UtilisateurCourant = Depends(get_current_user)):
+    require_one_of(user, ["admin", "superviseur", "supervisor"])
+    return cache_identite.stats()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, confloat, constr, validator
+from pydantic import BaseModel, EmailStr, confloat, conlist, constr, validator
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -93,6 +93,23 @@ class TransactionUpdate(BaseModel):
 class TransactionUpdateStatut(BaseModel):
     statut: StatutTransactionEnum
 
+class TransactionStatutLot(BaseModel):
+    ids: List[int] = []
+    numeros_transaction: List[str] = []
+    statut: StatutTransactionEnum
+
+    @validator('statut')
+    def statut_final(cls, v):
+        if v == StatutTransactionEnum.en_attente:
+            raise ValueError("Statut invalide. Doit être 'validée' ou 'annulée'.")
+        return v
+
+    @validator('numeros_transaction', always=True)
+    def au_moins_une_cible(cls, v, values):
+        if not v and not values.get('ids'):
+            raise ValueError("Fournir au moins un id ou un numéro de transaction.")
+        return v
+
 # --- Réponse enrichie (pour supervision / admin) ---
 class TransactionReponse(TransactionBase):
     id: int
@@ -101,6 +118,64 @@ class TransactionReponse(TransactionBase):
     class Config:
         orm_mode = True
 
+# --- Pagination par curseur (keyset sur date_transaction, id) ---
+class TransactionFiltres(BaseModel):
+    statut: Optional[StatutTransactionEnum] = None
+    service: Optional[str] = None
+    devise: Optional[str] = None
+    date_debut: Optional[datetime] = None
+    date_fin: Optional[datetime] = None
+
+class TransactionPage(BaseModel):
+    items: List[TransactionReponse]
+    next_cursor: Optional[str] = None
+
+# --- File d'attente des agents (transactions en attente prises à bail) ---
+class BailFileAttente(BaseModel):
+    bail_expire_a: datetime
+    transactions: List[TransactionReponse]
+
+class LiberationFileAttente(BaseModel):
+    ids: conlist(int, min_items=1)
+
+class ResultatLiberation(BaseModel):
+    liberees: int
+
+class FormatExport(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
+# --- Création en lot ---
+class ResultatLotEnum(str, Enum):
+    creee = "créée"
+    doublon = "doublon"
+    erreur = "erreur"
+
+class ResultatLotItem(BaseModel):
+    index: int
+    numero_transaction: str
+    resultat: ResultatLotEnum
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class ResultatLot(BaseModel):
+    creees: int
+    rejetees: int
+    resultats: List[ResultatLotItem]
+
+# --- Changement de statut en lot ---
+class TransactionIgnoree(BaseModel):
+    cle: str
+    raison: str
+
+class ResultatStatutLot(BaseModel):
+    modifiees: List[TransactionReponse]
+    ignorees: List[TransactionIgnoree]
+
+# --- Reçus en lot ---
+class RecusLot(BaseModel):
+    ids: conlist(int, min_items=1)
+
 class TransactionDetail(TransactionReponse):
     utilisateur: UtilisateurReponse
     taux_change: Optional[TauxChangeResponse]
@@ -132,3 +207,8 @@ class SupervisionResponse(BaseModel):
 
     class Config:
         orm_mode = True
+
+# --- Séries de supervision ---
+class GranulariteSerie(str, Enum):
+    heure = "heure"
+    jour = "jour"
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Les modules du backend s'importent depuis la racine du backend (comme main.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# database.py exige une URL ; aucune connexion n'est ouverte par ces tests
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/transactions")
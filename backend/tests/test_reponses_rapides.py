@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from schemas import TransactionPage
+from utils.reponses_rapides import CHAMPS_TRANSACTION, ReponseOrjson, page_transactions
+
+
+def ligne(**valeurs):
+    """Ligne de COLONNES_TRANSACTION, dans l'ordre de CHAMPS_TRANSACTION."""
+    defaut = {
+        "montant": 1500.0,
+        "devise": "XOF",
+        "service": "WU",
+        "numero_transaction": "N1",
+        "statut": "en attente",
+        "taux_change_id": 3,
+        "id": 1,
+        "date_transaction": datetime(2026, 10, 18, 5, 0, 0),
+    }
+    defaut.update(valeurs)
+    return tuple(defaut[champ] for champ in CHAMPS_TRANSACTION)
+
+
+def corps_fastapi(page):
+    """Corps écrit par FastAPI pour response_model=TransactionPage."""
+    items = [dict(zip(CHAMPS_TRANSACTION, l)) for l in page["items"]]
+    return JSONResponse(jsonable_encoder(TransactionPage(items=items, next_cursor=page["next_cursor"]))).body
+
+
+@pytest.mark.parametrize("page", [
+    pytest.param({"items": [], "next_cursor": None}, id="page-vide"),
+    pytest.param({"items": [ligne(service="Mobile Money — Côte d'Ivoire", devise="€",
+                                  numero_transaction="N°1-ü")],
+                  "next_cursor": "curseur-é"}, id="accents"),
+    pytest.param({"items": [ligne(statut=None, taux_change_id=None)], "next_cursor": None}, id="champs-none"),
+    pytest.param({"items": [ligne(date_transaction=datetime(2026, 10, 18, 5, 0, 0, 123456)),
+                            ligne(id=2, date_transaction=datetime(2026, 10, 18, 5, 0, 0, 5))],
+                  "next_cursor": "abc"}, id="microsecondes"),
+    pytest.param({"items": [ligne(montant=0.1), ligne(id=2, montant=1e6), ligne(id=3, montant=12.345)],
+                  "next_cursor": None}, id="flottants"),
+])
+def test_corps_identique_a_fastapi(page):
+    reponse = page_transactions(page)
+    assert isinstance(reponse, ReponseOrjson)
+    assert reponse.body == corps_fastapi(page)
+    assert reponse.media_type == "application/json"
+
+
+@pytest.mark.parametrize("montant", [1e-05, 0.00009])
+def test_flottant_different_repasse_par_response_model(montant):
+    page = {"items": [ligne(montant=montant)], "next_cursor": None}
+    contenu = page_transactions(page)
+    # orjson écrirait 1e-5 là où json écrit 1e-05 : la page repart en dicts vers response_model
+    assert isinstance(contenu, dict)
+    assert JSONResponse(jsonable_encoder(TransactionPage(**contenu))).body == corps_fastapi(page)
@@ -0,0 +1,132 @@
+import asyncio
+import os
+import re
+import time
+from typing import Dict, Optional
+
+from fastapi.responses import JSONResponse
+
+from utils import metriques
+
+# Contrôle d'admission : places et file d'attente bornées par classe de routes, 503 immédiat
+# (Retry-After) quand une classe est saturée. Désactivable : ADMISSION_CONTROLE=0
+ADMISSION_CONTROLE = os.getenv("ADMISSION_CONTROLE", "1") == "1"
+# Attente maximale dans la file avant un 503 (secondes)
+ADMISSION_ATTENTE_MAX = float(os.getenv("ADMISSION_ATTENTE_MAX", "2"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+LECTURE_LOURDE = "lecture_lourde"
+ECRITURE = "ecriture"
+AUTH = "auth"
+
+# (places simultanées, requêtes en file) par défaut : le pool SQL compte 15 connexions
+# (5 + 10 de débordement) et le threadpool 40 fils ; les lectures lourdes n'en prennent qu'une part
+LIMITES_DEFAUT = {LECTURE_LOURDE: (4, 8), ECRITURE: (24, 128), AUTH: (4, 16)}
+
+METHODES_ECRITURE = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Première règle applicable : (méthodes ou None pour toutes, chemin, classe ou None = non limitée)
+REGLES = [
+    (None, re.compile(r"^/(health|metrics|docs|redoc|openapi\.json)"), None),
+    ({"GET"}, re.compile(r"^/supervision/flux/?$"), None),  # flux SSE : connexion longue, sans requête SQL
+    (None, re.compile(r"^/authentification/"), AUTH),
+    ({"GET"}, re.compile(
+        r"^/(supervision/|alertes/?$|transactions/?$"
+        r"|transactions/(mes-transactions|export|supervision/resume|\d+/recu)/?$)"
+    ), LECTURE_LOURDE),
+    ({"POST"}, re.compile(r"^/transactions/recus/?$"), LECTURE_LOURDE),
+    (METHODES_ECRITURE, re.compile(r""), ECRITURE),
+]
+
+
+def classe_requete(methode: str, chemin: str) -> Optional[str]:
+    for methodes, motif, classe in REGLES:
+        if (methodes is None or methode in methodes) and motif.match(chemin):
+            return classe
+    return None
+
+
+class ClasseAdmission:
+    """Compteurs manipulés dans la boucle d'événements uniquement : pas de verrou."""
+
+    def __init__(self, nom: str, limite: int, file_max: int, attente_max: float = ADMISSION_ATTENTE_MAX):
+        self.nom = nom
+        self.limite = limite
+        self.file_max = file_max
+        self.attente_max = attente_max
+        self._places = asyncio.Semaphore(limite)
+        self.en_cours = 0
+        self.en_attente = 0
+
+    async def entrer(self) -> Optional[str]:
+        """None si admise, sinon la raison du refus."""
+        if not self._places.locked():
+            await self._places.acquire()  # place libre : admise sans attente
+        elif self.en_attente >= self.file_max:
+            return "file_pleine"
+        else:
+            self.en_attente += 1
+            debut = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._places.acquire(), self.attente_max)
+            except asyncio.TimeoutError:
+                return "attente_expiree"
+            finally:
+                self.en_attente -= 1
+                metriques.ADMISSION_ATTENTE.labels(self.nom).observe(time.perf_counter() - debut)
+        self.en_cours += 1
+        return None
+
+    def sortir(self) -> None:
+        self.en_cours -= 1
+        self._places.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {"en_cours": self.en_cours, "en_attente": self.en_attente,
+                "limite": self.limite, "file_max": self.file_max}
+
+
+def _limites(nom: str, defaut) -> tuple:
+    prefixe = f"ADMISSION_{nom.upper()}"
+    return int(os.getenv(f"{prefixe}_LIMITE", defaut[0])), int(os.getenv(f"{prefixe}_FILE", defaut[1]))
+
+
+classes_admission: Dict[str, ClasseAdmission] = {
+    nom: ClasseAdmission(nom, *_limites(nom, defaut)) for nom, defaut in LIMITES_DEFAUT.items()
+}
+
+
+class ControleAdmission:
+    """
+    Middleware ASGI (et non @app.middleware("http")) : la place est rendue quand le corps de la
+    réponse est entièrement envoyé, y compris pour les exports et reçus diffusés en streaming.
+    """
+
+    def __init__(self, app, classes: Optional[Dict[str, ClasseAdmission]] = None):
+        self.app = app
+        self.classes = classes if classes is not None else classes_admission
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        classe = self.classes.get(classe_requete(scope["method"], scope["path"]))
+        if classe is None:
+            return await self.app(scope, receive, send)
+
+        refus = await classe.entrer()
+        if refus is not None:
+            metriques.ADMISSION_REJETS.labels(classe.nom, refus).inc()
+            reponse = JSONResponse(
+                status_code=503,
+                content={"detail": "Service momentanément saturé, réessayez plus tard."},
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+            )
+            return await reponse(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            classe.sortir()
+
+
+def stats() -> Dict[str, Dict[str, int]]:
+    return {nom: classe.stats() for nom, classe in classes_admission.items()}
@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import Utilisateur
+
+# Durée de vie d'une entrée (secondes) : borne la fraîcheur entre plusieurs workers
+CACHE_IDENTITE_TTL = float(os.getenv("CACHE_IDENTITE_TTL", "60"))
+CACHE_IDENTITE_TAILLE = int(os.getenv("CACHE_IDENTITE_TAILLE", "10000"))
+
+
+@dataclass(frozen=True)
+class UtilisateurCourant:
+    """Copie légère de l'utilisateur authentifié, détachée de toute session."""
+    id: int
+    email: str
+    nom: str
+    role: Optional[str]
+
+
+class CacheIdentite:
+    """Cache LRU borné avec expiration, indexé par le sujet du JWT (email)."""
+
+    def __init__(self, taille_max: int = CACHE_IDENTITE_TAILLE, ttl: float = CACHE_IDENTITE_TTL):
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self._entrees: "OrderedDict[str, tuple]" = OrderedDict()
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lire(self, email: str) -> Optional[UtilisateurCourant]:
+        with self._verrou:
+            entree = self._entrees.get(email)
+            if entree is None or entree[0] < time.monotonic():
+                if entree is not None:
+                    del self._entrees[email]
+                self.misses += 1
+                return None
+            self._entrees.move_to_end(email)
+            self.hits += 1
+            return entree[1]
+
+    def ecrire(self, utilisateur: UtilisateurCourant) -> None:
+        with self._verrou:
+            self._entrees[utilisateur.email] = (time.monotonic() + self.ttl, utilisateur)
+            self._entrees.move_to_end(utilisateur.email)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def invalider(self, email: str) -> None:
+        with self._verrou:
+            self._entrees.pop(email, None)
+
+    def vider(self) -> None:
+        with self._verrou:
+            self._entrees.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._verrou:
+            return {"hits": self.hits, "misses": self.misses, "taille": len(self._entrees)}
+
+
+cache_identite = CacheIdentite()
+
+
+def _requete_utilisateur(email: str):
+    return (
+        select(Utilisateur.id, Utilisateur.email, Utilisateur.nom, Utilisateur.role)
+        .where(Utilisateur.email == email)
+    )
+
+
+def _mettre_en_cache(ligne) -> Optional[UtilisateurCourant]:
+    if ligne is None:
+        return None
+    utilisateur = UtilisateurCourant(id=ligne.id, email=ligne.email, nom=ligne.nom, role=ligne.role)
+    cache_identite.ecrire(utilisateur)
+    return utilisateur
+
+
+def charger_utilisateur_courant(email: str, db: Session) -> Optional[UtilisateurCourant]:
+    """Lit l'utilisateur dans le cache, sinon en base (et le met en cache)."""
+    utilisateur = cache_identite.lire(email)
+    if utilisateur is not None:
+        return utilisateur
+    return _mettre_en_cache(db.execute(_requete_utilisateur(email)).first())
+
+
+async def charger_utilisateur_courant_async(email: str, db: AsyncSession) -> Optional[UtilisateurCourant]:
+    utilisateur = cache_identite.lire(email)
+    if utilisateur is not None:
+        return utilisateur
+    return _mettre_en_cache((await db.execute(_requete_utilisateur(email))).first())
+
+
+# 🔄 Invalidation : on note les emails touchés au flush, on les invalide au commit
+_CLE_SESSION = "cache_identite_emails"
+
+
+@event.listens_for(Session, "before_flush")
+def _noter_utilisateurs_modifies(session, flush_context, instances):
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Utilisateur):
+            emails = session.info.setdefault(_CLE_SESSION, set())
+            emails.update(inspect(obj).attrs.email.history.deleted or ())
+            if obj.email:
+                emails.add(obj.email)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalider_apres_commit(session):
+    for email in session.info.pop(_CLE_SESSION, ()):
+        cache_identite.invalider(email)
+
+
+@event.listens_for(Session, "after_rollback")
+def _oublier_apres_rollback(session):
+    session.info.pop(_CLE_SESSION, None)
@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import AsyncSessionLocal, SessionLocal
+from models import TauxChange
+
+# Âge max d'un instantané (secondes) : borne le retard d'un worker sur les écritures des autres
+CACHE_TAUX_TTL = float(os.getenv("CACHE_TAUX_TTL", "30"))
+
+
+@dataclass(frozen=True)
+class TauxEnCache:
+    id: int
+    devise_source: str
+    devise_cible: str
+    taux: float
+    date_enregistrement: Optional[datetime]
+
+
+@dataclass(frozen=True)
+class InstantaneTaux:
+    version: int
+    charge_a: float
+    par_id: Dict[int, TauxEnCache]
+    liste: List[TauxEnCache]  # triée par date_enregistrement décroissante (comme GET /tauxchange)
+
+
+class CacheTaux:
+    """
+    Copie en mémoire de la table taux_changes. L'instantané est reconstruit en entier
+    puis remplacé d'un seul coup : les lecteurs n'ont jamais besoin de verrou.
+
+    Il est toujours relu sur le primaire, par une session propre au cache : jamais par la
+    session de lecture d'une requête, qui peut viser une réplique en retard.
+    """
+
+    def __init__(self, ttl: float = CACHE_TAUX_TTL):
+        self.ttl = ttl
+        self._instantane: Optional[InstantaneTaux] = None
+        self._verrou = threading.Lock()
+
+    def _installer(self, lignes) -> InstantaneTaux:
+        liste = [
+            TauxEnCache(
+                id=t.id,
+                devise_source=t.devise_source,
+                devise_cible=t.devise_cible,
+                taux=t.taux,
+                date_enregistrement=t.date_enregistrement,
+            )
+            for t in lignes
+        ]
+        with self._verrou:
+            version = self._instantane.version + 1 if self._instantane else 1
+            self._instantane = InstantaneTaux(
+                version=version,
+                charge_a=time.monotonic(),
+                par_id={t.id: t for t in liste},
+                liste=liste,
+            )
+            return self._instantane
+
+    def _perime(self) -> bool:
+        courant = self._instantane
+        return courant is None or time.monotonic() - courant.charge_a > self.ttl
+
+    def invalider(self) -> None:
+        """Prochaine lecture = rechargement (écriture signalée par un autre worker)."""
+        with self._verrou:
+            if self._instantane is not None:
+                self._instantane = replace(self._instantane, charge_a=float("-inf"))
+
+    def recharger(self) -> InstantaneTaux:
+        db = SessionLocal()
+        try:
+            return self._installer(db.execute(_REQUETE_TAUX).scalars().all())
+        finally:
+            db.close()
+
+    def instantane(self) -> InstantaneTaux:
+        return self.recharger() if self._perime() else self._instantane
+
+    def lister(self) -> List[TauxEnCache]:
+        return self.instantane().liste
+
+    def lire(self, taux_id: int, db: Session) -> Optional[TauxEnCache]:
+        taux = self.instantane().par_id.get(taux_id)
+        if taux is None:
+            # Peut-être créé par un autre worker depuis le dernier chargement
+            if db.query(TauxChange.id).filter(TauxChange.id == taux_id).first():
+                return self.recharger().par_id.get(taux_id)
+        return taux
+
+    def existants(self, ids: Iterable[int]) -> Set[int]:
+        ids = set(ids)
+        par_id = self.instantane().par_id
+        if ids - par_id.keys():
+            par_id = self.recharger().par_id
+        return ids & par_id.keys()
+
+    # --- Variantes pour AsyncSession (DB_ASYNC=1) ---
+    async def recharger_async(self) -> InstantaneTaux:
+        async with AsyncSessionLocal() as db:
+            return self._installer((await db.execute(_REQUETE_TAUX)).scalars().all())
+
+    async def instantane_async(self) -> InstantaneTaux:
+        return await self.recharger_async() if self._perime() else self._instantane
+
+    async def lire_async(self, taux_id: int, db: AsyncSession) -> Optional[TauxEnCache]:
+        taux = (await self.instantane_async()).par_id.get(taux_id)
+        if taux is None:
+            if (await db.execute(select(TauxChange.id).where(TauxChange.id == taux_id))).first():
+                return (await self.recharger_async()).par_id.get(taux_id)
+        return taux
+
+    @property
+    def version(self) -> int:
+        return self._instantane.version if self._instantane else 0
+
+
+_REQUETE_TAUX = select(TauxChange).order_by(TauxChange.date_enregistrement.desc())
+
+cache_taux = CacheTaux()
@@ -0,0 +1,161 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+
+# Mode optionnel : les créations concurrentes sont écrites par un seul INSERT multi-lignes
+# et validées par un seul COMMIT (un fsync pour tout le groupe)
+COMMIT_GROUPE = os.getenv("COMMIT_GROUPE", "0") == "1"
+# Attente maximale d'autres demandes après la première d'un groupe (millisecondes)
+COMMIT_GROUPE_FENETRE_MS = float(os.getenv("COMMIT_GROUPE_FENETRE_MS", "2"))
+# Demandes au plus par groupe
+COMMIT_GROUPE_TAILLE_MAX = int(os.getenv("COMMIT_GROUPE_TAILLE_MAX", "200"))
+# Attente maximale du résultat par la requête (secondes), au-delà : 503
+COMMIT_GROUPE_ATTENTE_MAX = float(os.getenv("COMMIT_GROUPE_ATTENTE_MAX", "10"))
+
+_ARRET = object()
+
+
+class CommitGroupeArrete(RuntimeError):
+    """Demande encore en file à l'arrêt du fil d'écriture."""
+
+
+class CommitGroupe:
+    """
+    File de demandes vidée par un fil d'écriture dédié. Chaque demande reçoit un Future :
+    son propre résultat, ou sa propre exception (p.ex. numéro déjà utilisé).
+
+    `ecrire(db, demandes)` écrit le groupe sans valider et rend un résultat (ou une exception)
+    par demande, dans l'ordre. Si le groupe échoue en bloc, chaque demande est rejouée seule :
+    une demande fautive n'entraîne pas les autres.
+
+    Chaque Future est résolu quoi qu'il arrive (connexion perdue, rollback impossible, arrêt) :
+    aucune requête n'attend un résultat qui ne viendra pas.
+    """
+
+    def __init__(self, ecrire: Callable[[Session, List[Any]], List[Any]],
+                 fenetre_ms: float = COMMIT_GROUPE_FENETRE_MS, taille_max: int = COMMIT_GROUPE_TAILLE_MAX):
+        self.ecrire = ecrire
+        self.fenetre = fenetre_ms / 1000
+        self.taille_max = taille_max
+        self._file: "queue.Queue" = queue.Queue()
+        self._fil: Optional[threading.Thread] = None
+        self._verrou = threading.Lock()
+        self.groupes = 0
+        self.demandes = 0
+        self.echecs_groupe = 0
+
+    def soumettre(self, demande) -> Future:
+        self._demarrer()
+        futur: Future = Future()
+        self._file.put((demande, futur))
+        return futur
+
+    def _demarrer(self) -> None:
+        with self._verrou:
+            if self._fil is None or not self._fil.is_alive():
+                self._fil = threading.Thread(target=self._boucle, name="commit-groupe", daemon=True)
+                self._fil.start()
+
+    def arreter(self) -> None:
+        """Le groupe en cours d'écriture se termine ; les demandes encore en file échouent."""
+        with self._verrou:
+            self._vider()
+            if self._fil is not None:
+                self._file.put(_ARRET)
+                self._fil = None
+
+    def _boucle(self) -> None:
+        while True:
+            premiere = self._file.get()
+            if premiere is _ARRET:
+                self._vider()
+                return
+            groupe = [premiere]
+            limite = time.monotonic() + self.fenetre
+            while len(groupe) < self.taille_max:
+                try:
+                    suivante = self._file.get(timeout=max(limite - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if suivante is _ARRET:
+                    self._file.put(_ARRET)
+                    break
+                groupe.append(suivante)
+            try:
+                self._executer(groupe)
+            except Exception as e:  # dernier filet : le fil d'écriture ne meurt pas
+                logging.exception("Commit groupé : échec inattendu")
+                for _, futur in groupe:
+                    self._resoudre(futur, e)
+
+    def _vider(self) -> None:
+        """Les demandes restées en file échouent (CommitGroupeArrete) au lieu d'attendre indéfiniment."""
+        while True:
+            try:
+                element = self._file.get_nowait()
+            except queue.Empty:
+                return
+            if element is not _ARRET:
+                self._resoudre(element[1], CommitGroupeArrete("Commit groupé arrêté"))
+
+    @staticmethod
+    def _resoudre(futur: Future, resultat) -> None:
+        if futur.done():  # déjà résolu, ou annulé par une requête qui n'attend plus
+            return
+        if isinstance(resultat, Exception):
+            futur.set_exception(resultat)
+        else:
+            futur.set_result(resultat)
+
+    def _ecrire(self, groupe: List[Tuple[Any, Future]]) -> List[Any]:
+        db = SessionLocal()
+        try:
+            resultats = self.ecrire(db, [demande for demande, _ in groupe])
+            db.commit()
+            return resultats
+        except Exception:
+            try:
+                db.rollback()
+            except Exception:
+                logging.exception("Commit groupé : rollback impossible")
+            raise
+        finally:
+            try:
+                db.close()
+            except Exception:
+                logging.exception("Commit groupé : fermeture de session impossible")
+
+    def _executer(self, groupe: List[Tuple[Any, Future]]) -> None:
+        try:
+            resultats = self._ecrire(groupe)
+        except Exception as e:
+            if len(groupe) > 1:
+                self.echecs_groupe += 1
+                logging.warning("Commit groupé de %s demandes échoué (%s) : demandes rejouées une à une",
+                                len(groupe), e)
+                for element in groupe:
+                    self._executer([element])
+                return
+            self._resoudre(groupe[0][1], e)
+            return
+        self.groupes += 1
+        self.demandes += len(groupe)
+        for (_, futur), resultat in zip(groupe, resultats):
+            self._resoudre(futur, resultat)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "en_file": self._file.qsize(),
+            "groupes": self.groupes,
+            "demandes": self.demandes,
+            "taille_moyenne": self.demandes / self.groupes if self.groupes else 0,
+            "echecs_groupe": self.echecs_groupe,
+        }
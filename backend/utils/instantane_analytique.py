@@ -0,0 +1,280 @@
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import BigInteger, Integer, any_, cast, func, literal, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from models import Transaction
+
+# Dossier des fichiers colonnes (partagé par les workers d'une même machine)
+ANALYTIQUE_DOSSIER = os.getenv("ANALYTIQUE_DOSSIER", os.path.join(os.getcwd(), "donnees_analytiques"))
+# Reconstruction complète au-delà de cet âge (secondes) : rattrape suppressions et retours en attente
+ANALYTIQUE_RECONSTRUCTION = float(os.getenv("ANALYTIQUE_RECONSTRUCTION", "3600"))
+# Les ids ne sont pas validés dans l'ordre (créations concurrentes, /batch, commit groupé) :
+# chaque rafraîchissement relit cette marge sous dernier_id, les ids déjà présents sont ignorés
+ANALYTIQUE_MARGE_IDS = int(os.getenv("ANALYTIQUE_MARGE_IDS", "10000"))
+TAILLE_LOT_LECTURE = 100_000
+# Une génération remplacée reste sur disque au moins ce délai (secondes) : un lecteur d'un autre
+# worker qui a lu l'ancien courant.json peut encore ouvrir ses fichiers
+ANALYTIQUE_GRACE = float(os.getenv("ANALYTIQUE_GRACE", "300"))
+# Clé arbitraire du verrou consultatif : un seul worker écrit l'instantané
+CLE_VERROU_INSTANTANE = 727_017
+
+# Colonnes et types sur disque ; service/devise/statut sont des codes (dictionnaires dans meta.json)
+COLONNES = {
+    "id": np.int64,
+    "date": np.int64,        # microsecondes depuis l'epoch (UTC)
+    "montant": np.float64,
+    "service": np.int32,
+    "devise": np.int32,
+    "statut": np.int8,       # -1 : transaction supprimée depuis l'instantané
+}
+DICTIONNAIRES = ("service", "devise", "statut")
+STATUT_SUPPRIME = -1
+EN_ATTENTE = "en attente"
+
+_REQUETE_LIGNES = select(
+    Transaction.id,
+    # timestamp sans fuseau (UTC) : epoch nominal, indépendant du TimeZone du serveur
+    cast(func.extract("epoch", Transaction.date_transaction) * 1_000_000, BigInteger),
+    Transaction.montant,
+    Transaction.service,
+    Transaction.devise,
+    func.coalesce(Transaction.statut, EN_ATTENTE),
+)
+
+
+class Instantane:
+    """Colonnes en lecture (np.memmap) d'une génération, plus ses dictionnaires."""
+
+    def __init__(self, dossier: str, meta: Dict):
+        self.meta = meta
+        self.lignes = meta["lignes"]
+        self.dictionnaires: Dict[str, List[str]] = meta["dictionnaires"]
+        self.colonnes: Dict[str, np.ndarray] = {}
+        for nom, dtype in COLONNES.items():
+            if self.lignes:
+                self.colonnes[nom] = np.memmap(os.path.join(dossier, f"{nom}.bin"), dtype=dtype,
+                                               mode="r", shape=(self.lignes,))
+            else:
+                self.colonnes[nom] = np.empty(0, dtype=dtype)
+
+
+class StockageAnalytique:
+    """
+    Instantané colonne par colonne de la table transactions :
+    dossier/courant.json pointe vers dossier/g<generation>/<colonne>.bin.
+
+    - rafraichir() ajoute les transactions absentes d'id > dernier_id - ANALYTIQUE_MARGE_IDS
+      (validées après des ids plus grands) et relit le statut des lignes « en attente » (les seules
+      qui changent en pratique) ; des statuts modifiés donnent une nouvelle génération (statut.bin
+      copié) ; au-delà de ANALYTIQUE_RECONSTRUCTION secondes, tout est reconstruit.
+    - Les lecteurs ne voient que les `lignes` annoncées par courant.json (remplacé atomiquement) ;
+      une génération remplacée reste lisible ANALYTIQUE_GRACE secondes (meta["retirees"]).
+    """
+
+    def __init__(self, dossier: str = ANALYTIQUE_DOSSIER):
+        self.dossier = dossier
+        self._instantane: Optional[Instantane] = None
+        self._signature = None
+        self._verrou = threading.Lock()
+
+    # -------------------- Lecture --------------------
+    @property
+    def _chemin_meta(self) -> str:
+        return os.path.join(self.dossier, "courant.json")
+
+    def _lire_meta(self) -> Optional[Dict]:
+        try:
+            with open(self._chemin_meta, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def instantane(self) -> Optional[Instantane]:
+        """Instantané courant (rouvert seulement si courant.json a changé)."""
+        try:
+            etat = os.stat(self._chemin_meta)
+        except FileNotFoundError:
+            return None
+        signature = (etat.st_mtime_ns, etat.st_size)
+        with self._verrou:
+            if signature != self._signature:
+                meta = self._lire_meta()
+                if meta is None:
+                    return None
+                self._instantane = Instantane(self._dossier_generation(meta["generation"]), meta)
+                self._signature = signature
+            return self._instantane
+
+    # -------------------- Écriture --------------------
+    def _dossier_generation(self, generation: int) -> str:
+        return os.path.join(self.dossier, f"g{generation}")
+
+    def _publier(self, meta: Dict) -> None:
+        temporaire = self._chemin_meta + ".tmp"
+        with open(temporaire, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(temporaire, self._chemin_meta)
+
+    @staticmethod
+    def _encoder(valeurs: List[str], dictionnaire: List[str]) -> np.ndarray:
+        index = {v: i for i, v in enumerate(dictionnaire)}
+        codes = np.empty(len(valeurs), dtype=np.int64)
+        for i, valeur in enumerate(valeurs):
+            code = index.get(valeur)
+            if code is None:
+                code = index[valeur] = len(dictionnaire)
+                dictionnaire.append(valeur)
+            codes[i] = code
+        return codes
+
+    @staticmethod
+    def _ids_presents(dossier: str, meta: Dict, seuil: int) -> set:
+        if not meta["lignes"] or meta["dernier_id"] <= seuil:
+            return set()
+        ids = np.memmap(os.path.join(dossier, "id.bin"), dtype=np.int64, mode="r", shape=(meta["lignes"],))
+        return set(ids[ids > seuil].tolist())
+
+    def _ajouter_lignes(self, db: Session, dossier: str, meta: Dict) -> None:
+        """Ajoute en fin de fichiers les transactions absentes d'id > meta['dernier_id'] - ANALYTIQUE_MARGE_IDS."""
+        seuil = max(meta["dernier_id"] - ANALYTIQUE_MARGE_IDS, 0)
+        presents = self._ids_presents(dossier, meta, seuil)
+        resultat = db.execute(
+            _REQUETE_LIGNES.where(Transaction.id > seuil).order_by(Transaction.id)
+            .execution_options(yield_per=TAILLE_LOT_LECTURE)
+        )
+        fichiers = {nom: open(os.path.join(dossier, f"{nom}.bin"), "ab") for nom in COLONNES}
+        try:
+            for lot in resultat.partitions():
+                lot = [ligne for ligne in lot if ligne[0] not in presents]
+                if not lot:
+                    continue
+                ids, dates, montants, services, devises, statuts = zip(*lot)
+                colonnes = {
+                    "id": np.asarray(ids), "date": np.asarray(dates), "montant": np.asarray(montants, dtype=float),
+                    "service": self._encoder(services, meta["dictionnaires"]["service"]),
+                    "devise": self._encoder(devises, meta["dictionnaires"]["devise"]),
+                    "statut": self._encoder(statuts, meta["dictionnaires"]["statut"]),
+                }
+                for nom, dtype in COLONNES.items():
+                    colonnes[nom].astype(dtype).tofile(fichiers[nom])
+                meta["lignes"] += len(ids)
+                meta["dernier_id"] = max(meta["dernier_id"], int(ids[-1]))
+        finally:
+            for f in fichiers.values():
+                f.close()
+
+    def _statuts_modifies(self, db: Session, meta: Dict) -> Dict[int, int]:
+        """Relit le statut des lignes encore « en attente » : {position: nouveau code} (dictionnaire étendu)."""
+        if not meta["lignes"] or EN_ATTENTE not in meta["dictionnaires"]["statut"]:
+            return {}
+        dossier = self._dossier_generation(meta["generation"])
+        code_attente = meta["dictionnaires"]["statut"].index(EN_ATTENTE)
+        ids = np.memmap(os.path.join(dossier, "id.bin"), dtype=np.int64, mode="r", shape=(meta["lignes"],))
+        statuts = np.memmap(os.path.join(dossier, "statut.bin"), dtype=np.int8, mode="r", shape=(meta["lignes"],))
+        positions = np.flatnonzero(statuts == code_attente)
+        modifications = {}
+        for debut in range(0, len(positions), TAILLE_LOT_LECTURE):
+            paquet = positions[debut:debut + TAILLE_LOT_LECTURE]
+            actuels = dict(db.execute(
+                select(Transaction.id, func.coalesce(Transaction.statut, EN_ATTENTE))
+                .where(Transaction.id == any_(literal(ids[paquet].tolist(), ARRAY(Integer))))
+            ).all())
+            for position in paquet.tolist():
+                statut = actuels.get(int(ids[position]))
+                if statut == EN_ATTENTE:
+                    continue
+                modifications[position] = (STATUT_SUPPRIME if statut is None
+                                            else int(self._encoder([statut], meta["dictionnaires"]["statut"])[0]))
+        return modifications
+
+    def _copier_generation(self, meta: Dict, modifications: Dict[int, int]) -> None:
+        """
+        Nouvelle génération portant les statuts modifiés : statut.bin est copié puis modifié,
+        les autres colonnes sont liées (ou copiées). La génération publiée n'est jamais réécrite,
+        un lecteur n'y rencontre donc pas de code absent de son dictionnaire.
+        """
+        source = self._dossier_generation(meta["generation"])
+        meta["generation"] += 1
+        dossier = self._dossier_generation(meta["generation"])
+        shutil.rmtree(dossier, ignore_errors=True)
+        os.makedirs(dossier)
+        for nom in COLONNES:
+            chemin_source, chemin = os.path.join(source, f"{nom}.bin"), os.path.join(dossier, f"{nom}.bin")
+            if nom == "statut":
+                shutil.copyfile(chemin_source, chemin)
+                continue
+            try:
+                os.link(chemin_source, chemin)
+            except OSError:
+                shutil.copyfile(chemin_source, chemin)
+        statuts = np.memmap(os.path.join(dossier, "statut.bin"), dtype=np.int8, mode="r+", shape=(meta["lignes"],))
+        statuts[list(modifications)] = list(modifications.values())
+        statuts.flush()
+
+    def _reconstruire(self, db: Session, meta_precedente: Optional[Dict]) -> Dict:
+        generation = (meta_precedente["generation"] + 1) if meta_precedente else 1
+        dossier = self._dossier_generation(generation)
+        shutil.rmtree(dossier, ignore_errors=True)
+        os.makedirs(dossier)
+        meta = {
+            "generation": generation,
+            "lignes": 0,
+            "dernier_id": 0,
+            "dictionnaires": {nom: [] for nom in DICTIONNAIRES},
+            "reconstruit_a": time.time(),
+        }
+        self._ajouter_lignes(db, dossier, meta)
+        return meta
+
+    def rafraichir(self, db: Session, complet: bool = False) -> Optional[Dict]:
+        """Met l'instantané à jour ; None si un autre worker s'en charge déjà."""
+        connexion = db.connection()
+        if not connexion.execute(text("SELECT pg_try_advisory_lock(:cle)"), {"cle": CLE_VERROU_INSTANTANE}).scalar():
+            return None
+        try:
+            os.makedirs(self.dossier, exist_ok=True)
+            meta = self._lire_meta()
+            precedente = None
+            if complet or meta is None or time.time() - meta["reconstruit_a"] > ANALYTIQUE_RECONSTRUCTION:
+                precedente = meta
+                meta = self._reconstruire(db, precedente)
+            else:
+                modifications = self._statuts_modifies(db, meta)
+                if modifications:
+                    precedente = dict(meta)
+                    self._copier_generation(meta, modifications)
+                meta["statuts_actualises"] = len(modifications)
+                self._ajouter_lignes(db, self._dossier_generation(meta["generation"]), meta)
+            meta["genere_a"] = time.time()
+            # Générations remplacées : supprimées après ANALYTIQUE_GRACE, une fois courant.json publié
+            retirees = list((precedente or meta).get("retirees", []))
+            if precedente:
+                retirees.append([precedente["generation"], meta["genere_a"]])
+            expirees = [g for g, retiree_a in retirees if meta["genere_a"] - retiree_a >= ANALYTIQUE_GRACE]
+            meta["retirees"] = [[g, retiree_a] for g, retiree_a in retirees if g not in expirees]
+            self._publier(meta)
+            for generation in expirees:
+                shutil.rmtree(self._dossier_generation(generation), ignore_errors=True)
+            return meta
+        finally:
+            connexion.execute(text("SELECT pg_advisory_unlock(:cle)"), {"cle": CLE_VERROU_INSTANTANE})
+            db.commit()
+
+
+stockage_analytique = StockageAnalytique()
+
+
+def micro_secondes(date: datetime) -> int:
+    """Microsecondes depuis l'epoch ; une date naïve est lue comme UTC (colonnes en base)."""
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((date - datetime(1970, 1, 1)).total_seconds() * 1_000_000)
@@ -0,0 +1,186 @@
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Compteurs par processus : avec plusieurs workers, chaque worker expose les siens
+
+DUREE_REQUETE = Histogram(
+    "http_requete_duree_secondes",
+    "Durée des requêtes HTTP par route (gabarit) et statut.",
+    ["methode", "route", "statut"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+SQL_PAR_REQUETE = Histogram(
+    "http_requete_sql_nombre",
+    "Nombre de requêtes SQL exécutées par requête HTTP.",
+    ["methode", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+DUREE_SQL_PAR_REQUETE = Histogram(
+    "http_requete_sql_duree_secondes",
+    "Temps passé en base par requête HTTP.",
+    ["methode", "route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+REQUETES_SQL = Counter("sql_requetes_total", "Requêtes SQL exécutées.", ["moteur"])
+DUREE_SQL = Counter("sql_duree_secondes_total", "Temps cumulé des requêtes SQL.", ["moteur"])
+ATTENTE_POOL = Histogram(
+    "pool_attente_connexion_secondes",
+    "Attente pour obtenir une connexion du pool.",
+    ["moteur"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+ADMISSION_REJETS = Counter(
+    "admission_rejets_total",
+    "Requêtes refusées (503) par le contrôle d'admission, par classe et raison.",
+    ["classe", "raison"],
+)
+ADMISSION_ATTENTE = Histogram(
+    "admission_attente_secondes",
+    "Attente en file avant admission (requêtes mises en file seulement).",
+    ["classe"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5),
+)
+
+
+class MesureRequete:
+    __slots__ = ("nombre_sql", "duree_sql")
+
+    def __init__(self):
+        self.nombre_sql = 0
+        self.duree_sql = 0.0
+
+
+# Mesure de la requête HTTP en cours (objet partagé avec le threadpool et les sous-tâches)
+_mesure_courante: ContextVar[Optional[MesureRequete]] = ContextVar("mesure_requete", default=None)
+
+
+# -------------------- Pools instrumentés (temps d'attente) --------------------
+class _AttenteMesuree:
+    nom_moteur = "primaire"
+
+    def _do_get(self):
+        debut = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            ATTENTE_POOL.labels(self.nom_moteur).observe(time.perf_counter() - debut)
+
+
+class PoolMesure(_AttenteMesuree, QueuePool):
+    pass
+
+
+class PoolAsyncMesure(_AttenteMesuree, AsyncAdaptedQueuePool):
+    pass
+
+
+# -------------------- Requêtes SQL --------------------
+def instrumenter_moteur(engine, nom: str) -> None:
+    """Compte les requêtes et le temps SQL (total et par requête HTTP) ; nomme le pool."""
+    engine.pool.nom_moteur = nom
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _avant(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("debuts_sql", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _apres(conn, cursor, statement, parameters, context, executemany):
+        duree = time.perf_counter() - conn.info["debuts_sql"].pop()
+        REQUETES_SQL.labels(nom).inc()
+        DUREE_SQL.labels(nom).inc(duree)
+        mesure = _mesure_courante.get()
+        if mesure is not None:
+            mesure.nombre_sql += 1
+            mesure.duree_sql += duree
+
+    @event.listens_for(engine, "handle_error")
+    def _erreur(contexte):
+        if contexte.connection is not None and contexte.connection.info.get("debuts_sql"):
+            contexte.connection.info["debuts_sql"].pop()
+
+
+# -------------------- Jauges lues au moment du scrape --------------------
+class CollecteurEtat:
+    """Pools (connexions prises, débordement) et caches applicatifs."""
+
+    def __init__(self):
+        self.moteurs: Dict[str, object] = {}
+        self.caches: Dict[str, callable] = {}
+        self.admission: Optional[callable] = None
+
+    def collect(self):
+        pris = GaugeMetricFamily("pool_connexions_prises", "Connexions sorties du pool.", labels=["moteur"])
+        debordement = GaugeMetricFamily("pool_debordement", "Connexions au-delà de pool_size.", labels=["moteur"])
+        taille = GaugeMetricFamily("pool_taille", "Taille configurée du pool.", labels=["moteur"])
+        for nom, engine in self.moteurs.items():
+            pool = engine.pool
+            pris.add_metric([nom], pool.checkedout())
+            debordement.add_metric([nom], max(pool.overflow(), 0))
+            taille.add_metric([nom], pool.size())
+        yield from (pris, debordement, taille)
+
+        cache = GaugeMetricFamily("cache_etat", "Statistiques des caches applicatifs.", labels=["cache", "mesure"])
+        for nom, stats in self.caches.items():
+            for mesure, valeur in stats().items():
+                cache.add_metric([nom, mesure], valeur)
+        yield cache
+
+        if self.admission is not None:
+            admission = GaugeMetricFamily("admission_etat", "Places occupées et file d'attente par classe de routes.",
+                                          labels=["classe", "mesure"])
+            for classe, stats in self.admission().items():
+                for mesure, valeur in stats.items():
+                    admission.add_metric([classe, mesure], valeur)
+            yield admission
+
+
+collecteur = CollecteurEtat()
+REGISTRY.register(collecteur)
+
+
+def surveiller_moteur(engine, nom: str) -> None:
+    instrumenter_moteur(engine, nom)
+    collecteur.moteurs[nom] = engine
+
+
+def surveiller_cache(nom: str, stats) -> None:
+    collecteur.caches[nom] = stats
+
+
+def surveiller_admission(stats) -> None:
+    collecteur.admission = stats
+
+
+# -------------------- Middleware --------------------
+def gabarit_route(scope) -> str:
+    # Gabarit ("/transactions/{transaction_id}") plutôt que le chemin : cardinalité bornée
+    route = scope.get("route")
+    return getattr(route, "path", "non_routee")
+
+
+async def mesurer_requete(request, call_next):
+    mesure = MesureRequete()
+    jeton = _mesure_courante.set(mesure)
+    debut = time.perf_counter()
+    statut = 500
+    try:
+        response = await call_next(request)
+        statut = response.status_code
+        return response
+    finally:
+        duree = time.perf_counter() - debut
+        _mesure_courante.reset(jeton)
+        route = gabarit_route(request.scope)
+        DUREE_REQUETE.labels(request.method, route, str(statut)).observe(duree)
+        SQL_PAR_REQUETE.labels(request.method, route).observe(mesure.nombre_sql)
+        DUREE_SQL_PAR_REQUETE.labels(request.method, route).observe(mesure.duree_sql)
+
+
+def exposition() -> bytes:
+    return generate_latest(REGISTRY)
@@ -0,0 +1,42 @@
+import logging
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+
+from database import engine
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Révision qui correspond aux tables créées par l'ancien create_all
+REVISION_INITIALE = "0001"
+# Clé arbitraire du verrou consultatif : un seul worker migre à la fois
+CLE_VERROU_MIGRATIONS = 727_001
+
+
+def config_alembic() -> Config:
+    cfg = Config(os.path.join(BASE_DIR, "alembic.ini"))
+    cfg.set_main_option("script_location", os.path.join(BASE_DIR, "migrations"))
+    cfg.attributes["configure_logger"] = False
+    return cfg
+
+
+def appliquer_migrations(revision: str = "head") -> None:
+    """
+    Met le schéma à jour (alembic upgrade). Une base créée avant les migrations
+    (tables présentes, pas de table alembic_version) est d'abord marquée en 0001.
+    """
+    cfg = config_alembic()
+    with engine.connect() as verrou:
+        verrou.execute(text("SELECT pg_advisory_lock(:cle)"), {"cle": CLE_VERROU_MIGRATIONS})
+        verrou.commit()
+        try:
+            inspecteur = inspect(engine)
+            if inspecteur.has_table("transactions") and not inspecteur.has_table("alembic_version"):
+                logging.info("Base existante sans historique de migrations : stamp %s", REVISION_INITIALE)
+                command.stamp(cfg, REVISION_INITIALE)
+            command.upgrade(cfg, revision)
+        finally:
+            verrou.execute(text("SELECT pg_advisory_unlock(:cle)"), {"cle": CLE_VERROU_MIGRATIONS})
+            verrou.commit()
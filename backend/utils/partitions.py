@@ -0,0 +1,110 @@
+import logging
+import os
+import re
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# transactions est partitionnée par mois sur date_transaction (migration 0006) :
+# transactions_pAAAA_MM pour chaque mois, transactions_defaut pour ce qui tombe hors des mois créés.
+PARTITION_DEFAUT = "transactions_defaut"
+# Mois créés à l'avance (en plus du mois courant)
+PARTITIONS_AVANCE = int(os.getenv("PARTITIONS_AVANCE", "3"))
+# Attente maximale du verrou sur transactions lors d'une création (valeur PostgreSQL)
+PARTITIONS_ATTENTE_VERROU = os.getenv("PARTITIONS_ATTENTE_VERROU", "5s")
+# Clé arbitraire du verrou consultatif : création / archivage de partitions par un seul processus
+CLE_VERROU_PARTITIONS = 727_018
+
+_NOM_PARTITION = re.compile(r"^transactions_p(\d{4})_(\d{2})$")
+
+
+def debut_mois(date: datetime) -> datetime:
+    return datetime(date.year, date.month, 1)
+
+
+def mois_suivant(mois: datetime) -> datetime:
+    return datetime(mois.year + mois.month // 12, mois.month % 12 + 1, 1)
+
+
+def mois_precedent(mois: datetime) -> datetime:
+    return datetime(mois.year - (mois.month == 1), (mois.month - 2) % 12 + 1, 1)
+
+
+def nom_partition(mois: datetime) -> str:
+    return f"transactions_p{mois:%Y_%m}"
+
+
+def mois_partition(nom: str) -> Optional[datetime]:
+    correspondance = _NOM_PARTITION.match(nom)
+    if correspondance is None:
+        return None
+    return datetime(int(correspondance.group(1)), int(correspondance.group(2)), 1)
+
+
+def est_partitionnee(connexion: Connection) -> bool:
+    return connexion.execute(text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('transactions')"
+    )).scalar() is True
+
+
+def partitions_mensuelles(connexion: Connection) -> List[datetime]:
+    """Mois des partitions attachées à transactions, du plus ancien au plus récent."""
+    noms = connexion.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'transactions'::regclass"
+    )).scalars()
+    return sorted(mois for mois in map(mois_partition, noms) if mois is not None)
+
+
+def creer_partition(connexion: Connection, mois: datetime) -> bool:
+    """
+    Crée la partition du mois si elle manque. Les lignes du mois arrivées entre-temps dans la
+    partition par défaut y sont déplacées (PostgreSQL refuse sinon la nouvelle partition).
+    """
+    nom = nom_partition(mois)
+    if connexion.execute(text("SELECT to_regclass(:nom)"), {"nom": nom}).scalar() is not None:
+        return False
+    bornes = {"debut": mois, "fin": mois_suivant(mois)}
+    dans_le_mois = "date_transaction >= :debut AND date_transaction < :fin"
+    a_deplacer = connexion.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {PARTITION_DEFAUT} WHERE {dans_le_mois})"), bornes
+    ).scalar()
+    if a_deplacer:
+        connexion.execute(text(
+            f"CREATE TEMP TABLE _transactions_a_deplacer ON COMMIT DROP AS "
+            f"SELECT * FROM {PARTITION_DEFAUT} WHERE {dans_le_mois}"
+        ), bornes)
+        connexion.execute(text(f"DELETE FROM {PARTITION_DEFAUT} WHERE {dans_le_mois}"), bornes)
+    connexion.execute(text(
+        f"CREATE TABLE {nom} PARTITION OF transactions "
+        f"FOR VALUES FROM ('{bornes['debut']:%Y-%m-%d}') TO ('{bornes['fin']:%Y-%m-%d}')"
+    ))
+    if a_deplacer:
+        # Repasse par la table parente : le registre des numéros suit (trigger)
+        connexion.execute(text("INSERT INTO transactions SELECT * FROM _transactions_a_deplacer"))
+        connexion.execute(text("DROP TABLE _transactions_a_deplacer"))
+    logging.info("Partition %s créée", nom)
+    return True
+
+
+def maintenir_partitions(connexion: Connection, depuis: Optional[datetime] = None,
+                         avance: int = PARTITIONS_AVANCE) -> List[str]:
+    """Crée les partitions mensuelles de `depuis` (par défaut : mois courant) à mois courant + avance."""
+    if not est_partitionnee(connexion):
+        return []
+    connexion.execute(text("SELECT pg_advisory_xact_lock(:cle)"), {"cle": CLE_VERROU_PARTITIONS})
+    # La création verrouille transactions : ne pas faire la queue derrière une longue transaction
+    # (toutes les requêtes suivantes attendraient) ; les mois d'avance laissent le temps de réessayer
+    connexion.execute(text(f"SET LOCAL lock_timeout = '{PARTITIONS_ATTENTE_VERROU}'"))
+    mois = debut_mois(depuis or datetime.utcnow())
+    dernier = debut_mois(datetime.utcnow())
+    for _ in range(avance):
+        dernier = mois_suivant(dernier)
+    creees = []
+    while mois <= dernier:
+        if creer_partition(connexion, mois):
+            creees.append(nom_partition(mois))
+        mois = mois_suivant(mois)
+    return creees
@@ -0,0 +1,70 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException
+from passlib.hash import bcrypt
+
+# Processus dédiés au hachage bcrypt (isolés du threadpool des autres routes)
+HACHAGE_WORKERS = int(os.getenv("HACHAGE_WORKERS", "2"))
+# Nombre max d'opérations en cours + en attente avant de répondre 503
+HACHAGE_FILE_MAX = int(os.getenv("HACHAGE_FILE_MAX", "32"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_en_cours = 0
+
+
+def _hacher(mot_de_passe: str) -> str:
+    return bcrypt.hash(mot_de_passe)
+
+
+def _verifier(mot_de_passe: str, mot_de_passe_hache: str) -> bool:
+    return bcrypt.verify(mot_de_passe, mot_de_passe_hache)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn : pas de fork d'un processus qui a déjà des threads et une boucle asyncio
+        _pool = ProcessPoolExecutor(
+            max_workers=HACHAGE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def _executer(fonction, *args):
+    global _en_cours
+    if _en_cours >= HACHAGE_FILE_MAX:
+        raise HTTPException(
+            status_code=503,
+            detail="Service d'authentification saturé, réessayez dans un instant.",
+            headers={"Retry-After": "1"},
+        )
+    _en_cours += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_pool(), fonction, *args)
+    finally:
+        _en_cours -= 1
+
+
+async def hacher_mot_de_passe(mot_de_passe: str) -> str:
+    return await _executer(_hacher, mot_de_passe)
+
+
+async def verifier_mot_de_passe(mot_de_passe: str, mot_de_passe_hache: str) -> bool:
+    return await _executer(_verifier, mot_de_passe, mot_de_passe_hache)
+
+
+def stats() -> dict:
+    return {"en_cours": _en_cours, "file_max": HACHAGE_FILE_MAX, "workers": HACHAGE_WORKERS}
+
+
+def arreter_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -1,20 +1,175 @@
+import asyncio
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
 from fpdf import FPDF
 
-def generer_recu_pdf(transaction, utilisateur):
+# Cache des reçus rendus : borné en octets (les PDF font quelques Ko)
+RECUS_CACHE_OCTETS = int(os.getenv("RECUS_CACHE_OCTETS", str(32 * 1024 * 1024)))
+# Processus dédiés au rendu des lots de reçus
+RECUS_WORKERS = int(os.getenv("RECUS_WORKERS", "2"))
+# Reçus rendus par aller-retour avec un processus (amortit la sérialisation)
+RECUS_PAQUET = int(os.getenv("RECUS_PAQUET", "50"))
+
+# Tout ce qui apparaît sur le reçu : deux transactions aux mêmes champs ont le même PDF
+CHAMPS_RECU = (
+    "id", "numero_transaction", "montant", "devise", "service",
+    "statut", "date_transaction", "nom", "email",
+)
+
+
+def champs_recu(ligne) -> Dict[str, str]:
+    """Champs affichés (ligne transaction + client), sous forme sérialisable et picklable."""
+    return {champ: str(ligne[champ]) for champ in CHAMPS_RECU}
+
+
+def cle_recu(champs: Dict[str, str]) -> str:
+    contenu = json.dumps(champs, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenu.encode("utf-8")).hexdigest()
+
+
+def nom_fichier_recu(champs: Dict[str, str]) -> str:
+    return f"recu_transaction_{champs['id']}.pdf"
+
+
+def _latin1(texte: str) -> str:
+    # Les polices standard de FPDF sont en latin-1
+    return texte.encode("latin-1", "replace").decode("latin-1")
+
+
+def rendre_recu(champs: Dict[str, str]) -> bytes:
+    """Rend le reçu en mémoire (aucun fichier écrit)."""
     pdf = FPDF()
     pdf.add_page()
     pdf.set_font("Arial", size=12)
 
     pdf.cell(200, 10, txt="Reçu de Transaction", ln=True, align='C')
     pdf.ln(10)
-    pdf.cell(200, 10, txt=f"Nom du client: {utilisateur.nom}", ln=True)
-    pdf.cell(200, 10, txt=f"Email du client: {utilisateur.email}", ln=True)
-    pdf.cell(200, 10, txt=f"Montant: {transaction.montant} {transaction.devise}", ln=True)
-    pdf.cell(200, 10, txt=f"Service: {transaction.service}", ln=True)
-    pdf.cell(200, 10, txt=f"Numéro Transaction: {transaction.numero_transaction}", ln=True)
-    pdf.cell(200, 10, txt=f"Statut: {transaction.statut}", ln=True)
-    pdf.cell(200, 10, txt=f"Date: {transaction.date_transaction}", ln=True)
-
-    filename = f"recu_transaction_{transaction.id}.pdf"
-    pdf.output(filename)
-    return filename
+    lignes = [
+        f"Nom du client: {champs['nom']}",
+        f"Email du client: {champs['email']}",
+        f"Montant: {champs['montant']} {champs['devise']}",
+        f"Service: {champs['service']}",
+        f"Numéro Transaction: {champs['numero_transaction']}",
+        f"Statut: {champs['statut']}",
+        f"Date: {champs['date_transaction']}",
+    ]
+    for ligne in lignes:
+        pdf.cell(200, 10, txt=_latin1(ligne), ln=True)
+
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def _rendre_paquet(paquet: List[Dict[str, str]]) -> List[bytes]:
+    return [rendre_recu(champs) for champs in paquet]
+
+
+class CacheRecus:
+    """Cache LRU adressé par contenu (cle_recu), borné en nombre total d'octets."""
+
+    def __init__(self, octets_max: int = RECUS_CACHE_OCTETS):
+        self.octets_max = octets_max
+        self._entrees: "OrderedDict[str, bytes]" = OrderedDict()
+        self._octets = 0
+        self._verrou = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lire(self, cle: str) -> Optional[bytes]:
+        with self._verrou:
+            pdf = self._entrees.get(cle)
+            if pdf is None:
+                self.misses += 1
+                return None
+            self._entrees.move_to_end(cle)
+            self.hits += 1
+            return pdf
+
+    def ecrire(self, cle: str, pdf: bytes) -> None:
+        if len(pdf) > self.octets_max:
+            return
+        with self._verrou:
+            ancien = self._entrees.pop(cle, None)
+            if ancien is not None:
+                self._octets -= len(ancien)
+            self._entrees[cle] = pdf
+            self._octets += len(pdf)
+            while self._octets > self.octets_max:
+                _, retire = self._entrees.popitem(last=False)
+                self._octets -= len(retire)
+
+    def stats(self) -> Dict[str, int]:
+        with self._verrou:
+            return {"hits": self.hits, "misses": self.misses,
+                    "taille": len(self._entrees), "octets": self._octets}
+
+
+cache_recus = CacheRecus()
+
+
+def generer_recu_pdf(champs: Dict[str, str]) -> bytes:
+    """Reçu d'une transaction (cache, sinon rendu dans le thread courant)."""
+    cle = cle_recu(champs)
+    pdf = cache_recus.lire(cle)
+    if pdf is None:
+        pdf = rendre_recu(champs)
+        cache_recus.ecrire(cle, pdf)
+    return pdf
+
+
+# 📦 Lots : les reçus absents du cache sont rendus par paquets dans un pool de processus
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn : pas de fork d'un processus qui a déjà des threads et une boucle asyncio
+        _pool = ProcessPoolExecutor(
+            max_workers=RECUS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def generer_recus_pdf(liste_champs: List[Dict[str, str]]) -> List[bytes]:
+    cles = [cle_recu(champs) for champs in liste_champs]
+    pdfs: List[Optional[bytes]] = [cache_recus.lire(cle) for cle in cles]
+    a_rendre = [i for i, pdf in enumerate(pdfs) if pdf is None]
+
+    paquets = [a_rendre[i:i + RECUS_PAQUET] for i in range(0, len(a_rendre), RECUS_PAQUET)]
+    loop = asyncio.get_running_loop()
+    rendus = await asyncio.gather(*(
+        loop.run_in_executor(_get_pool(), _rendre_paquet, [liste_champs[i] for i in paquet])
+        for paquet in paquets
+    ))
+    for paquet, resultats in zip(paquets, rendus):
+        for i, pdf in zip(paquet, resultats):
+            cache_recus.ecrire(cles[i], pdf)
+            pdfs[i] = pdf
+    return pdfs
+
+
+async def generer_zip_recus(liste_champs: List[Dict[str, str]]) -> bytes:
+    pdfs = await generer_recus_pdf(liste_champs)
+    tampon = io.BytesIO()
+    # Les PDF sont déjà compressés : pas de recompression
+    with zipfile.ZipFile(tampon, "w", compression=zipfile.ZIP_STORED) as archive:
+        for champs, pdf in zip(liste_champs, pdfs):
+            archive.writestr(nom_fichier_recu(champs), pdf)
+    return tampon.getvalue()
+
+
+def arreter_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,60 @@
+import math
+import os
+from typing import Dict, Iterable, List, Sequence, Union
+
+import orjson
+from fastapi import Response
+
+from models import Transaction
+from schemas import TransactionReponse
+
+# Opt-in : listes et export NDJSON encodés par orjson à partir de tuples de colonnes,
+# sans objets ORM, sans validation Pydantic ni jsonable_encoder
+SERIALISATION_RAPIDE = os.getenv("SERIALISATION_RAPIDE", "0") == "1"
+
+# Champs de TransactionReponse dans l'ordre où FastAPI les écrit (même forme JSON)
+CHAMPS_TRANSACTION = tuple(TransactionReponse.__fields__)
+COLONNES_TRANSACTION = tuple(getattr(Transaction, champ) for champ in CHAMPS_TRANSACTION)
+
+
+class ReponseOrjson(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+def _flottant_identique(valeur) -> bool:
+    # json écrit 1e-05 / 1e+16 là où orjson écrit 1e-5 / 1e16 (et refuse NaN quand orjson met null)
+    if not isinstance(valeur, float):
+        return True
+    return math.isfinite(valeur) and (valeur == 0 or 1e-4 <= abs(valeur) < 1e16)
+
+
+def page_transactions(page: Dict) -> Union[ReponseOrjson, Dict]:
+    """
+    Page {"items": [lignes de COLONNES_TRANSACTION], "next_cursor"} encodée directement.
+    Si une valeur ne s'écrirait pas à l'octet près comme FastAPI l'écrit, la page est rendue
+    sous forme de dicts et repasse par response_model (chemin classique).
+    """
+    items = [dict(zip(CHAMPS_TRANSACTION, ligne)) for ligne in page["items"]]
+    contenu = {"items": items, "next_cursor": page["next_cursor"]}
+    if all(_flottant_identique(v) for item in items for v in item.values()):
+        return ReponseOrjson(contenu)
+    return contenu
+
+
+def ndjson(noms: Sequence[str], lignes: Iterable[Sequence]) -> bytes:
+    """Lignes NDJSON compactes (séparateurs sans espaces)."""
+    return b"".join(orjson.dumps(dict(zip(noms, ligne)), option=orjson.OPT_APPEND_NEWLINE) for ligne in lignes)
+
+
+def par_lots(lignes: Iterable, taille: int) -> Iterable[List]:
+    lot = []
+    for ligne in lignes:
+        lot.append(ligne)
+        if len(lot) == taille:
+            yield lot
+            lot = []
+    if lot:
+        yield lot
@@ -0,0 +1,189 @@
+import hashlib
+import logging
+import os
+import select
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import DATABASE_READ_URL, REPLICA_RETARD_MAX
+
+# Familles de données versionnées
+TAUX = "taux"
+TRANSACTIONS = "transactions"
+
+# Canal PostgreSQL : NOTIFY est transactionnel, délivré aux autres workers au commit seulement
+CANAL_VERSIONS = "versions_donnees"
+# Délai après un changement avant de mémoriser l'ETag d'une version : une réplique en retard
+# pourrait encore servir l'ancien contenu, qu'on ne doit pas associer à la nouvelle version
+ETAG_STABILISATION = float(os.getenv("ETAG_STABILISATION", str(REPLICA_RETARD_MAX if DATABASE_READ_URL else 0)))
+
+
+class VersionsDonnees:
+    """
+    Compteur monotone par famille, en mémoire du worker.
+    Incrémenté au commit local (session.info) et à chaque NOTIFY reçu des autres workers :
+    lire une version ne touche jamais la base.
+    """
+
+    CLE_SESSION = "versions_modifiees"
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._modifiees_a: Dict[str, float] = {}
+        self._abonnes: Dict[str, List[Callable[[], None]]] = {}
+        self._verrou = threading.Lock()
+        self._fil: Optional[threading.Thread] = None
+        self._arret = threading.Event()
+
+    def version(self, famille: str) -> int:
+        return self._versions.get(famille, 0)
+
+    def stable(self, famille: str) -> bool:
+        return time.monotonic() - self._modifiees_a.get(famille, float("-inf")) >= ETAG_STABILISATION
+
+    def abonner(self, famille: str, rappel: Callable[[], None]) -> None:
+        """Rappel exécuté à chaque changement de la famille (p.ex. invalider un cache)."""
+        self._abonnes.setdefault(famille, []).append(rappel)
+
+    def incrementer(self, famille: str) -> None:
+        with self._verrou:
+            self._versions[famille] = self._versions.get(famille, 0) + 1
+            self._modifiees_a[famille] = time.monotonic()
+        for rappel in self._abonnes.get(famille, ()):
+            rappel()
+
+    # -------------------- Écoute des autres workers --------------------
+    def ecouter(self, engine) -> None:
+        if self._fil is None:
+            self._arret.clear()
+            self._fil = threading.Thread(target=self._boucle_ecoute, args=(engine,),
+                                         name="versions-donnees", daemon=True)
+            self._fil.start()
+
+    def arreter(self) -> None:
+        self._arret.set()
+        self._fil = None
+
+    def _boucle_ecoute(self, engine) -> None:
+        attente = 1.0
+        while not self._arret.is_set():
+            connexion = None
+            try:
+                # Connexion dédiée, sortie du pool (elle reste ouverte en LISTEN)
+                connexion = engine.raw_connection()
+                connexion.detach()
+                dbapi = connexion.dbapi_connection
+                dbapi.autocommit = True
+                dbapi.cursor().execute(f"LISTEN {CANAL_VERSIONS}")
+                # Notifications perdues pendant une coupure : tout est considéré modifié
+                for famille in (TAUX, TRANSACTIONS):
+                    self.incrementer(famille)
+                attente = 1.0
+                while not self._arret.is_set():
+                    if select.select([dbapi], [], [], 1.0)[0]:
+                        dbapi.poll()
+                        while dbapi.notifies:
+                            self.incrementer(dbapi.notifies.pop(0).payload)
+            except Exception:
+                logging.exception("Écoute de %s interrompue, nouvel essai dans %.0f s", CANAL_VERSIONS, attente)
+                self._arret.wait(attente)
+                attente = min(attente * 2, 30.0)
+            finally:
+                if connexion is not None:
+                    connexion.close()
+
+
+versions_donnees = VersionsDonnees()
+
+
+@event.listens_for(Session, "after_commit")
+def _incrementer_versions(session):
+    for famille in session.info.pop(VersionsDonnees.CLE_SESSION, ()):
+        versions_donnees.incrementer(famille)
+
+
+@event.listens_for(Session, "after_rollback")
+def _oublier_versions(session):
+    session.info.pop(VersionsDonnees.CLE_SESSION, None)
+
+
+# 🔎 Appelés par les controllers dans la transaction d'écriture, avant le commit
+_NOTIFICATION = text("SELECT pg_notify(:canal, :famille)")
+
+
+def _marquer(info: dict, familles: Iterable[str]) -> List[str]:
+    nouvelles = [f for f in familles if f not in info.setdefault(VersionsDonnees.CLE_SESSION, set())]
+    info[VersionsDonnees.CLE_SESSION].update(nouvelles)
+    return nouvelles
+
+
+def signaler(db: Session, *familles: str) -> None:
+    for famille in _marquer(db.info, familles):
+        db.execute(_NOTIFICATION, {"canal": CANAL_VERSIONS, "famille": famille})
+
+
+async def signaler_async(db: AsyncSession, *familles: str) -> None:
+    for famille in _marquer(db.info, familles):
+        await db.execute(_NOTIFICATION, {"canal": CANAL_VERSIONS, "famille": famille})
+
+
+# -------------------- GET conditionnels (ETag / If-None-Match) --------------------
+def _etags_demandes(request: Request) -> List[str]:
+    entete = request.headers.get("if-none-match", "")
+    return [e.strip().removeprefix("W/") for e in entete.split(",") if e.strip()]
+
+
+def _non_modifie(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+
+class CacheEtags:
+    """
+    ETag = empreinte du corps JSON (identique d'un worker à l'autre). Une fois calculé pour
+    une combinaison de versions, il est réutilisé tant que ces versions ne bougent pas :
+    le 304 est alors rendu sans requête ni sérialisation.
+    """
+
+    def __init__(self, versions: VersionsDonnees):
+        self.versions = versions
+        self._entrees: Dict[str, Tuple[Tuple[int, ...], str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def verifier(self, request: Request, cle: str, familles: Tuple[str, ...]):
+        """(réponse 304 ou None, jeton à repasser à repondre())."""
+        jeton = (cle, familles, tuple(self.versions.version(f) for f in familles))
+        entree = self._entrees.get(cle)
+        if entree is not None and entree[0] == jeton[2]:
+            demandes = _etags_demandes(request)
+            if entree[1] in demandes or "*" in demandes:
+                self.hits += 1
+                return _non_modifie(entree[1]), jeton
+        self.misses += 1
+        return None, jeton
+
+    def repondre(self, request: Request, jeton, contenu) -> Response:
+        cle, familles, versions = jeton
+        reponse = JSONResponse(content=jsonable_encoder(contenu))
+        etag = f'"{hashlib.sha256(reponse.body).hexdigest()[:32]}"'
+        if all(self.versions.stable(f) for f in familles):
+            self._entrees[cle] = (versions, etag)
+        if etag in _etags_demandes(request):
+            return _non_modifie(etag)
+        reponse.headers["ETag"] = etag
+        reponse.headers["Cache-Control"] = "private, no-cache"
+        return reponse
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "taille": len(self._entrees)}
+
+
+cache_etags = CacheEtags(versions_donnees)